@@ -1,18 +1,70 @@
-from fastapi import Security, HTTPException, status
+from fastapi import Request, Security, HTTPException, WebSocket, WebSocketException, status
+from starlette.requests import HTTPConnection
 from fastapi.security.api_key import APIKeyHeader
 from typing import Optional
-import os
 from dotenv import load_dotenv
+import hmac
+import os
 
 load_dotenv()
 
+# The registry reads its settings at import, so after .env is loaded
+from app.auth.key_registry import ApiKey, KeyRegistry, key_registry
+
 API_KEY_NAME = "Authorization"
-API_KEY = os.getenv("API_KEY", "vn-initial-key")  # Set this in your .env file
+
+# The one key that may read /metrics, which reports usage per API key
+METRICS_API_KEY = os.getenv("METRICS_API_KEY")
 
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
-async def get_api_key(api_key_header: Optional[str] = Security(api_key_header)) -> str:
-    """Validate API key from header."""
+async def get_api_key(request: Request, api_key_header: Optional[str] = Security(api_key_header)) -> ApiKey:
+    """Validate API key from header, unless ApiKeyQuotaMiddleware already has."""
+    return authenticated_key(request) or verify_api_key(api_key_header)
+
+async def verify_metrics_key(api_key_header: Optional[str] = Security(api_key_header)) -> None:
+    """
+    Allow only the METRICS_API_KEY bearer token; tenant keys are refused.
+
+    Without METRICS_API_KEY set the metrics endpoint is switched off.
+    """
+    if not METRICS_API_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (api_key_header or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_API_KEY.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics API key"
+        )
+
+async def get_websocket_api_key(websocket: WebSocket) -> ApiKey:
+    """
+    Validate the API key of a WebSocket handshake.
+
+    APIKeyHeader only works on HTTP requests, and browsers cannot set headers
+    on WebSocket handshakes, so the key may also be sent as ?api_key=.
+    A bad key closes the connection with a policy violation.
+    """
+    key = authenticated_key(websocket)
+    if key is not None:
+        return key
+    try:
+        return verify_api_key(websocket_authorization(websocket.headers.get(API_KEY_NAME), websocket.query_params.get("api_key")))
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+def authenticated_key(connection: HTTPConnection) -> Optional[ApiKey]:
+    """The key ApiKeyQuotaMiddleware resolved for this request, if it ran."""
+    return getattr(connection.state, "api_key", None)
+
+def websocket_authorization(header: Optional[str], query_key: Optional[str]) -> Optional[str]:
+    """Authorization value of a WebSocket handshake, from the header or ?api_key="""
+    if not header and query_key:
+        return f"Bearer {query_key}"
+    return header
+
+def verify_api_key(api_key_header: Optional[str], registry: KeyRegistry = key_registry) -> ApiKey:
+    """Check an Authorization header value and return the registered key it carries."""
     if not api_key_header:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,10 +85,11 @@ async def get_api_key(api_key_header: Optional[str] = Security(api_key_header))
             detail="API key is missing"
         )
         
-    if token != API_KEY:
+    key = registry.lookup(token)
+    if key is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
         
-    return token 
\ No newline at end of file
+    return key 
\ No newline at end of file
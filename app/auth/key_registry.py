@@ -0,0 +1,229 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from app.config import env_float, env_int
+from app.services.metrics import API_KEY_IN_FLIGHT, API_KEY_REJECTIONS
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_keys (
+    id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    max_concurrency INTEGER NOT NULL DEFAULT 0,
+    rate_per_second REAL NOT NULL DEFAULT 0,
+    burst INTEGER NOT NULL DEFAULT 0,
+    enabled INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+def hash_key(token: str) -> str:
+    """
+    SHA-256 of an API key, as stored in the registry.
+
+    Keys are long random tokens rather than passwords, so a fast unsalted
+    hash is enough and lets the hash itself be the lookup key.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+@dataclass
+class ApiKey:
+    """A tenant's key and its quotas; 0 means unlimited."""
+    id: str
+    sha256: str
+    max_concurrency: int = 0
+    rate_per_second: float = 0.0
+    burst: int = 0
+    enabled: bool = True
+
+@dataclass
+class KeyUsage:
+    """Requests in flight and the rate token bucket of one key, kept across reloads."""
+    in_flight: int = 0
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+def _bucket_size(key: ApiKey) -> float:
+    return max(1.0, key.burst or key.rate_per_second)
+
+class QuotaExceeded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class KeyRegistry:
+    """
+    API keys by SHA-256 hash, loaded from a JSON file or a SQLite table.
+
+    A presented key is hashed and found with one dict lookup, then compared
+    to the stored hash in constant time, so lookup cost does not depend on
+    the number of keys or on how much of a key matches. The source is
+    re-read in the background when it changes, without a restart; if it
+    cannot be read, the keys already loaded stay in use.
+
+    The JSON file holds {"keys": [{"id", "sha256", "max_concurrency",
+    "rate_per_second", "burst", "enabled"}]}; the SQLite table has the same
+    columns (see _SCHEMA). The API_KEY setting, if given, is one more key,
+    "default", with quotas from the API_KEY_* settings.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        db_path: Optional[str] = None,
+        static_keys: Optional[List[ApiKey]] = None,
+        reload_interval: float = 5.0
+    ):
+        self.path = path
+        self.db_path = db_path
+        self.static_keys = static_keys or []
+        self.reload_interval = reload_interval
+        self._keys: Dict[str, ApiKey] = {}
+        self._usage: Dict[str, KeyUsage] = {}
+        self._version: Optional[Tuple] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.reload()
+
+    @classmethod
+    def from_env(cls) -> "KeyRegistry":
+        path = os.getenv("API_KEYS_FILE")
+        db_path = os.getenv("API_KEYS_DB")
+        # Without a registry the single API_KEY keeps working, including its old default
+        token = os.getenv("API_KEY") or (None if path or db_path else "vn-initial-key")
+        static_keys = [ApiKey(
+            "default",
+            hash_key(token),
+            max_concurrency=env_int("API_KEY_MAX_CONCURRENCY", 0),
+            rate_per_second=env_float("API_KEY_RATE_PER_SECOND", 0.0),
+            burst=env_int("API_KEY_BURST", 0)
+        )] if token else []
+        return cls(path, db_path, static_keys, reload_interval=env_float("API_KEYS_RELOAD_INTERVAL", 5.0))
+
+    def lookup(self, token: str) -> Optional[ApiKey]:
+        """The enabled key matching this token, or None."""
+        digest = hash_key(token)
+        key = self._keys.get(digest)
+        if key is None or not hmac.compare_digest(key.sha256, digest) or not key.enabled:
+            return None
+        return key
+
+    def acquire(self, key: ApiKey) -> None:
+        """Count a request against the key's quotas; raises QuotaExceeded if it is over one."""
+        usage = self._usage[key.id]
+        if key.max_concurrency and usage.in_flight >= key.max_concurrency:
+            raise self._reject(key, "concurrency", 1)
+        if key.rate_per_second:
+            now = time.monotonic()
+            usage.tokens = min(_bucket_size(key), usage.tokens + (now - usage.updated) * key.rate_per_second)
+            usage.updated = now
+            if usage.tokens < 1:
+                raise self._reject(key, "rate", int((1 - usage.tokens) / key.rate_per_second) + 1)
+            usage.tokens -= 1
+        usage.in_flight += 1
+        API_KEY_IN_FLIGHT.set(usage.in_flight, key=key.id)
+
+    def release(self, key: ApiKey) -> None:
+        usage = self._usage[key.id]
+        usage.in_flight -= 1
+        API_KEY_IN_FLIGHT.set(usage.in_flight, key=key.id)
+
+    def _reject(self, key: ApiKey, reason: str, retry_after: int) -> QuotaExceeded:
+        API_KEY_REJECTIONS.inc(key=key.id, reason=reason)
+        return QuotaExceeded(reason, retry_after)
+
+    def reload(self) -> bool:
+        """Re-read the key source if it changed; returns whether keys were replaced."""
+        loaded = self._load()
+        if loaded is None:
+            return False
+        self._apply(*loaded)
+        return True
+
+    def _load(self) -> Optional[Tuple[Tuple, List[ApiKey]]]:
+        """Read the key source if it changed since the last load; safe to run in a thread"""
+        try:
+            version = self._source_version()
+            if self._version is not None and version == self._version:
+                return None
+            return version, [*self.static_keys, *self._read_file(), *self._read_db()]
+        except (OSError, ValueError, KeyError, TypeError, sqlite3.Error) as e:
+            self.reload_errors += 1
+            logger.error(f"Failed to load API keys, keeping {len(self._keys)} loaded: {str(e)}")
+            return None
+
+    def _apply(self, version: Tuple, keys: List[ApiKey]) -> None:
+        for key in keys:
+            if key.id not in self._usage:
+                # New keys start with a full bucket
+                self._usage[key.id] = KeyUsage(tokens=_bucket_size(key))
+        self._keys = {key.sha256: key for key in keys}
+        self._version = version
+        self.reloads += 1
+        logger.info(f"Loaded {len(keys)} API keys")
+
+    def _source_version(self) -> Tuple:
+        """Modification times and sizes of the key sources, to notice edits cheaply"""
+        version = []
+        for path in (self.path, self.db_path, self.db_path and f"{self.db_path}-wal"):
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                version.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    def _read_file(self) -> List[ApiKey]:
+        if not self.path:
+            return []
+        with open(self.path) as f:
+            entries = json.load(f)["keys"]
+        return [ApiKey(**{"enabled": True, **entry}) for entry in entries]
+
+    def _read_db(self) -> List[ApiKey]:
+        if not self.db_path:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executescript(_SCHEMA)
+            rows = conn.execute(
+                "SELECT id, sha256, max_concurrency, rate_per_second, burst, enabled FROM api_keys"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [ApiKey(row[0], row[1], row[2], row[3], row[4], bool(row[5])) for row in rows]
+
+    async def start(self) -> None:
+        """Watch the key source for changes."""
+        if (self.path or self.db_path) and self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            loaded = await asyncio.to_thread(self._load)
+            if loaded is not None:
+                self._apply(*loaded)
+
+    async def stats(self) -> dict:
+        return {
+            "keys": len(self._keys),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "in_flight": {key_id: usage.in_flight for key_id, usage in self._usage.items()}
+        }
+
+key_registry = KeyRegistry.from_env()
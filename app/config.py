@@ -0,0 +1,26 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to the default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid value for {name}: {value!r}")
+        return default
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to the default."""
+    return int(env_float(name, default))
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean flag (1/true/yes/on) from the environment."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
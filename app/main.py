@@ -1,8 +1,24 @@
 from fastapi import FastAPI, UploadFile, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 import logging
 from dotenv import load_dotenv
-from app.auth.api_key import get_api_key
+from app.auth.api_key import get_api_key, verify_metrics_key
+from app.services.gemini_pool import close_gemini_pool, gemini_pool_stats
+from app.services.http_sessions import open_http_sessions, close_http_sessions
+from app.middleware.upload_limit import UploadSizeLimitMiddleware
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.api_key_quota import ApiKeyQuotaMiddleware
+from app.auth.key_registry import key_registry
+from app.services.admission import RouteLimiter
+from app.config import env_bool, env_int
+from app.services.job_queue import job_queue
+from app.services.note_store import note_store
+from app.middleware.metrics import MetricsMiddleware
+from app.services.metrics import metrics
+from app.services.youtube_transcript import transcript_cache_stats
 
 # Load environment variables
 load_dotenv()
@@ -11,6 +27,20 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage shared upstream clients, the job queue, the note store and API key reloading for the lifetime of the app."""
+    await key_registry.start()
+    await open_http_sessions()
+    await note_store.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await note_store.stop()
+    await close_http_sessions()
+    await close_gemini_pool()
+    await key_registry.stop()
+
 # Create FastAPI app with docs disabled
 app = FastAPI(
     title="Voice Note AI",
@@ -18,16 +48,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url=None,    # Disable Swagger UI
     redoc_url=None,   # Disable ReDoc
-    openapi_url=None  # Disable OpenAPI schema
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    openapi_url=None,  # Disable OpenAPI schema
+    lifespan=lifespan
 )
 
 # Root endpoint
@@ -41,8 +63,13 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus metrics endpoint; it has per-key usage, so only METRICS_API_KEY may read it
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_key)])
+async def metrics_endpoint():
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Import routers after app creation to avoid circular imports
-from app.routers import voice_notes, youtube_notes
+from app.routers import voice_notes, live_notes, youtube_notes, jobs, notes
 
 # Include routers with authentication
 app.include_router(
@@ -51,9 +78,86 @@ app.include_router(
     tags=["voice-notes"],
     dependencies=[Depends(get_api_key)]
 )
+# WebSocket routes authenticate in their own dependency, since APIKeyHeader only handles HTTP
+app.include_router(
+    live_notes.router,
+    prefix="/api/v1",
+    tags=["voice-notes"]
+)
 app.include_router(
     youtube_notes.router,
     prefix="/api/v1",
     tags=["youtube-notes"],
     dependencies=[Depends(get_api_key)]
-) 
\ No newline at end of file
+)
+app.include_router(
+    jobs.router,
+    prefix="/api/v1",
+    tags=["jobs"],
+    dependencies=[Depends(get_api_key)]
+)
+app.include_router(
+    notes.router,
+    prefix="/api/v1",
+    tags=["notes"],
+    dependencies=[Depends(get_api_key)]
+)
+
+# Refuse oversized voice note uploads before their bodies are buffered
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/v1/voice-notes": voice_notes.speech_handler.max_upload_size,
+        "/api/v1/voice-notes/stream": voice_notes.speech_handler.max_upload_size,
+        "/api/v1/voice-notes/batch": voice_notes.BATCH_MAX_BYTES
+    }
+)
+
+# Bound concurrent work per route and shed the excess with a fast 503.
+# Routes sharing an upstream path share a limiter.
+if env_bool("ADMISSION_ENABLED", True):
+    voice_note_limiter = RouteLimiter.from_env("voice_notes", limit=32, max_queue=64)
+    batch_limiter = RouteLimiter.from_env("voice_notes_batch", limit=4, max_queue=8)
+    text_note_limiter = RouteLimiter.from_env("text_notes", limit=64, max_queue=128)
+    app.add_middleware(
+        AdmissionMiddleware,
+        limits={
+            "/api/v1/voice-notes": voice_note_limiter,
+            "/api/v1/voice-notes/stream": voice_note_limiter,
+            "/api/v1/voice-notes/live": voice_note_limiter,
+            "/api/v1/voice-notes/batch": batch_limiter,
+            "/api/v1/youtube-notes": text_note_limiter,
+            "/api/v1/youtube-notes/stream": text_note_limiter,
+            "/api/v1/raw-text": text_note_limiter,
+            "/api/v1/raw-text/stream": text_note_limiter
+        }
+    )
+
+# Check API keys and per-key quotas ahead of admission, so one tenant's excess never queues
+app.add_middleware(ApiKeyQuotaMiddleware, registry=key_registry)
+
+# Compress complete response bodies (large transcripts) for clients that accept it
+if env_bool("RESPONSE_COMPRESSION", True):
+    app.add_middleware(CompressionMiddleware, minimum_size=env_int("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+
+# Configure CORS. Added after the middleware that answers early (401, 413,
+# 429, 503), so it wraps them and those refusals carry CORS headers too.
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, replace with specific origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Outermost, so request latency includes upload limiting and CORS
+app.add_middleware(MetricsMiddleware)
+
+# Cache and queue statistics, polled at scrape time
+metrics.register_collector("transcription_cache", "Transcription cache statistics", voice_notes.speech_handler.cache.stats)
+metrics.register_collector("youtube_transcript_cache", "YouTube transcript cache statistics", transcript_cache_stats)
+metrics.register_collector("summary_cache", "Summary cache statistics", youtube_notes.summary_cache.stats)
+metrics.register_collector("job_queue", "Job queue statistics", job_queue.stats)
+metrics.register_collector("gemini_pool", "Gemini pool load per member", gemini_pool_stats)
+metrics.register_collector("note_store", "Note store write batching", note_store.stats)
+metrics.register_collector("api_keys", "API key registry reloads and requests in flight per key", key_registry.stats)
@@ -0,0 +1,61 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict
+from app.services.admission import RouteLimiter
+import time
+
+class AdmissionMiddleware:
+    """
+    Admit requests to busy routes through their RouteLimiter.
+
+    Runs before the endpoint, so a shed request gets its 503 before any of
+    its upload is read. The slot is held until the response, including a
+    streamed one, has been sent. WebSocket sessions take a slot too, held
+    for the whole session; a shed handshake is closed with 1013 (try again
+    later). Their duration follows the speaker rather than the upstream, so
+    it does not feed the limiter's service time.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, RouteLimiter]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.limits.get(scope.get("path", "")) if scope["type"] in ("http", "websocket") else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except HTTPException as e:
+            if scope["type"] == "websocket":
+                # Closing instead of accepting refuses the handshake
+                await receive()
+                await send({"type": "websocket.close", "code": 1013, "reason": e.detail})
+                return
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.release()
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            limiter.release(time.perf_counter() - started, failed=status >= 500)
@@ -0,0 +1,65 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.auth.api_key import API_KEY_NAME, verify_api_key, websocket_authorization
+from app.auth.key_registry import KeyRegistry, QuotaExceeded
+
+class ApiKeyQuotaMiddleware:
+    """
+    Authenticate API requests and hold each key to its quotas.
+
+    Runs before the endpoint, so a request with a bad key or over its
+    key's concurrency or rate quota is refused (401 or 429 with
+    Retry-After) before any of its upload is read, and one tenant cannot
+    take the capacity the others share. The key's slot is held until the
+    response, or the WebSocket session, ends.
+    """
+
+    def __init__(self, app: ASGIApp, registry: KeyRegistry, path_prefix: str = "/api/"):
+        self.app = app
+        self.registry = registry
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] not in ("http", "websocket")
+            or not scope.get("path", "").startswith(self.path_prefix)
+            # CORS preflights carry no credentials
+            or scope.get("method") == "OPTIONS"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = Headers(scope=scope).get(API_KEY_NAME)
+        if scope["type"] == "websocket":
+            authorization = websocket_authorization(authorization, QueryParams(scope.get("query_string", b"")).get("api_key"))
+        try:
+            key = verify_api_key(authorization, self.registry)
+            self.registry.acquire(key)
+        except HTTPException as e:
+            await self._refuse(scope, receive, send, e.status_code, e.detail, e.headers)
+            return
+        except QuotaExceeded as e:
+            await self._refuse(
+                scope, receive, send, 429,
+                f"API key {e.reason} quota exceeded",
+                {"Retry-After": str(e.retry_after)}
+            )
+            return
+
+        # Endpoints pick the key up from request.state instead of looking it up again
+        scope.setdefault("state", {})["api_key"] = key
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.registry.release(key)
+
+    async def _refuse(self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, headers=None) -> None:
+        if scope["type"] == "websocket":
+            # Closing instead of accepting refuses the handshake
+            await receive()
+            await send({"type": "websocket.close", "code": 1008, "reason": detail})
+            return
+        response = JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+        await response(scope, receive, send)
@@ -0,0 +1,126 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable, Dict, Optional
+from app.services.metrics import record_payload
+import asyncio
+import gzip
+
+# Optional, not in requirements.txt: install brotli and zstandard to offer br and zstd as well as gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Levels that favour speed; text compresses well at all of them
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+# Bodies larger than this are compressed off the event loop
+THREAD_THRESHOLD = 256 * 1024
+
+Encoder = Callable[[bytes], bytes]
+
+def available_encoders() -> Dict[str, Encoder]:
+    """Content codings this process can produce; br and zstd need their optional packages."""
+    encoders: Dict[str, Encoder] = {"gzip": lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    if zstandard is not None:
+        # Compressors are not thread-safe, so each body gets its own
+        encoders["zstd"] = lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return encoders
+
+# Preferred order when the client rates several codings equally
+PREFERENCE = ("zstd", "br", "gzip")
+
+def negotiate_encoding(accept_encoding: str, available) -> Optional[str]:
+    """Pick the coding the client rates highest among those available, or None."""
+    ratings: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ratings[name] = quality
+
+    wildcard = ratings.get("*", 0.0)
+    candidates = [
+        (ratings.get(name, wildcard), -PREFERENCE.index(name), name)
+        for name in PREFERENCE if name in available
+    ]
+    quality, _, name = max(candidates, default=(0.0, 0, None))
+    return name if quality > 0 else None
+
+class CompressionMiddleware:
+    """
+    Compress response bodies with the best coding the client accepts.
+
+    zstd, br and gzip are negotiated from Accept-Encoding. Only complete
+    bodies of at least minimum_size bytes are compressed; streamed
+    responses (server-sent events, NDJSON) go out as they are produced,
+    and so do bodies that are already encoded or would not get smaller.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, encoders: Optional[Dict[str, Encoder]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = encoders if encoders is not None else available_encoders()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith("text/event-stream") or "content-encoding" in headers:
+                    # Never compressed, so events go out without waiting for the first one
+                    await send(message)
+                    return
+                # Held back until the body shows whether it is worth compressing
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            compressed = None
+            if not message.get("more_body") and len(body) >= self.minimum_size:
+                encode = self.encoders[encoding]
+                compressed = await asyncio.to_thread(encode, body) if len(body) > THREAD_THRESHOLD else encode(body)
+
+            if compressed is not None and len(compressed) < len(body):
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                record_payload("response", len(body))
+                record_payload(f"response_{encoding}", len(compressed))
+                message = {**message, "body": compressed}
+
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from app.auth.api_key import get_api_key
+from app.auth.key_registry import ApiKey
+from app.schemas.voice_note import ErrorResponse, JobAcceptedResponse, JobStatusResponse
+from app.services.job_queue import job_queue
+
+router = APIRouter()
+
+def job_accepted(job_id: str) -> JSONResponse:
+    """202 response pointing the client at the job status endpoint"""
+    accepted = JobAcceptedResponse(job_id=job_id, status="queued", status_url=f"/api/v1/jobs/{job_id}")
+    return JSONResponse(status_code=202, content=accepted.model_dump())
+
+@router.get("/jobs/stats")
+async def get_job_queue_stats():
+    """Queue depth, worker count and queue-wait/run latency statistics"""
+    return await job_queue.stats()
+
+@router.get("/jobs/{job_id}",
+            response_model=JobStatusResponse,
+            responses={404: {"model": ErrorResponse}})
+async def get_job(job_id: str, api_key: ApiKey = Depends(get_api_key)):
+    """Poll the status and, once finished, the result of a queued job submitted with this key"""
+    job = await job_queue.get(job_id, api_key.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job)
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from app.auth.api_key import get_websocket_api_key
+from app.auth.key_registry import ApiKey
+from app.config import env_float
+from app.routers.voice_notes import content_generator, speech_handler
+from app.schemas.voice_note import VoiceNoteResponse
+from app.services.live_transcription import LiveTranscription
+from app.services.metrics import record_payload, track_stage
+from app.services.note_store import note_store
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Rolling windows for live recordings: nominal length, overlap, pause search range and total cap
+LIVE_WINDOW_SECONDS = env_float("VOICE_NOTE_LIVE_WINDOW_SECONDS", 15.0)
+LIVE_OVERLAP_SECONDS = env_float("VOICE_NOTE_LIVE_OVERLAP_SECONDS", 1.0)
+LIVE_SEARCH_SECONDS = env_float("VOICE_NOTE_LIVE_SEARCH_SECONDS", 3.0)
+LIVE_MAX_SECONDS = env_float("VOICE_NOTE_LIVE_MAX_SECONDS", 3600.0)
+
+@router.websocket("/voice-notes/live")
+async def live_voice_note(
+    websocket: WebSocket,
+    sample_rate: int = Query(16000, ge=8000, le=48000),
+    channels: int = Query(1, ge=1, le=2),
+    api_key: ApiKey = Depends(get_websocket_api_key)
+):
+    """
+    Transcribe a voice note while it is being recorded.
+
+    The client sends raw 16-bit little-endian PCM as binary messages and
+    {"event": "stop"} as a text message when recording ends. The server
+    sends JSON events: partial (index and text of each finished window, in
+    completion order), transcription, metadata, summary deltas, then done
+    with the complete note, or error. Only the last window and the note
+    content are left to do after stop, however long the recording was.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send(event: str, data: dict) -> None:
+        async with send_lock:
+            await websocket.send_json({"event": event, **data})
+
+    session = LiveTranscription(
+        lambda audio: speech_handler.transcribe_pcm(audio, route="live_note"),
+        sample_rate,
+        channels,
+        on_partial=lambda index, text: send("partial", {"index": index, "text": text}),
+        window_seconds=LIVE_WINDOW_SECONDS,
+        overlap_seconds=LIVE_OVERLAP_SECONDS,
+        search_seconds=LIVE_SEARCH_SECONDS,
+        max_seconds=LIVE_MAX_SECONDS,
+        concurrency=speech_handler.chunk_concurrency
+    )
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+            if message.get("bytes"):
+                try:
+                    session.feed(message["bytes"])
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            elif message.get("text") and _control_event(message["text"]) == "stop":
+                break
+
+        if not session.received_frames:
+            raise HTTPException(status_code=400, detail="No audio received")
+        record_payload("upload", session.received_frames * 2 * channels)
+
+        with track_stage("transcription"):
+            transcription = await session.finish()
+        await send("transcription", {"transcription": transcription})
+
+        with track_stage("content_generation"):
+            async for event, data in content_generator.stream_content(transcription, route="live_note"):
+                if event != "content":
+                    await send(event, data)
+        note = VoiceNoteResponse(**data)
+        note.id = await note_store.add("voice_note", b"", note, api_key.id, digest=session.sha256.hexdigest())
+        await send("done", note.model_dump())
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.info(f"Live voice note client left after {session.duration:.1f}s of audio")
+        await session.cancel()
+    except HTTPException as e:
+        await session.cancel()
+        await send("error", {"status_code": e.status_code, "detail": e.detail})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION if e.status_code < 500 else status.WS_1011_INTERNAL_ERROR)
+    except Exception as e:
+        # Transcription and generation failures; their text comes from upstream, so it is only logged
+        logger.error(f"Error in live voice note: {str(e)}")
+        await session.cancel()
+        await send("error", {"status_code": 500, "detail": "Failed to create the voice note"})
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+def _control_event(text: str) -> str:
+    """The event name of a text message; raises a 400 HTTPException unless it is a JSON object."""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict):
+        raise HTTPException(status_code=400, detail='Text messages must be JSON objects such as {"event": "stop"}')
+    return message.get("event")
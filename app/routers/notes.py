@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.auth.api_key import get_api_key
+from app.auth.key_registry import ApiKey
+from app.schemas.voice_note import ErrorResponse, NoteListResponse, NoteResponse, NoteSearchResponse
+from app.services.note_store import note_store
+
+router = APIRouter()
+
+@router.get("/notes",
+            response_model=NoteListResponse,
+            responses={400: {"model": ErrorResponse}})
+async def find_notes_by_input(
+    input_hash: str = Query(..., pattern="^[0-9a-f]{64}$"),
+    limit: int = Query(20, ge=1, le=100),
+    api_key: ApiKey = Depends(get_api_key)
+):
+    """This key's notes made from an input, by the SHA-256 of the upload bytes, raw text or video URL"""
+    return NoteListResponse(items=await note_store.find_by_input(input_hash, api_key.id, limit))
+
+@router.get("/notes/search",
+            response_model=NoteSearchResponse,
+            responses={400: {"model": ErrorResponse}})
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    api_key: ApiKey = Depends(get_api_key)
+):
+    """Full-text search over this key's notes' titles, summaries and transcriptions, best matches first"""
+    return NoteSearchResponse(query=q, items=await note_store.search(q, api_key.id, limit))
+
+@router.get("/notes/{note_id}",
+            response_model=NoteResponse,
+            responses={404: {"model": ErrorResponse}})
+async def get_note(note_id: str, api_key: ApiKey = Depends(get_api_key)):
+    """Fetch a note previously processed with this key without reprocessing it"""
+    note = await note_store.get(note_id, api_key.id)
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return NoteResponse(**note)
@@ -1,7 +1,21 @@
-from fastapi import APIRouter, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import HttpUrl
+from typing import Dict, List, Optional
+from app.auth.api_key import get_api_key
+from app.auth.key_registry import ApiKey
 from app.services.speech_handler import SpeechHandler
 from app.services.content_generator import ContentGenerator
-from app.schemas.voice_note import VoiceNoteResponse, ErrorResponse
+from app.services.audio_upload import read_upload
+from app.schemas.voice_note import VoiceNoteResponse, ErrorResponse, VoiceNoteBatchItem, VoiceNoteBatchResponse, JobAcceptedResponse
+from app.services.job_queue import job_queue
+from app.services.note_store import note_store
+from app.routers.jobs import job_accepted
+from app.services.sse import sse_response, stream_note_events
+from app.services.responses import BATCH_WITHOUT_TRANSCRIPTION, WITHOUT_TRANSCRIPTION, json_response
+from app.services.metrics import record_payload, track_stage
+from app.config import env_int
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,51 +24,227 @@ router = APIRouter()
 speech_handler = SpeechHandler()
 content_generator = ContentGenerator()
 
+# Batch uploads: files processed at once, files per request and total body size
+BATCH_CONCURRENCY = env_int("VOICE_NOTE_BATCH_CONCURRENCY", 4)
+BATCH_MAX_FILES = env_int("VOICE_NOTE_BATCH_MAX_FILES", 50)
+BATCH_MAX_BYTES = env_int("VOICE_NOTE_BATCH_MAX_BYTES", 200 * 1024 * 1024)
+
+async def transcribe_voice_note(file_content: bytes, content_type: str) -> str:
+    """Transcribe audio, failing if no text comes back"""
+    with track_stage("transcription"):
+        transcription_result = await speech_handler.transcribe_audio(
+            file_content=file_content,
+            content_type=content_type,
+            route="voice_note"
+        )
+    
+    if not transcription_result.get("text"):
+        raise HTTPException(status_code=500, detail="Failed to transcribe audio")
+    
+    return transcription_result["text"]
+
+async def transcribe_and_generate(file_content: bytes, content_type: str) -> Optional[Dict[str, str]]:
+    """
+    Get the transcription and note content from one model call.
+
+    Returns None when the two-step path should be used instead: the upload
+    is long or already transcribed, or the model's answer was incomplete.
+    """
+    audio = await speech_handler.encode_for_single_pass(file_content, content_type, route="voice_note")
+    if audio is None:
+        return None
+
+    try:
+        with track_stage("single_pass"):
+            content = await content_generator.generate_from_audio(
+                audio.data, audio.format, duration=audio.duration, route="voice_note"
+            )
+    except ValueError as e:
+        logger.warning(f"Single-pass voice note incomplete, falling back to two steps: {str(e)}")
+        return None
+
+    await speech_handler.remember_transcription(audio, content["transcription"])
+    return content
+
+async def create_voice_note(file_content: bytes, content_type: str, owner: str) -> VoiceNoteResponse:
+    """Transcribe audio and generate its note content, stored as a note of owner"""
+    content = None
+    if speech_handler.single_pass_enabled:
+        content = await transcribe_and_generate(file_content, content_type)
+
+    if content is None:
+        # Transcribe audio
+        transcription = await transcribe_voice_note(file_content, content_type)
+
+        # Generate content using AI
+        with track_stage("content_generation"):
+            content = await content_generator.generate_content(transcription, route="voice_note")
+    
+    # Ensure all required fields are present
+    required_fields = ["emoji", "title", "transcription", "summary"]
+    for field in required_fields:
+        if field not in content:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Content generation failed: missing {field} field"
+            )
+    
+    note = VoiceNoteResponse(
+        emoji=content["emoji"],
+        title=content["title"],
+        transcription=content["transcription"],
+        summary=content["summary"]
+    )
+    note.id = await note_store.add("voice_note", file_content, note, owner)
+    return note
+
 @router.post("/voice-notes", 
              response_model=VoiceNoteResponse,
-             responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def process_voice_note(file: UploadFile):
+             responses={202: {"model": JobAcceptedResponse}, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+async def process_voice_note(
+    file: UploadFile,
+    job: bool = False,
+    callback_url: Optional[HttpUrl] = None,
+    include_transcription: bool = True,
+    api_key: ApiKey = Depends(get_api_key)
+):
     """
     Process a voice note file:
     1. Transcribe the audio to text
     2. Generate emoji, title, and summary using AI
+
+    With VOICE_NOTE_SINGLE_PASS both steps happen in one model call.
+
+    With job=true the upload is queued and a job ID is returned immediately.
+    With include_transcription=false the transcription is left out of the response.
     """
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Transcribe audio
-        transcription_result = await speech_handler.transcribe_audio(
-            file_content=file_content,
-            content_type=file.content_type
-        )
-        
-        if not transcription_result.get("text"):
-            raise HTTPException(status_code=500, detail="Failed to transcribe audio")
-        
-        transcription = transcription_result["text"]
-        
-        # Generate content using AI
-        content = await content_generator.generate_content(transcription)
+        # Read file content in chunks, stopping early once it is too large
+        file_content = await read_upload(file, speech_handler.max_upload_size)
+        record_payload("upload", len(file_content))
+
+        if job:
+            # Reject bad audio now rather than in a failed job later
+            speech_handler.inspect_audio(file_content, file.content_type)
+            job_id = await job_queue.submit(
+                "voice_note",
+                {"content_type": file.content_type, "filename": file.filename},
+                api_key.id,
+                payload=bytes(file_content),
+                callback_url=callback_url and str(callback_url),
+                max_active=api_key.max_concurrency
+            )
+            return job_accepted(job_id)
         
-        # Ensure all required fields are present
-        required_fields = ["emoji", "title", "transcription", "summary"]
-        for field in required_fields:
-            if field not in content:
-                raise HTTPException(
-                    status_code=500, 
-                    detail=f"Content generation failed: missing {field} field"
-                )
-        
-        return VoiceNoteResponse(
-            emoji=content["emoji"],
-            title=content["title"],
-            transcription=content["transcription"],
-            summary=content["summary"]
-        )
+        note = await create_voice_note(file_content, file.content_type, api_key.id)
+        return json_response(note, exclude=None if include_transcription else WITHOUT_TRANSCRIPTION)
         
     except HTTPException as e:
         raise e
     except Exception as e:
         logger.error(f"Error processing voice note: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/voice-notes/stream",
+             responses={400: {"model": ErrorResponse}})
+async def stream_voice_note(file: UploadFile, include_transcription: bool = True, api_key: ApiKey = Depends(get_api_key)):
+    """
+    Process a voice note file, streaming progress as server-sent events:
+    transcription, then emoji and title, then summary text as it is generated.
+    With include_transcription=false no event carries the transcription.
+    """
+    # Read file content in chunks, stopping early once it is too large
+    file_content = await read_upload(file, speech_handler.max_upload_size)
+
+    return sse_response(stream_note_events(
+        lambda: transcribe_voice_note(file_content, file.content_type),
+        content_generator,
+        VoiceNoteResponse,
+        send_transcription=include_transcription,
+        save=lambda transcription, note: note_store.add("voice_note", file_content, note, api_key.id),
+        route="voice_note",
+        echo_transcription=include_transcription
+    ))
+
+@router.post("/voice-notes/batch",
+             response_model=VoiceNoteBatchResponse,
+             responses={400: {"model": ErrorResponse}})
+async def process_voice_note_batch(
+    files: List[UploadFile],
+    stream: bool = False,
+    include_transcription: bool = True,
+    api_key: ApiKey = Depends(get_api_key)
+):
+    """
+    Process several voice note files in one request.
+
+    Files are processed concurrently up to a configured limit, and each one
+    gets its own result or error without failing the rest of the batch.
+    With stream=true, results are sent as newline-delimited JSON as soon as
+    each file completes. include_transcription=false leaves transcriptions out.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files in batch. Maximum is {BATCH_MAX_FILES}"
+        )
+
+    # Read everything up front; uploads are closed once the endpoint returns
+    uploads = []
+    for file in files:
+        try:
+            uploads.append((file, await read_upload(file, speech_handler.max_upload_size), None))
+        except HTTPException as e:
+            uploads.append((file, None, e))
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_process_batch_item(index, file, file_content, error, semaphore, api_key.id))
+        for index, (file, file_content, error) in enumerate(uploads)
+    ]
+
+    if stream:
+        return StreamingResponse(_stream_batch_items(tasks, include_transcription), media_type="application/x-ndjson")
+
+    items = await asyncio.gather(*tasks)
+    succeeded = sum(1 for item in items if item.result is not None)
+    batch = VoiceNoteBatchResponse(items=items, succeeded=succeeded, failed=len(items) - succeeded)
+    return json_response(batch, exclude=None if include_transcription else BATCH_WITHOUT_TRANSCRIPTION)
+
+async def _process_batch_item(
+    index: int,
+    file: UploadFile,
+    file_content: Optional[bytes],
+    read_error: Optional[HTTPException],
+    semaphore: asyncio.Semaphore,
+    owner: str
+) -> VoiceNoteBatchItem:
+    """Process one file of a batch, turning failures into a per-item error"""
+    if read_error:
+        return VoiceNoteBatchItem(index=index, filename=file.filename, status_code=read_error.status_code, error=read_error.detail)
+
+    try:
+        async with semaphore:
+            result = await create_voice_note(file_content, file.content_type, owner)
+        return VoiceNoteBatchItem(index=index, filename=file.filename, status_code=200, result=result)
+    except HTTPException as e:
+        return VoiceNoteBatchItem(index=index, filename=file.filename, status_code=e.status_code, error=e.detail)
+    except Exception as e:
+        logger.error(f"Error processing voice note {file.filename!r} in batch: {str(e)}")
+        return VoiceNoteBatchItem(index=index, filename=file.filename, status_code=500, error=str(e))
+
+async def _stream_batch_items(tasks: List[asyncio.Future], include_transcription: bool = True):
+    """Yield batch items as NDJSON lines in completion order"""
+    exclude = None if include_transcription else {"result": WITHOUT_TRANSCRIPTION}
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            item = await next_item
+            yield item.model_dump_json(exclude=exclude) + "\n"
+    finally:
+        # Client went away mid-stream; stop the remaining work
+        for task in tasks:
+            task.cancel()
+
+job_queue.register_handler("voice_note", lambda params, payload, owner: create_voice_note(payload, params["content_type"], owner))
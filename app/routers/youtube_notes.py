@@ -1,60 +1,149 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import HttpUrl
+from typing import Dict, Optional
+from app.auth.api_key import get_api_key
+from app.auth.key_registry import ApiKey
 from app.services.content_generator import ContentGenerator
-from app.schemas.voice_note import YouTubeVideoRequest, YouTubeVideoResponse, ErrorResponse, RawTextRequest
+from app.schemas.voice_note import YouTubeVideoRequest, YouTubeVideoResponse, ErrorResponse, RawTextRequest, JobAcceptedResponse
 from app.services.youtube_transcript import fetch_youtube_transcript, extract_video_id
+from app.services.job_queue import job_queue
+from app.services.note_store import note_store
+from app.routers.jobs import job_accepted
+from app.services.metrics import track_stage
+from app.services.summary_cache import SummaryCache
+from app.services.sse import sse_response, stream_note_events
+from app.services.responses import WITHOUT_TRANSCRIPTION, json_response
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 content_generator = ContentGenerator()
+# Note content for texts seen before, matched after normalization or as near-duplicates
+summary_cache = SummaryCache.from_env()
+
+async def fetch_video_transcription(video_url: str) -> str:
+    """Resolve a YouTube URL to its transcript text"""
+    # Extract video ID and fetch transcript
+    video_id = await extract_video_id(video_url)
+    if not video_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid YouTube URL or could not extract video ID"
+        )
+    
+    # Fetch transcript
+    with track_stage("transcript_fetch"):
+        transcript_result = await fetch_youtube_transcript(video_id)
+    if not transcript_result or not transcript_result.get("transcript"):
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to fetch video transcript"
+        )
+    
+    return transcript_result["transcript"]
+
+async def generate_note_content(text: str, route: str, owner: str) -> Dict[str, str]:
+    """Generate note content, reusing it for the same or a nearly identical text of this owner"""
+    fingerprint = await summary_cache.fingerprint(text, owner) if summary_cache.enabled else None
+    if fingerprint:
+        cached = summary_cache.get(fingerprint)
+        if cached is not None:
+            return {**cached, "transcription": text}
+
+    with track_stage("content_generation"):
+        content = await content_generator.generate_content(text, route=route)
+
+    if fingerprint and all(field in content for field in ("emoji", "title", "summary")):
+        summary_cache.set(fingerprint, content)
+    return content
+
+async def create_youtube_note(video_url: str, owner: str) -> YouTubeVideoResponse:
+    """Fetch a video's transcript and generate its note content, stored as a note of owner"""
+    transcription = await fetch_video_transcription(video_url)
+    
+    # Generate content using AI
+    content = await generate_note_content(transcription, "youtube_note", owner)
+    
+    # Ensure all required fields are present
+    required_fields = ["emoji", "title", "summary"]
+    for field in required_fields:
+        if field not in content:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Content generation failed: missing {field} field"
+            )
+    
+    note = YouTubeVideoResponse(
+        emoji=content["emoji"],
+        title=content["title"],
+        transcription=transcription,
+        summary=content["summary"]
+    )
+    note.id = await note_store.add("youtube_note", video_url, note, owner)
+    return note
+
+def validate_raw_text(text: str) -> str:
+    if not text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Text input cannot be empty"
+        )
+    return text
+
+async def create_raw_text_note(text: str, owner: str) -> YouTubeVideoResponse:
+    """Generate note content for raw text, stored as a note of owner"""
+    validate_raw_text(text)
+    
+    # Generate content using AI
+    content = await generate_note_content(text, "raw_text", owner)
+    
+    # Ensure all required fields are present
+    required_fields = ["emoji", "title", "summary"]
+    for field in required_fields:
+        if field not in content:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Content generation failed: missing {field} field"
+            )
+    
+    note = YouTubeVideoResponse(
+        emoji=content["emoji"],
+        title=content["title"],
+        transcription=text,
+        summary=content["summary"]
+    )
+    note.id = await note_store.add("raw_text", text, note, owner)
+    return note
 
 @router.post("/youtube-notes",
             response_model=YouTubeVideoResponse,
-            responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def process_youtube_video(request: YouTubeVideoRequest):
+            responses={202: {"model": JobAcceptedResponse}, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+async def process_youtube_video(
+    request: YouTubeVideoRequest,
+    job: bool = False,
+    callback_url: Optional[HttpUrl] = None,
+    include_transcription: bool = True,
+    api_key: ApiKey = Depends(get_api_key)
+):
     """
     Process a YouTube video URL:
     1. Extract video ID and fetch transcript
     2. Generate emoji, title, and summary using AI
+
+    With job=true the work is queued and a job ID is returned immediately.
+    With include_transcription=false the transcript is left out of the response.
     """
     try:
-        # Extract video ID and fetch transcript
-        video_id = await extract_video_id(str(request.video_url))
-        if not video_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid YouTube URL or could not extract video ID"
-            )
-        
-        # Fetch transcript
-        transcript_result = await fetch_youtube_transcript(video_id)
-        if not transcript_result or not transcript_result.get("transcript"):
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to fetch video transcript"
+        if job:
+            job_id = await job_queue.submit(
+                "youtube_note", {"video_url": str(request.video_url)}, api_key.id,
+                callback_url=callback_url and str(callback_url), max_active=api_key.max_concurrency
             )
-        
-        transcription = transcript_result["transcript"]
-        
-        # Generate content using AI
-        content = await content_generator.generate_content(transcription)
-        
-        # Ensure all required fields are present
-        required_fields = ["emoji", "title", "summary"]
-        for field in required_fields:
-            if field not in content:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Content generation failed: missing {field} field"
-                )
-        
-        return YouTubeVideoResponse(
-            emoji=content["emoji"],
-            title=content["title"],
-            transcription=transcription,
-            summary=content["summary"]
-        )
+            return job_accepted(job_id)
+
+        note = await create_youtube_note(str(request.video_url), api_key.id)
+        return json_response(note, exclude=None if include_transcription else WITHOUT_TRANSCRIPTION)
         
     except HTTPException as e:
         raise e
@@ -64,40 +153,79 @@ async def process_youtube_video(request: YouTubeVideoRequest):
 
 @router.post("/raw-text",
             response_model=YouTubeVideoResponse,
-            responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def process_raw_text(request: RawTextRequest):
+            responses={202: {"model": JobAcceptedResponse}, 400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+async def process_raw_text(
+    request: RawTextRequest,
+    job: bool = False,
+    callback_url: Optional[HttpUrl] = None,
+    include_transcription: bool = True,
+    api_key: ApiKey = Depends(get_api_key)
+):
     """
     Process raw text input:
     1. Generate emoji, title, and summary using AI
+
+    With job=true the work is queued and a job ID is returned immediately.
+    With include_transcription=false the submitted text is not echoed back.
     """
     try:
-        if not request.text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Text input cannot be empty"
+        if job:
+            validate_raw_text(request.text)
+            job_id = await job_queue.submit(
+                "raw_text", {"text": request.text}, api_key.id,
+                callback_url=callback_url and str(callback_url), max_active=api_key.max_concurrency
             )
-        
-        # Generate content using AI
-        content = await content_generator.generate_content(request.text)
-        
-        # Ensure all required fields are present
-        required_fields = ["emoji", "title", "summary"]
-        for field in required_fields:
-            if field not in content:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Content generation failed: missing {field} field"
-                )
-        
-        return YouTubeVideoResponse(
-            emoji=content["emoji"],
-            title=content["title"],
-            transcription=request.text,
-            summary=content["summary"]
-        )
+            return job_accepted(job_id)
+
+        note = await create_raw_text_note(request.text, api_key.id)
+        return json_response(note, exclude=None if include_transcription else WITHOUT_TRANSCRIPTION)
         
     except HTTPException as e:
         raise e
     except Exception as e:
         logger.error(f"Error processing raw text: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/youtube-notes/stream",
+            responses={400: {"model": ErrorResponse}})
+async def stream_youtube_video(request: YouTubeVideoRequest, include_transcription: bool = True, api_key: ApiKey = Depends(get_api_key)):
+    """
+    Process a YouTube video URL, streaming progress as server-sent events:
+    transcript, then emoji and title, then summary text as it is generated.
+    With include_transcription=false no event carries the transcript.
+    """
+    return sse_response(stream_note_events(
+        lambda: fetch_video_transcription(str(request.video_url)),
+        content_generator,
+        YouTubeVideoResponse,
+        send_transcription=include_transcription,
+        save=lambda transcription, note: note_store.add("youtube_note", str(request.video_url), note, api_key.id),
+        route="youtube_note",
+        echo_transcription=include_transcription
+    ))
+
+@router.post("/raw-text/stream",
+            responses={400: {"model": ErrorResponse}})
+async def stream_raw_text(request: RawTextRequest, include_transcription: bool = True, api_key: ApiKey = Depends(get_api_key)):
+    """
+    Process raw text input, streaming emoji and title, then summary text
+    as it is generated. With include_transcription=false the done event
+    does not echo the text back.
+    """
+    validate_raw_text(request.text)
+
+    async def get_text() -> str:
+        return request.text
+
+    return sse_response(stream_note_events(
+        get_text,
+        content_generator,
+        YouTubeVideoResponse,
+        send_transcription=False,
+        save=lambda transcription, note: note_store.add("raw_text", transcription, note, api_key.id),
+        route="raw_text",
+        echo_transcription=include_transcription
+    ))
+
+job_queue.register_handler("youtube_note", lambda params, payload, owner: create_youtube_note(params["video_url"], owner))
+job_queue.register_handler("raw_text", lambda params, payload, owner: create_raw_text_note(params["text"], owner))
@@ -1,11 +1,12 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class VoiceNoteResponse(BaseModel):
     emoji: str
     title: str
     transcription: str
     summary: str
+    id: Optional[str] = None
 
 class ErrorResponse(BaseModel):
     detail: str
@@ -18,6 +19,60 @@ class YouTubeVideoResponse(BaseModel):
     title: str
     transcription: str
     summary: str
+    id: Optional[str] = None
 
 class RawTextRequest(BaseModel):
-    text: str 
+    text: str
+
+class VoiceNoteBatchItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    status_code: int
+    result: Optional[VoiceNoteResponse] = None
+    error: Optional[str] = None
+
+class VoiceNoteBatchResponse(BaseModel):
+    items: List[VoiceNoteBatchItem]
+    succeeded: int
+    failed: int
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class NoteResponse(BaseModel):
+    id: str
+    kind: str
+    input_hash: str
+    emoji: str
+    title: str
+    transcription: str
+    summary: str
+    created_at: float
+
+class NoteListResponse(BaseModel):
+    items: List[NoteResponse]
+
+class NoteSearchHit(BaseModel):
+    id: str
+    kind: str
+    emoji: str
+    title: str
+    snippet: str
+    created_at: float
+
+class NoteSearchResponse(BaseModel):
+    query: str
+    items: List[NoteSearchHit]
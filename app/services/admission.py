@@ -0,0 +1,161 @@
+from collections import deque
+from fastapi import HTTPException
+from typing import Deque, Optional
+from app.config import env_bool, env_float, env_int
+from app.services.metrics import (
+    ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT, ADMISSION_REJECTIONS
+)
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest request in the moving average of service time
+SERVICE_TIME_SMOOTHING = 0.1
+MAX_RETRY_AFTER = 60
+
+class RouteLimiter:
+    """
+    Bound the requests a route serves at once, with a short FIFO wait queue.
+
+    Up to limit requests run; up to max_queue more wait at most
+    queue_timeout seconds for a slot. Anything beyond that is refused at
+    once with 503 and a Retry-After of roughly how long the backlog takes
+    to clear, so a burst costs the client a quick retry instead of a
+    timeout and the server never holds more than limit + max_queue
+    requests for the route.
+
+    With adaptive set, the limit follows AIMD: it grows by one per limit
+    requests that finish within target_latency, and is cut by backoff
+    (at most once per target_latency) when a request is slower or fails
+    with a 5xx, i.e. when the upstream calls behind the route slow down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float = 10.0,
+        adaptive: bool = False,
+        target_latency: float = 20.0,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        backoff: float = 0.7
+    ):
+        self.name = name
+        self.limit = float(limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.max_limit = max_limit or 4 * limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self.service_time = target_latency / 2
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._update_gauges()
+
+    @classmethod
+    def from_env(cls, name: str, limit: int, max_queue: int) -> "RouteLimiter":
+        """Settings come from ADMISSION_<NAME>_LIMIT/_QUEUE plus the shared ADMISSION_* options."""
+        prefix = f"ADMISSION_{name.upper()}"
+        limit = env_int(f"{prefix}_LIMIT", limit)
+        return cls(
+            name,
+            limit=limit,
+            max_queue=env_int(f"{prefix}_QUEUE", max_queue),
+            queue_timeout=env_float("ADMISSION_QUEUE_TIMEOUT", 10.0),
+            adaptive=env_bool("ADMISSION_ADAPTIVE", False),
+            target_latency=env_float(f"{prefix}_TARGET_LATENCY", env_float("ADMISSION_TARGET_LATENCY", 20.0)),
+            min_limit=env_int("ADMISSION_MIN_LIMIT", 1),
+            max_limit=env_int(f"{prefix}_MAX_LIMIT", 4 * limit)
+        )
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the requests ahead of a new one are likely done."""
+        backlog = self.in_flight + self.queued + 1
+        seconds = backlog * self.service_time / max(1, int(self.limit))
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(seconds)))
+
+    def _reject(self, reason: str) -> HTTPException:
+        ADMISSION_REJECTIONS.inc(route=self.name, reason=reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding {self.name} request ({reason}); {self.in_flight} in flight, {self.queued} queued")
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed; raises a 503 HTTPException when shed."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+        if self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+
+        # release() hands its slot straight to the first waiter
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait timed out; it is ours
+                return
+            raise self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            # The client went away just as a slot was handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_WAIT.observe(time.monotonic() - started, route=self.name)
+            self._update_gauges()
+
+    def release(self, duration: Optional[float] = None, failed: bool = False) -> None:
+        """Give the slot back, feeding the request's duration and outcome to the limit."""
+        self.in_flight -= 1
+        if duration is not None:
+            self._observe(duration, failed)
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+        self._update_gauges()
+
+    def _observe(self, duration: float, failed: bool) -> None:
+        if not failed:
+            self.service_time += SERVICE_TIME_SMOOTHING * (duration - self.service_time)
+        if not self.adaptive:
+            return
+        if failed or duration > self.target_latency:
+            now = time.monotonic()
+            # One cut per target_latency, so a burst of slow requests backs off once, not to the floor
+            if now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                logger.info(f"Lowered {self.name} concurrency limit to {int(self.limit)}")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _update_gauges(self) -> None:
+        ADMISSION_LIMIT.set(int(self.limit), route=self.name)
+        ADMISSION_IN_FLIGHT.set(self.in_flight, route=self.name)
+        ADMISSION_QUEUE_DEPTH.set(self.queued, route=self.name)
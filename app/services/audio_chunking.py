@@ -0,0 +1,94 @@
+from app.services.pcm_audio import PcmAudio, frame_energy, to_mono
+import numpy as np
+import re
+
+# Energy is averaged over this window so cuts land inside pauses, not at their edges
+SMOOTHING_SECONDS = 0.3
+
+def find_split_points(
+    mono: np.ndarray,
+    sample_rate: int,
+    chunk_seconds: float,
+    search_seconds: float
+) -> list[int]:
+    """
+    Choose sample offsets to cut at, roughly every chunk_seconds.
+
+    Each cut is moved to the quietest point within search_seconds of its
+    nominal position, so segments tend to break between words. Ties go to
+    the point closest to the nominal position.
+    """
+    energies, frame_length = frame_energy(mono, sample_rate)
+    smoothing = max(1, int(SMOOTHING_SECONDS * sample_rate / frame_length))
+    energies = np.convolve(energies, np.ones(smoothing) / smoothing, mode="same")
+    frames_per_chunk = max(1, int(chunk_seconds * sample_rate / frame_length))
+    search = int(search_seconds * sample_rate / frame_length)
+    if len(energies) <= frames_per_chunk:
+        return []
+
+    targets = np.arange(frames_per_chunk, len(energies) - frames_per_chunk // 4, frames_per_chunk)
+    if not len(targets):
+        return []
+
+    # Evaluate every candidate window at once: rows are cuts, columns offsets
+    offsets = np.arange(-search, search + 1)
+    candidates = np.clip(targets[:, None] + offsets[None, :], 0, len(energies) - 1)
+    scores = energies[candidates] + np.abs(offsets)[None, :] * 1e-12
+    best = candidates[np.arange(len(targets)), np.argmin(scores, axis=1)]
+    return [int(frame) * frame_length for frame in np.unique(best)]
+
+def find_pause(mono: np.ndarray, sample_rate: int, start_seconds: float, end_seconds: float) -> int:
+    """Sample offset of the quietest point between start_seconds and end_seconds."""
+    start = max(0, int(start_seconds * sample_rate))
+    energies, frame_length = frame_energy(mono[start:int(end_seconds * sample_rate)], sample_rate)
+    if not len(energies):
+        return start
+    smoothing = max(1, min(len(energies), int(SMOOTHING_SECONDS * sample_rate / frame_length)))
+    energies = np.convolve(energies, np.ones(smoothing) / smoothing, mode="same")
+    return start + int(np.argmin(energies)) * frame_length
+
+def split_audio(
+    audio: PcmAudio,
+    chunk_seconds: float,
+    overlap_seconds: float,
+    search_seconds: float
+) -> list[PcmAudio]:
+    """Split audio at low-energy points into segments that overlap by overlap_seconds."""
+    cuts = find_split_points(to_mono(audio), audio.sample_rate, chunk_seconds, search_seconds)
+    if not cuts:
+        return [audio]
+
+    overlap = int(overlap_seconds * audio.sample_rate)
+    bounds = [0, *cuts, audio.frame_count]
+    return [
+        audio.slice(max(0, start - overlap // 2), min(audio.frame_count, end + overlap - overlap // 2))
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch_transcripts(texts: list[str], max_overlap_words: int = 40) -> str:
+    """
+    Join segment transcripts, dropping words repeated across segment overlaps.
+
+    For each boundary the longest run of words that ends the text so far and
+    starts the next segment (ignoring case and punctuation) is kept once.
+    """
+    if len(texts) == 1:
+        return texts[0].strip()
+
+    words: list[str] = []
+    for text in texts:
+        incoming = text.split()
+        if not incoming:
+            continue
+        tail = [_normalize_word(w) for w in words[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in incoming[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                overlap = size
+                break
+        words.extend(incoming[overlap:])
+    return " ".join(words)
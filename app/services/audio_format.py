@@ -0,0 +1,271 @@
+from dataclasses import dataclass
+from typing import Optional
+from app.services.pcm_audio import extended_to_float
+import struct
+
+# Bytes searched for the first MPEG/ADTS frame after an ID3 tag (encoders may pad)
+SYNC_SEARCH_BYTES = 4096
+# Bytes at the end of an Ogg stream searched for the last page
+OGG_TAIL_BYTES = 64 * 1024
+# ADTS frames sampled to estimate the average frame size
+ADTS_SAMPLE_FRAMES = 32
+
+@dataclass
+class AudioInfo:
+    """What the file header says about an upload; fields are None when unknown."""
+    format: str
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    duration: Optional[float] = None
+
+def sniff_audio(data: bytes) -> Optional[AudioInfo]:
+    """
+    Detect the real audio format from magic bytes and parse its header.
+
+    Only headers are read (plus the last Ogg page for its duration), so this
+    is cheap even for large files. Returns None if no supported format is
+    recognized, and raises ValueError if the format is recognized but the
+    file is corrupt or truncated.
+    """
+    if data[:4] == b"RIFF":
+        return _sniff_wav(data)
+    if data[:4] == b"FORM":
+        return _sniff_aiff(data)
+    if data[:4] == b"fLaC":
+        return _sniff_flac(data)
+    if data[:4] == b"OggS":
+        return _sniff_ogg(data)
+
+    offset = 0
+    if data[:3] == b"ID3":
+        offset = _id3_size(data)
+    elif not _is_frame_sync(data, 0):
+        return None
+    return _sniff_frames(data, offset)
+
+def _sniff_wav(data: bytes) -> Optional[AudioInfo]:
+    if data[8:12] != b"WAVE":
+        if len(data) < 12:
+            raise ValueError("WAV file is truncated")
+        return None
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            fmt = data[offset + 8:offset + 8 + size]
+        elif chunk_id == b"data":
+            break
+        offset += 8 + size + (size & 1)
+    else:
+        raise ValueError("WAV file has no data chunk")
+    if fmt is None or len(fmt) < 16:
+        raise ValueError("WAV file has no valid fmt chunk")
+
+    channels, sample_rate, byte_rate = struct.unpack("<HII", fmt[2:12])
+    if not channels or not sample_rate or not byte_rate:
+        raise ValueError("WAV fmt chunk is invalid")
+    available = len(data) - offset - 8
+    # Streaming writers leave the size as 0 or 0xFFFFFFFF
+    if size in (0, 0xFFFFFFFF):
+        size = available
+    elif available < size:
+        raise ValueError(f"WAV file is truncated: {available} of {size} data bytes present")
+    return AudioInfo("wav", sample_rate, channels, size / byte_rate)
+
+def _sniff_aiff(data: bytes) -> Optional[AudioInfo]:
+    if data[8:12] not in (b"AIFF", b"AIFC"):
+        if len(data) < 12:
+            raise ValueError("AIFF file is truncated")
+        return None
+    common = None
+    sound_available = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack(">I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"COMM":
+            common = data[offset + 8:offset + 8 + size]
+        elif chunk_id == b"SSND":
+            sound_available = min(size, len(data) - offset - 8) - 8
+        offset += 8 + size + (size & 1)
+    if common is None or len(common) < 18:
+        raise ValueError("AIFF file has no valid COMM chunk")
+    if sound_available is None:
+        raise ValueError("AIFF file has no SSND chunk")
+
+    channels, frame_count, bits = struct.unpack(">hIh", common[:8])
+    sample_rate = int(round(extended_to_float(common[8:18])))
+    if channels < 1 or not sample_rate or not 1 <= bits <= 32:
+        raise ValueError("AIFF COMM chunk is invalid")
+    compressed = data[8:12] == b"AIFC" and common[18:22] not in (b"NONE", b"sowt")
+    expected = frame_count * channels * ((bits + 7) // 8)
+    if not compressed and sound_available < expected:
+        raise ValueError(f"AIFF file is truncated: {max(0, sound_available)} of {expected} sample bytes present")
+    return AudioInfo("aiff", sample_rate, channels, frame_count / sample_rate)
+
+def _sniff_flac(data: bytes) -> AudioInfo:
+    # The mandatory STREAMINFO block comes first: 4-byte block header, 34 bytes of data
+    if len(data) < 42 or data[4] & 0x7F != 0:
+        raise ValueError("FLAC file has no STREAMINFO block")
+    bits = int.from_bytes(data[18:26], "big")
+    sample_rate = bits >> 44
+    channels = ((bits >> 41) & 0x7) + 1
+    total_samples = bits & ((1 << 36) - 1)
+    if not sample_rate:
+        raise ValueError("FLAC STREAMINFO block is invalid")
+    duration = total_samples / sample_rate if total_samples else None
+    return AudioInfo("flac", sample_rate, channels, duration)
+
+def _ogg_page_length(data: bytes, offset: int) -> int:
+    segments = data[offset + 26] if offset + 27 <= len(data) else 0
+    lacing = data[offset + 27:offset + 27 + segments]
+    if len(lacing) < segments:
+        return len(data) - offset + 1
+    return 27 + segments + sum(lacing)
+
+def _sniff_ogg(data: bytes) -> AudioInfo:
+    if len(data) < 28 or data[4] != 0:
+        raise ValueError("Ogg file is truncated or has an unknown version")
+    payload = data[27 + data[26]:]
+    sample_rate = channels = None
+    pre_skip = 0
+    if payload[:7] == b"\x01vorbis" and len(payload) >= 16:
+        channels = payload[11]
+        sample_rate = struct.unpack("<I", payload[12:16])[0]
+    elif payload[:8] == b"OpusHead" and len(payload) >= 12:
+        # Opus granule positions always count 48 kHz samples
+        channels = payload[9]
+        pre_skip = struct.unpack("<H", payload[10:12])[0]
+        sample_rate = 48000
+    elif payload[:5] == b"\x7fFLAC" and len(payload) >= 51:
+        flac = _sniff_flac(payload[9:])
+        channels, sample_rate = flac.channels, flac.sample_rate
+
+    last = data.rfind(b"OggS", max(0, len(data) - OGG_TAIL_BYTES))
+    if last + _ogg_page_length(data, last) > len(data):
+        raise ValueError("Ogg file is truncated: last page is incomplete")
+    duration = None
+    granule = struct.unpack("<q", data[last + 6:last + 14])[0]
+    if sample_rate and granule > 0:
+        duration = max(0, granule - pre_skip) / sample_rate
+    return AudioInfo("ogg", sample_rate, channels, duration)
+
+def _id3_size(data: bytes) -> int:
+    """Length of a leading ID3v2 tag, including its header and footer."""
+    if len(data) < 10:
+        raise ValueError("ID3 tag is truncated")
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+def _is_frame_sync(data: bytes, offset: int) -> bool:
+    return offset + 1 < len(data) and data[offset] == 0xFF and data[offset + 1] & 0xE0 == 0xE0
+
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# Bitrates in kbps by (MPEG-1?, layer)
+_MPEG_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_BITRATES[(False, 3)] = _MPEG_BITRATES[(False, 2)]
+_ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+def _mpeg_frame(data: bytes, offset: int) -> Optional[tuple[int, int, int, int, int]]:
+    """Parse an MPEG audio frame header: (length, samples, sample_rate, channels, kbps)."""
+    if offset + 4 > len(data) or not _is_frame_sync(data, offset):
+        return None
+    version = (data[offset + 1] >> 3) & 0x3
+    layer = 4 - ((data[offset + 1] >> 1) & 0x3)
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    kbps = _MPEG_BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (data[offset + 2] >> 1) & 0x1
+    channels = 1 if data[offset + 3] >> 6 == 3 else 2
+    if layer == 1:
+        return (12 * kbps * 1000 // sample_rate + padding) * 4, 384, sample_rate, channels, kbps
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * kbps * 1000 // sample_rate + padding, samples, sample_rate, channels, kbps
+
+def _adts_frame(data: bytes, offset: int) -> Optional[tuple[int, int, int, int]]:
+    """Parse an ADTS header: (length, samples, sample_rate, channels)."""
+    if offset + 7 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xF6 != 0xF0:
+        return None
+    rate_index = (data[offset + 2] >> 2) & 0xF
+    if rate_index >= len(_ADTS_SAMPLE_RATES):
+        return None
+    channels = ((data[offset + 2] & 0x1) << 2) | (data[offset + 3] >> 6)
+    length = ((data[offset + 3] & 0x3) << 11) | (data[offset + 4] << 3) | (data[offset + 5] >> 5)
+    if length < 7:
+        return None
+    samples = 1024 * ((data[offset + 6] & 0x3) + 1)
+    return length, samples, _ADTS_SAMPLE_RATES[rate_index], channels or None
+
+def _sniff_frames(data: bytes, offset: int) -> AudioInfo:
+    """Detect MP3 or ADTS AAC from the first frame after an optional ID3 tag."""
+    if offset >= len(data):
+        raise ValueError("ID3 tag is not followed by any audio")
+    start = offset
+    limit = min(len(data), offset + SYNC_SEARCH_BYTES)
+    while 0 <= start < limit and not (_adts_frame(data, start) or _mpeg_frame(data, start)):
+        start = data.find(b"\xff", start + 1, limit)
+    if not 0 <= start < limit:
+        raise ValueError("No valid MP3 or AAC frame found")
+
+    if _adts_frame(data, start):
+        return _sniff_adts(data, start)
+
+    length, samples, sample_rate, channels, kbps = _mpeg_frame(data, start)
+    _check_next_frame(data, start, length, _mpeg_frame, "MP3")
+    duration = (len(data) - start) * 8 / (kbps * 1000)
+    # A Xing/Info or VBRI header in the first frame carries the exact frame
+    # count, and usually the stream size, which reveals a truncated upload
+    mpeg1 = (data[start + 1] >> 3) & 0x3 == 3
+    side_info = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    xing = start + 4 + side_info
+    declared_bytes = None
+    if data[xing:xing + 4] in (b"Xing", b"Info") and len(data) >= xing + 16:
+        flags = data[xing + 7]
+        fields = struct.unpack(">II", data[xing + 8:xing + 16])
+        if flags & 0x1:
+            duration = fields[0] * samples / sample_rate
+        if flags & 0x2:
+            declared_bytes = fields[1] if flags & 0x1 else fields[0]
+    elif data[start + 36:start + 40] == b"VBRI" and len(data) >= start + 54:
+        declared_bytes, frame_count = struct.unpack(">II", data[start + 46:start + 54])
+        duration = frame_count * samples / sample_rate
+    if declared_bytes and len(data) - start < declared_bytes - length:
+        raise ValueError(f"MP3 file is truncated: {len(data) - start} of {declared_bytes} bytes present")
+    return AudioInfo("mp3", sample_rate, channels, duration)
+
+def _sniff_adts(data: bytes, start: int) -> AudioInfo:
+    length, samples, sample_rate, channels = _adts_frame(data, start)
+    _check_next_frame(data, start, length, _adts_frame, "AAC")
+    # Estimate the frame count from the average size of the first frames
+    offset, frames = start, 0
+    while frames < ADTS_SAMPLE_FRAMES:
+        frame = _adts_frame(data, offset)
+        if frame is None or offset + frame[0] > len(data):
+            break
+        offset += frame[0]
+        frames += 1
+    duration = (len(data) - start) / ((offset - start) / frames) * samples / sample_rate
+    return AudioInfo("aac", sample_rate, channels, duration)
+
+def _check_next_frame(data: bytes, offset: int, length: int, parse, name: str) -> None:
+    """The first frame must be complete and, if more data follows, be followed by another frame."""
+    end = offset + length
+    if end > len(data):
+        raise ValueError(f"{name} file is truncated: first frame is incomplete")
+    # Trailing ID3v1 or APE tags may follow a single frame
+    if end + 4 <= len(data) and data[end:end + 3] not in (b"TAG", b"APE") and parse(data, end) is None:
+        raise ValueError(f"{name} file is corrupt: no frame follows the first one")
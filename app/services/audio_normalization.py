@@ -0,0 +1,73 @@
+from app.services.pcm_audio import PcmAudio, frame_energy, from_float_samples, to_mono
+import numpy as np
+
+# Speech recognition gains nothing above 16 kHz mono
+TARGET_SAMPLE_RATE = 16000
+# Filter taps per unit of decimation ratio; more taps give a sharper cutoff
+TAPS_PER_RATIO = 16
+# Samples filtered per FFT block
+FILTER_BLOCK = 1 << 16
+
+def _lowpass_filter(cutoff: float, taps: int) -> np.ndarray:
+    """Blackman-windowed sinc low-pass; cutoff in cycles per sample."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return (h / h.sum()).astype(np.float32)
+
+def _filter(signal: np.ndarray, h: np.ndarray) -> np.ndarray:
+    """Convolve with h by FFT overlap-add, compensating the filter delay."""
+    n_fft = 1 << int(np.ceil(np.log2(FILTER_BLOCK + len(h) - 1)))
+    h_fft = np.fft.rfft(h, n_fft)
+    out = np.zeros(len(signal) + len(h) - 1, dtype=np.float32)
+    for start in range(0, len(signal), FILTER_BLOCK):
+        block = signal[start:start + FILTER_BLOCK]
+        filtered = np.fft.irfft(np.fft.rfft(block, n_fft) * h_fft, n_fft)[:len(block) + len(h) - 1]
+        out[start:start + len(filtered)] += filtered
+    delay = (len(h) - 1) // 2
+    return out[delay:delay + len(signal)]
+
+def resample(mono: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Downsample float samples from source_rate to target_rate.
+
+    The signal is low-passed below the new Nyquist frequency to avoid
+    aliasing, then linearly interpolated at the new sample times. Upsampling
+    is not supported; the samples are returned unchanged instead.
+    """
+    if target_rate >= source_rate or not len(mono):
+        return mono
+    ratio = source_rate / target_rate
+    taps = int(TAPS_PER_RATIO * ratio) | 1
+    filtered = _filter(mono, _lowpass_filter(0.45 / ratio, taps))
+    positions = np.arange(int(len(mono) / ratio)) * ratio
+    return np.interp(positions, np.arange(len(mono)), filtered).astype(np.float32)
+
+def trim_silence(mono: np.ndarray, sample_rate: int, threshold_db: float, padding_seconds: float) -> np.ndarray:
+    """
+    Drop leading and trailing audio quieter than threshold_db (dBFS).
+
+    padding_seconds of the quiet part is kept on each side so word onsets
+    and tails are not clipped. All-quiet audio is returned unchanged.
+    """
+    energies, frame_length = frame_energy(mono, sample_rate)
+    loud = np.flatnonzero(energies > 10 ** (threshold_db / 10))
+    if not len(loud):
+        return mono
+    padding = int(padding_seconds * sample_rate)
+    start = max(0, loud[0] * frame_length - padding)
+    end = min(len(mono), (loud[-1] + 1) * frame_length + padding)
+    return mono[start:end]
+
+def normalize_audio(
+    audio: PcmAudio,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+    silence_threshold_db: float = -45.0,
+    padding_seconds: float = 0.25
+) -> PcmAudio:
+    """Downmix to mono, downsample to sample_rate and trim silence, as 16-bit PCM."""
+    mono = to_mono(audio)
+    rate = audio.sample_rate
+    if rate > sample_rate:
+        mono, rate = resample(mono, rate, sample_rate), sample_rate
+    mono = trim_silence(mono, rate, silence_threshold_db, padding_seconds)
+    return from_float_samples(mono, rate)
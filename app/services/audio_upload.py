@@ -0,0 +1,50 @@
+from fastapi import HTTPException, UploadFile
+import binascii
+
+# Chunk sizes for reading uploads and base64-encoding them; the encode chunk
+# must be a multiple of 3 so chunk outputs concatenate without padding.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
+
+def file_too_large(max_size: int, status_code: int = 400) -> HTTPException:
+    """Error raised when an upload exceeds the configured size limit."""
+    return HTTPException(
+        status_code=status_code,
+        detail=f"File size exceeds maximum limit of {max_size // (1024 * 1024)}MB"
+    )
+
+async def read_upload(file: UploadFile, max_size: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytearray:
+    """
+    Read an uploaded file in chunks, rejecting it as soon as it passes max_size.
+
+    When the upload size is known up front the buffer is allocated once and
+    filled in place instead of being grown chunk by chunk.
+    """
+    declared_size = file.size
+    if declared_size is not None and declared_size > max_size:
+        raise file_too_large(max_size)
+
+    buffer = bytearray(declared_size or 0)
+    received = 0
+    while chunk := await file.read(chunk_size):
+        end = received + len(chunk)
+        if end > max_size:
+            raise file_too_large(max_size)
+        buffer[received:end] = chunk
+        received = end
+
+    # The declared size is only a hint; trim if the file turned out shorter
+    if received < len(buffer):
+        del buffer[received:]
+    return buffer
+
+def encode_base64(data: bytes, chunk_size: int = BASE64_CHUNK_SIZE) -> str:
+    """Base64-encode data chunk by chunk into a single preallocated buffer."""
+    buffer = bytearray(4 * ((len(data) + 2) // 3))
+    view = memoryview(data)
+    offset = 0
+    for start in range(0, len(data), chunk_size):
+        encoded = binascii.b2a_base64(view[start:start + chunk_size], newline=False)
+        buffer[offset:offset + len(encoded)] = encoded
+        offset += len(encoded)
+    return buffer.decode("ascii")
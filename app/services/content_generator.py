@@ -1,5 +1,12 @@
-from openai import OpenAI
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional, Tuple
+from app.services.gemini_pool import GeminiPool, get_gemini_pool
+from app.config import env_bool, env_float, env_int
+from app.services.text_chunking import estimate_tokens, split_text
+from app.services.partial_json import partial_json_string
+from app.services.transcript_compaction import compact_transcript
+from app.services.metrics import TRANSCRIPT_CHARS_REMOVED, record_payload, track_stage
+from app.services.model_router import estimate_audio_tokens, model_router
+import asyncio
 import logging
 import os
 import json
@@ -8,14 +15,24 @@ logger = logging.getLogger(__name__)
 
 class ContentGenerator:
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.api_key = os.getenv("GEMINI_API_KEYS") or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
-            
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
+
+        # Per-call timeout for content generation requests, in seconds
+        self.timeout = env_float("GEMINI_GENERATION_TIMEOUT", 60.0)
+
+        # Transcripts are stripped of timestamps, repeats and filler, then capped in size
+        self.compaction_enabled = env_bool("TRANSCRIPT_COMPACTION", True)
+        self.max_transcript_tokens = env_int("TRANSCRIPT_MAX_TOKENS", 250000)
+
+        # Long transcriptions are summarized section by section before the final call
+        self.map_reduce_threshold_tokens = env_int("CONTENT_MAP_REDUCE_THRESHOLD_TOKENS", 24000)
+        self.map_chunk_tokens = env_int("CONTENT_MAP_CHUNK_TOKENS", 8000)
+        self.map_concurrency = env_int("CONTENT_MAP_CONCURRENCY", 8)
+        self.section_prompt = """You are summarizing one section of a longer voice note or video transcription.
+        Write a dense summary of this section only, keeping key points, names, numbers,
+        decisions and open questions. Do not add an introduction or conclusion."""
         
         self.tools = [
             {
@@ -47,54 +64,49 @@ class ContentGenerator:
             }
         ]
 
-    async def generate_content(self, transcription: str) -> Dict[str, str]:
+        # Single-pass mode: the same note fields plus the transcription, from the audio itself
+        note_parameters = self.tools[0]["function"]["parameters"]
+        self.voice_note_tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": "generate_voice_note",
+                    "description": "Transcribe a voice note and generate its emoji, title, and summary.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "transcription": {
+                                "type": "string",
+                                "description": "A complete, verbatim transcription of the audio in a clear format"
+                            },
+                            **note_parameters["properties"]
+                        },
+                        "required": ["transcription", *note_parameters["required"]],
+                        "additionalProperties": False
+                    },
+                    "strict": True
+                }
+            }
+        ]
+
+    @property
+    def pool(self) -> GeminiPool:
+        """Shared Gemini client pool"""
+        return get_gemini_pool()
+
+    async def generate_content(self, transcription: str, timeout: Optional[float] = None, route: Optional[str] = None) -> Dict[str, str]:
         """
         Generate emoji, title, and summary from transcribed text
+
+        Transcriptions above the map-reduce threshold are summarized section by
+        section in parallel first, and the note is generated from those summaries.
+        The model for each call is routed by the size of its prompt.
         """
         try:
-            system_prompt = """You are an AI assistant specialized in processing voice notes.
-            Your task is to:
-            1. Choose a single emoji that best represents the note's theme or topic
-            2. Create a clear, contextual title that reflects the content
-            3. Generate a comprehensive summary that:
-               - Captures the key points and main ideas
-               - Provides essential context and significance
-               - Is 2-3 paragraphs long
-               - Includes important details and implications
-               - Makes the content clear and understandable
-               
-            Focus on creating a summary that helps readers quickly understand 
-            the full context and importance of the voice note."""
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please process this voice note transcription: {transcription}"}
-            ]
-
-            response = self.client.chat.completions.create(
-                model="gemini-2.0-flash",
-                messages=messages,
-                tools=self.tools,
-                tool_choice={"type": "function", "function": {"name": "generate_note_content"}},
-                temperature=0.7
-            )
-
-            if not hasattr(response.choices[0].message, 'tool_calls') or not response.choices[0].message.tool_calls:
-                raise ValueError("No function call received from the model")
-
-            tool_call = response.choices[0].message.tool_calls[0]
-            if tool_call.function.name != "generate_note_content":
-                raise ValueError(f"Unexpected function call: {tool_call.function.name}")
-
-            try:
-                content = json.loads(tool_call.function.arguments)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Failed to parse function arguments: {e}")
-
-            required_fields = ["emoji", "title", "summary"]
-            for field in required_fields:
-                if field not in content:
-                    raise ValueError(f"Missing required field: {field}")
+            timeout = timeout or self.timeout
+            user_content = await self._prepare_user_content(transcription, timeout, route)
+            model = model_router.for_text("generation", user_content, route)
+            content = await self._request_note_content(user_content, timeout, model)
 
             return {
                 "emoji": content["emoji"],
@@ -105,4 +117,217 @@ class ContentGenerator:
 
         except Exception as e:
             logger.error(f"Error in generate_content: {str(e)}")
-            raise ValueError(f"Failed to generate content: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to generate content: {str(e)}")
+
+    async def generate_from_audio(
+        self,
+        base64_audio: str,
+        format_name: str,
+        timeout: Optional[float] = None,
+        duration: Optional[float] = None,
+        route: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Transcribe audio and generate emoji, title, and summary in one call
+
+        The audio is sent once and the model answers through a tool with all
+        four fields. Raises ValueError if any of them is missing or empty, so
+        the caller can fall back to transcribing and generating separately.
+        """
+        user_content = [
+            {"type": "text", "text": "Please transcribe and process this voice note."},
+            {"type": "input_audio", "input_audio": {"data": base64_audio, "format": format_name}}
+        ]
+        model = model_router.select("voice_note", estimate_audio_tokens(duration, len(base64_audio) * 3 // 4), route)
+        with track_stage("gemini_voice_note", upstream="gemini", model=model):
+            response = await self.pool.call(lambda client: client.chat.completions.create(
+                model=model,
+                messages=self._note_messages(user_content),
+                tools=self.voice_note_tools,
+                tool_choice={"type": "function", "function": {"name": "generate_voice_note"}},
+                temperature=0.3,
+                timeout=timeout or self.timeout
+            ), kind="voice_note")
+
+        message = response.choices[0].message if response.choices else None
+        if not message or not message.tool_calls:
+            raise ValueError("No function call received from the model")
+
+        fields = ("emoji", "title", "transcription", "summary")
+        content = self._parse_note_arguments(message.tool_calls[0].function.arguments, fields)
+        for field in fields:
+            if not isinstance(content[field], str) or not content[field].strip():
+                raise ValueError(f"Empty required field: {field}")
+        return {field: content[field].strip() for field in fields}
+
+    async def stream_content(
+        self,
+        transcription: str,
+        timeout: Optional[float] = None,
+        route: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+        """
+        Stream emoji, title, and summary as the model produces them
+
+        Yields ("metadata", {"emoji", "title"}) once both are known, then
+        ("summary", {"delta"}) for each new piece of the summary, and finally
+        ("content", ...) with the same fields generate_content returns.
+        """
+        try:
+            timeout = timeout or self.timeout
+            user_content = await self._prepare_user_content(transcription, timeout, route)
+            model = model_router.for_text("generation", user_content, route)
+            with track_stage("gemini_generation_stream", upstream="gemini", model=model):
+                stream = await self.pool.call(lambda client: client.chat.completions.create(
+                    model=model,
+                    messages=self._note_messages(user_content),
+                    tools=self.tools,
+                    tool_choice={"type": "function", "function": {"name": "generate_note_content"}},
+                    temperature=0.7,
+                    timeout=timeout,
+                    stream=True
+                ), kind="generation_stream", hedge=False)
+
+            arguments = ""
+            metadata_sent = False
+            summary_sent = 0
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.tool_calls:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls:
+                    if tool_call.function and tool_call.function.arguments:
+                        arguments += tool_call.function.arguments
+
+                if not metadata_sent:
+                    emoji, emoji_done = partial_json_string(arguments, "emoji")
+                    title, title_done = partial_json_string(arguments, "title")
+                    if not (emoji_done and title_done):
+                        continue
+                    metadata_sent = True
+                    yield "metadata", {"emoji": emoji, "title": title}
+
+                summary, _ = partial_json_string(arguments, "summary")
+                if summary and len(summary) > summary_sent:
+                    yield "summary", {"delta": summary[summary_sent:]}
+                    summary_sent = len(summary)
+
+            content = self._parse_note_arguments(arguments)
+            if not metadata_sent:
+                yield "metadata", {"emoji": content["emoji"], "title": content["title"]}
+            if len(content["summary"]) > summary_sent:
+                yield "summary", {"delta": content["summary"][summary_sent:]}
+
+            yield "content", {
+                "emoji": content["emoji"],
+                "title": content["title"],
+                "transcription": transcription,
+                "summary": content["summary"]
+            }
+
+        except Exception as e:
+            logger.error(f"Error in stream_content: {str(e)}")
+            raise ValueError(f"Failed to generate content: {str(e)}")
+
+    async def _compact(self, transcription: str) -> str:
+        """Compact the transcription off the event loop and record what was removed"""
+        with track_stage("transcript_compaction"):
+            compacted = await asyncio.to_thread(compact_transcript, transcription, self.max_transcript_tokens)
+        for reason, chars in compacted.removed.items():
+            if chars > 0:
+                TRANSCRIPT_CHARS_REMOVED.inc(chars, reason=reason)
+        record_payload("transcript_original", compacted.original_chars)
+        record_payload("transcript_compacted", len(compacted.text))
+        # A transcript that was nothing but markup is sent as it came
+        return compacted.text or transcription
+
+    async def _prepare_user_content(self, transcription: str, timeout: float, route: Optional[str] = None) -> str:
+        """Build the note prompt, compacting the transcription and condensing long ones with map-reduce first"""
+        if self.compaction_enabled:
+            transcription = await self._compact(transcription)
+        if estimate_tokens(transcription) <= self.map_reduce_threshold_tokens:
+            return f"Please process this voice note transcription: {transcription}"
+
+        section_summaries = await self._summarize_sections(transcription, timeout, route)
+        return (
+            "Please process this voice note transcription, given as summaries "
+            f"of its consecutive sections: {section_summaries}"
+        )
+
+    def _note_messages(self, user_content) -> list:
+        system_prompt = """You are an AI assistant specialized in processing voice notes.
+        Your task is to:
+        1. Choose a single emoji that best represents the note's theme or topic
+        2. Create a clear, contextual title that reflects the content
+        3. Generate a comprehensive summary that:
+           - Captures the key points and main ideas
+           - Provides essential context and significance
+           - Is 2-3 paragraphs long
+           - Includes important details and implications
+           - Makes the content clear and understandable
+           
+        Focus on creating a summary that helps readers quickly understand 
+        the full context and importance of the voice note."""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+
+    async def _request_note_content(self, user_content: str, timeout: float, model: str) -> Dict[str, str]:
+        """Ask the model for emoji, title and summary via the note content tool"""
+        with track_stage("gemini_generation", upstream="gemini", model=model):
+            response = await self.pool.call(lambda client: client.chat.completions.create(
+                model=model,
+                messages=self._note_messages(user_content),
+                tools=self.tools,
+                tool_choice={"type": "function", "function": {"name": "generate_note_content"}},
+                temperature=0.7,
+                timeout=timeout
+            ), kind="generation")
+
+        if not hasattr(response.choices[0].message, 'tool_calls') or not response.choices[0].message.tool_calls:
+            raise ValueError("No function call received from the model")
+
+        tool_call = response.choices[0].message.tool_calls[0]
+        if tool_call.function.name != "generate_note_content":
+            raise ValueError(f"Unexpected function call: {tool_call.function.name}")
+
+        return self._parse_note_arguments(tool_call.function.arguments)
+
+    def _parse_note_arguments(self, arguments: str, required_fields: Tuple[str, ...] = ("emoji", "title", "summary")) -> Dict[str, str]:
+        try:
+            content = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse function arguments: {e}")
+
+        for field in required_fields:
+            if field not in content:
+                raise ValueError(f"Missing required field: {field}")
+
+        return content
+
+    async def _summarize_sections(self, transcription: str, timeout: float, route: Optional[str] = None) -> str:
+        """Map step: summarize token-budgeted sections concurrently, in order"""
+        sections = split_text(transcription, self.map_chunk_tokens)
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize(index: int, section: str) -> str:
+            model = model_router.for_text("section_summary", section, route)
+            async with semaphore:
+                with track_stage("gemini_section_summary", upstream="gemini", model=model):
+                    response = await self.pool.call(lambda client: client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": self.section_prompt},
+                            {"role": "user", "content": f"Section {index + 1} of {len(sections)}:\n{section}"}
+                        ],
+                        temperature=0.3,
+                        timeout=timeout
+                    ), kind="section_summary")
+            if not response.choices or not response.choices[0].message.content:
+                raise ValueError(f"No summary received for section {index + 1}")
+            return response.choices[0].message.content.strip()
+
+        summaries = await asyncio.gather(*(summarize(i, section) for i, section in enumerate(sections)))
+        logger.info(f"Summarized {len(sections)} sections of a {estimate_tokens(transcription)}-token transcription")
+        return "\n\n".join(f"[Section {i + 1}] {summary}" for i, summary in enumerate(summaries))
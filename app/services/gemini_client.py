@@ -0,0 +1,29 @@
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from app.config import env_float, env_int
+import httpx
+
+DEFAULT_GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+def build_gemini_client(api_key: str, base_url: str = DEFAULT_GEMINI_BASE_URL, max_retries: int = 0) -> AsyncOpenAI:
+    """
+    Build an async Gemini client with its own pooled HTTP connections.
+
+    Retries default to off: GeminiPool decides where a failed call goes next.
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=env_int("GEMINI_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=env_int("GEMINI_MAX_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=env_float("GEMINI_KEEPALIVE_EXPIRY", 30.0)
+        ),
+        timeout=httpx.Timeout(
+            env_float("GEMINI_TIMEOUT", 60.0),
+            connect=env_float("GEMINI_CONNECT_TIMEOUT", 10.0)
+        )
+    )
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        max_retries=max_retries
+    )
@@ -0,0 +1,351 @@
+from collections import deque
+from email.utils import parsedate_to_datetime
+from openai import AsyncOpenAI
+from typing import Awaitable, Callable, Deque, Dict, FrozenSet, List, Optional, TypeVar
+from urllib.parse import urlparse
+from app.config import env_float, env_int
+from app.services.gemini_client import DEFAULT_GEMINI_BASE_URL, build_gemini_client
+from app.services.metrics import UPSTREAM_HEDGES, UPSTREAM_RETRIES
+import asyncio
+import logging
+import math
+import openai
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt; 429 is handled by moving to another member
+DEFAULT_RETRY_STATUSES = frozenset({408, 500, 502, 503, 504})
+# Shortest time a throttled member sits out, whatever its Retry-After says
+MIN_THROTTLE_COOLDOWN = 1.0
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls of one kind."""
+
+    def __init__(self, size: int = 256):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class HedgeBudget:
+    """
+    Token bucket that keeps hedges to a fraction of all calls.
+
+    Every call deposits ratio tokens and every hedge spends one, so over
+    time at most ratio extra requests are sent per call; burst caps how
+    many unspent tokens can pile up during quiet periods.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class PoolMember:
+    """One API key / base URL pair with its own client and load counters."""
+
+    def __init__(self, name: str, client: AsyncOpenAI):
+        self.name = name
+        self.client = client
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.cooldown_until = 0.0
+        self.busy_seconds = 0.0
+        self.call_seconds = 0.0
+        self._busy_since = 0.0
+
+    def __repr__(self) -> str:
+        return f"PoolMember({self.name!r})"
+
+    def available(self, now: float) -> bool:
+        return self.cooldown_until <= now
+
+    def begin(self) -> float:
+        now = time.monotonic()
+        if self.in_flight == 0:
+            self._busy_since = now
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.requests += 1
+        return now
+
+    def end(self, started: float) -> None:
+        now = time.monotonic()
+        self.in_flight -= 1
+        self.call_seconds += now - started
+        if self.in_flight == 0:
+            self.busy_seconds += now - self._busy_since
+
+    def throttle(self, seconds: float) -> None:
+        self.throttled += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    def stats(self, uptime: float) -> Dict[str, float]:
+        now = time.monotonic()
+        busy = self.busy_seconds + (now - self._busy_since if self.in_flight else 0.0)
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "cooling_down": int(not self.available(now)),
+            # Share of time with at least one call open, and mean open calls
+            "utilization": round(busy / uptime, 4) if uptime else 0.0,
+            "mean_concurrency": round(self.call_seconds / uptime, 4) if uptime else 0.0
+        }
+
+class GeminiPool:
+    """
+    Gemini clients for several API keys and/or base URLs, used as one.
+
+    Each call goes to the member with the fewest calls in flight, skipping
+    members that recently answered 429. A throttled call moves straight to
+    another member; connection errors and retry_statuses responses are
+    retried with full-jitter exponential backoff. Both kinds of retry count
+    towards max_retries.
+
+    Calls that are still running after the hedge_quantile latency of recent
+    calls of the same kind are hedged: a duplicate goes to another member
+    and whichever answers first wins. Hedges are limited to hedge_budget
+    extra requests per call across the whole pool; a budget of 0 disables
+    hedging.
+    """
+
+    def __init__(
+        self,
+        members: List[PoolMember],
+        max_retries: int = 2,
+        throttle_cooldown: float = 30.0,
+        retry_statuses: FrozenSet[int] = DEFAULT_RETRY_STATUSES,
+        backoff_base: float = 0.25,
+        backoff_max: float = 8.0,
+        hedge_budget: float = 0.05,
+        hedge_burst: float = 10.0,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.05
+    ):
+        if not members:
+            raise ValueError("GeminiPool needs at least one member")
+        self.members = members
+        self.max_retries = max_retries
+        self.throttle_cooldown = throttle_cooldown
+        self.retry_statuses = retry_statuses
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.budget = HedgeBudget(hedge_budget, hedge_burst)
+        self.latencies: Dict[str, LatencyWindow] = {}
+        self._random = random.Random()
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> "GeminiPool":
+        keys = _split(os.getenv("GEMINI_API_KEYS")) or _split(os.getenv("GEMINI_API_KEY"))
+        if not keys:
+            raise ValueError("GEMINI_API_KEY environment variable is not set")
+        base_urls = _split(os.getenv("GEMINI_BASE_URLS")) or [os.getenv("GEMINI_BASE_URL", DEFAULT_GEMINI_BASE_URL)]
+        members = [
+            PoolMember(f"key{i + 1}@{urlparse(base_url).netloc}", build_gemini_client(key, base_url))
+            for i, key in enumerate(keys)
+            for base_url in base_urls
+        ]
+        retry_statuses = _split(os.getenv("GEMINI_RETRY_STATUSES"))
+        return cls(
+            members,
+            max_retries=env_int("GEMINI_MAX_RETRIES", 2),
+            throttle_cooldown=env_float("GEMINI_THROTTLE_COOLDOWN", 30.0),
+            retry_statuses=frozenset(map(int, retry_statuses)) if retry_statuses else DEFAULT_RETRY_STATUSES,
+            backoff_base=env_float("GEMINI_BACKOFF_BASE", 0.25),
+            backoff_max=env_float("GEMINI_BACKOFF_MAX", 8.0),
+            hedge_budget=env_float("GEMINI_HEDGE_BUDGET", 0.05),
+            hedge_burst=env_float("GEMINI_HEDGE_BURST", 10.0),
+            hedge_quantile=env_float("GEMINI_HEDGE_QUANTILE", 0.95),
+            hedge_min_samples=env_int("GEMINI_HEDGE_MIN_SAMPLES", 20),
+            hedge_min_delay=env_float("GEMINI_HEDGE_MIN_DELAY", 0.05)
+        )
+
+    def _pick(self, exclude: Optional[PoolMember] = None) -> PoolMember:
+        now = time.monotonic()
+        candidates = [member for member in self.members if member is not exclude] or self.members
+        available = [member for member in candidates if member.available(now)]
+        if not available:
+            # Everyone is throttled; the member that recovers first is the best bet
+            return min(candidates, key=lambda member: member.cooldown_until)
+        return min(available, key=lambda member: (member.in_flight, member.requests))
+
+    def _cooldown(self, error: openai.RateLimitError) -> float:
+        """Seconds a throttled member sits out, from Retry-After (seconds or HTTP date) if usable."""
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        return max(_retry_after_seconds(retry_after, self.throttle_cooldown), MIN_THROTTLE_COOLDOWN)
+
+    def _retryable(self, error: Exception) -> bool:
+        # Timeouts are connection errors in the SDK
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in self.retry_statuses
+
+    def _backoff(self, retries: int) -> float:
+        """Full jitter: a uniform wait up to the exponential backoff ceiling."""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retries))
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """How long a call of this kind may run before it is hedged, or None to not hedge."""
+        window = self.latencies.get(kind)
+        if self.budget.ratio <= 0 or window is None or len(window) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, window.quantile(self.hedge_quantile))
+
+    async def _attempt(self, member: PoolMember, request: Callable[[AsyncOpenAI], Awaitable[T]], kind: str) -> T:
+        started = member.begin()
+        try:
+            result = await request(member.client)
+        except openai.RateLimitError as e:
+            member.throttle(self._cooldown(e))
+            logger.warning(f"Gemini member {member.name} is rate limited; taking it out of rotation")
+            raise
+        except openai.APIError:
+            member.errors += 1
+            raise
+        finally:
+            member.end(started)
+        self.latencies.setdefault(kind, LatencyWindow()).add(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, request: Callable[[AsyncOpenAI], Awaitable[T]], kind: str, hedge: bool) -> T:
+        """One attempt, plus a duplicate on another member if it runs past the hedge delay."""
+        self.budget.deposit()
+        primary = self._pick()
+        delay = self.hedge_delay(kind) if hedge else None
+        if delay is None:
+            return await self._attempt(primary, request, kind)
+
+        tasks = [asyncio.create_task(self._attempt(primary, request, kind))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.budget.withdraw():
+                    tasks.append(asyncio.create_task(self._attempt(self._pick(exclude=primary), request, kind)))
+                else:
+                    UPSTREAM_HEDGES.inc(upstream="gemini", kind=kind, outcome="over_budget")
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            outcome = "won" if task is tasks[1] else "lost"
+                            UPSTREAM_HEDGES.inc(upstream="gemini", kind=kind, outcome=outcome)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def call(self, request: Callable[[AsyncOpenAI], Awaitable[T]], kind: str = "default", hedge: bool = True) -> T:
+        """
+        Run request(client) on the least-loaded member, moving on after 429s,
+        retrying transient errors and hedging slow calls.
+
+        kind groups calls with similar latency for the hedge delay; pass
+        hedge=False for requests that must not be sent twice, such as streams.
+        """
+        retries = 0
+        while True:
+            try:
+                return await self._hedged(request, kind, hedge)
+            except openai.RateLimitError:
+                # The throttled member is cooling down, so the next attempt goes elsewhere at once
+                if retries >= self.max_retries or not any(member.available(time.monotonic()) for member in self.members):
+                    raise
+                UPSTREAM_RETRIES.inc(upstream="gemini", reason="429")
+                retries += 1
+            except openai.APIError as e:
+                if retries >= self.max_retries or not self._retryable(e):
+                    raise
+                UPSTREAM_RETRIES.inc(upstream="gemini", reason=getattr(e, "status_code", None) or type(e).__name__)
+                logger.info(f"Retrying Gemini {kind} call after {type(e).__name__}")
+                await asyncio.sleep(self._backoff(retries))
+                retries += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        uptime = time.monotonic() - self._started
+        return {member.name: member.stats(uptime) for member in self.members}
+
+    async def close(self) -> None:
+        await asyncio.gather(*(member.client.close() for member in self.members))
+
+def _retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Parse a Retry-After header given as seconds or as an HTTP date; default if absent or invalid."""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+        return seconds if math.isfinite(seconds) else default
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError, IndexError):
+        return default
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+_pool: Optional[GeminiPool] = None
+
+def get_gemini_pool() -> GeminiPool:
+    """
+    Return the process-wide Gemini pool.
+
+    It is built lazily on first use from GEMINI_API_KEYS (or GEMINI_API_KEY)
+    and GEMINI_BASE_URLS (or GEMINI_BASE_URL), with one member per key and
+    base URL combination, and shared by every service that talks to Gemini.
+    """
+    global _pool
+    if _pool is None:
+        _pool = GeminiPool.from_env()
+    return _pool
+
+async def close_gemini_pool() -> None:
+    """Close the shared Gemini pool and its connection pools, if open."""
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    await pool.close()
+
+def gemini_pool_stats() -> Dict[str, Dict[str, float]]:
+    """Per-member utilization of the shared pool; empty until it is first used."""
+    return _pool.stats() if _pool is not None else {}
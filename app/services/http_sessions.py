@@ -0,0 +1,95 @@
+from aiohttp.abc import AbstractResolver, ResolveResult
+from typing import Dict, Iterable, Optional
+from app.config import env_float, env_int
+import aiohttp
+import certifi
+import logging
+import os
+import socket
+import ssl
+
+logger = logging.getLogger(__name__)
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+def get_ssl_context() -> ssl.SSLContext:
+    """Build the certificate bundle once and reuse it for every outbound connection."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=os.getenv("HTTP_CA_FILE") or certifi.where())
+    return _ssl_context
+
+class PinnedResolver(AbstractResolver):
+    """Resolve a host to addresses that were checked earlier instead of looking it up again."""
+
+    def __init__(self, host: str, addresses: Iterable[str]):
+        self.host = host.lower()
+        self.addresses = list(addresses)
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> list[ResolveResult]:
+        if host.lower() != self.host:
+            raise OSError(f"No pinned addresses for {host}")
+        return [
+            ResolveResult(
+                hostname=host, host=address, port=port,
+                family=socket.AF_INET6 if ":" in address else socket.AF_INET,
+                proto=0, flags=socket.AI_NUMERICHOST
+            )
+            for address in self.addresses
+        ]
+
+    async def close(self) -> None:
+        pass
+
+def _create_session(resolver: Optional[AbstractResolver] = None) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        resolver=resolver,
+        ssl=get_ssl_context(),
+        limit=env_int("HTTP_POOL_LIMIT", 100),
+        limit_per_host=env_int("HTTP_POOL_LIMIT_PER_HOST", 20),
+        ttl_dns_cache=env_int("HTTP_DNS_CACHE_TTL", 300),
+        keepalive_timeout=env_float("HTTP_KEEPALIVE_TIMEOUT", 30.0)
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=env_float("HTTP_TOTAL_TIMEOUT", 30.0),
+        connect=env_float("HTTP_CONNECT_TIMEOUT", 10.0)
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def create_pinned_session(host: str, addresses: Iterable[str]) -> aiohttp.ClientSession:
+    """
+    A one-off session that connects to host only at the given addresses.
+
+    The Host header and TLS server name stay those of the URL, so the
+    server sees an ordinary request. The caller closes the session.
+    """
+    return _create_session(PinnedResolver(host, addresses))
+
+def get_http_session(name: str = "default") -> aiohttp.ClientSession:
+    """
+    Return the shared keep-alive session registered under name.
+
+    Sessions are normally opened by the app lifespan; one is created on
+    demand if the registry has not been opened (e.g. in scripts).
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        session = _create_session()
+        _sessions[name] = session
+    return session
+
+async def open_http_sessions(*names: str) -> None:
+    """Open the named sessions (the default one if none given) at startup."""
+    for name in names or ("default",):
+        get_http_session(name)
+
+async def close_http_sessions() -> None:
+    """Close every registered session and its connection pool."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        try:
+            await session.close()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP session: {str(e)}")
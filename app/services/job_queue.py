@@ -0,0 +1,445 @@
+from collections import deque
+from fastapi import HTTPException
+from pydantic import BaseModel
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+from app.config import env_int
+from app.services.http_sessions import create_pinned_session, get_http_session
+from app.services.metrics import API_KEY_REJECTIONS
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Called with the job's params, payload and owner
+JobHandler = Callable[[dict, Optional[bytes], str], Awaitable[BaseModel]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    status_code INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_id TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created_at);
+"""
+
+# Columns added after the first release, which older databases are migrated to
+_MIGRATIONS = {
+    "owner": "ALTER TABLE jobs ADD COLUMN owner TEXT NOT NULL DEFAULT ''",
+    "worker_id": "ALTER TABLE jobs ADD COLUMN worker_id TEXT",
+    "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL"
+}
+
+# Created after the migrated columns exist
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, status);
+"""
+
+class JobQueue:
+    """
+    Durable in-process job queue backed by SQLite.
+
+    Jobs are written to the database on submit, so queued and interrupted
+    jobs are picked up again after a restart. At most max_depth jobs wait
+    at once (0 means no bound); further submits get a 503 with Retry-After. A pool of worker tasks runs
+    them through the handler registered for their kind and stores the
+    result for polling; an optional callback URL is notified on completion.
+    A running job is leased to the queue instance (worker_id) that claimed
+    it, which renews the lease's heartbeat while the job runs; only jobs
+    whose lease has gone lease_seconds without a heartbeat are requeued,
+    so a restart never takes over jobs another live process is running.
+    A job belongs to the API key that submitted it (owner) and can only be
+    polled with that key; a key may have at most max_active jobs queued or
+    running, beyond which submits get a 429.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        workers: int,
+        retention_seconds: int,
+        stats_window: int = 1000,
+        callback_hosts: Iterable[str] = (),
+        max_depth: int = 0,
+        lease_seconds: int = 60
+    ):
+        self.db_path = db_path
+        self.worker_count = workers
+        self.retention_seconds = retention_seconds
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.callback_hosts = {host.strip().lower() for host in callback_hosts if host.strip()}
+        self._handlers: Dict[str, JobHandler] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: list[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._running_ids: set[str] = set()
+        self._stopping = False
+        self._wait_times = deque(maxlen=stats_window)
+        self._run_times = deque(maxlen=stats_window)
+        self.completed = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            db_path=os.getenv("JOB_QUEUE_DB", "jobs.sqlite3"),
+            workers=env_int("JOB_QUEUE_WORKERS", 4),
+            retention_seconds=env_int("JOB_QUEUE_RETENTION_SECONDS", 24 * 3600),
+            callback_hosts=(os.getenv("JOB_CALLBACK_ALLOWED_HOSTS") or "").split(","),
+            max_depth=env_int("JOB_QUEUE_MAX_DEPTH", 100),
+            lease_seconds=env_int("JOB_QUEUE_LEASE_SECONDS", 60)
+        )
+
+    def register_handler(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        """Open the database, requeue jobs with expired leases and start the workers."""
+        await asyncio.to_thread(self._open)
+        await asyncio.to_thread(self._requeue_expired)
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self._heartbeat = asyncio.create_task(self._renew_leases())
+
+    async def stop(self) -> None:
+        """Stop the workers and release the jobs they were running back to the queue."""
+        # Also checked by the workers: wait_for can swallow a cancel that races a wakeup
+        self._stopping = True
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._running_ids.clear()
+        if self._conn:
+            released = self._execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, worker_id = NULL, heartbeat_at = NULL "
+                "WHERE status = 'running' AND worker_id = ?",
+                (self.worker_id,)
+            )
+            if released:
+                logger.info(f"Released {released} running jobs back to the queue")
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    async def submit(
+        self,
+        kind: str,
+        params: dict,
+        owner: str,
+        payload: Optional[bytes] = None,
+        callback_url: Optional[str] = None,
+        max_active: int = 0
+    ) -> str:
+        """
+        Persist a new job of this owner and wake a worker; returns the job ID.
+
+        Raises a 503 HTTPException when the queue is full, and a 429 when the
+        owner already has max_active jobs queued or running (0 means no limit).
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        if callback_url:
+            await self.check_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        # The limit checks and the insert are one statement, so concurrent submits cannot overshoot
+        inserted = await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (id, owner, kind, status, params, payload, callback_url, created_at) "
+            "SELECT ?, ?, ?, 'queued', ?, ?, ?, ? "
+            "WHERE (? <= 0 OR (SELECT COUNT(*) FROM jobs WHERE status = 'queued') < ?) "
+            "AND (? <= 0 OR (SELECT COUNT(*) FROM jobs WHERE owner = ? AND status IN ('queued', 'running')) < ?)",
+            (
+                job_id, owner, kind, json.dumps(params), payload, callback_url, time.time(),
+                self.max_depth, self.max_depth, max_active, owner, max_active
+            )
+        )
+        if not inserted and max_active > 0 and await self.active(owner) >= max_active:
+            API_KEY_REJECTIONS.inc(key=owner, reason="jobs")
+            raise HTTPException(
+                status_code=429,
+                detail="API key job quota exceeded",
+                headers={"Retry-After": str(self.retry_after(max_active))}
+            )
+        if not inserted:
+            logger.warning(f"Job queue is full ({self.max_depth} queued), refusing {kind} job")
+            raise HTTPException(
+                status_code=503,
+                detail="Job queue is full, please retry later",
+                headers={"Retry-After": str(self.retry_after())}
+            )
+        if self._wakeup:
+            self._wakeup.set()
+        return job_id
+
+    async def active(self, owner: str) -> int:
+        """Jobs of this owner that are queued or running."""
+        row = await asyncio.to_thread(
+            self._fetchone,
+            "SELECT COUNT(*) AS count FROM jobs WHERE owner = ? AND status IN ('queued', 'running')",
+            (owner,)
+        )
+        return row["count"]
+
+    def retry_after(self, jobs: Optional[int] = None) -> int:
+        """Seconds until this many jobs (a full queue by default) have likely run, from recent run times."""
+        run_time = sum(self._run_times) / len(self._run_times) if self._run_times else 10.0
+        jobs = self.max_depth if jobs is None else jobs
+        return min(60, max(1, math.ceil(jobs * run_time / max(1, self.worker_count))))
+
+    async def check_callback_url(self, callback_url: str) -> Optional[list[str]]:
+        """
+        Refuse callback URLs that could reach internal services; raises a 400 HTTPException.
+
+        Hosts listed in JOB_CALLBACK_ALLOWED_HOSTS are always accepted, and
+        None is returned for them. Any other callback must use https and its
+        host must resolve only to public addresses, not private, loopback or
+        link-local ones; those checked addresses are returned.
+        """
+        parts = urlsplit(callback_url)
+        host = (parts.hostname or "").lower()
+        if host and host in self.callback_hosts:
+            return None
+        if parts.scheme != "https" or not host:
+            raise HTTPException(status_code=400, detail="Callback URL must use https")
+        try:
+            addresses = {info[4][0] for info in await asyncio.get_running_loop().getaddrinfo(host, parts.port or 443)}
+        except OSError:
+            raise HTTPException(status_code=400, detail="Callback URL host cannot be resolved")
+        # Scope IDs ("fe80::1%eth0") are not part of the address itself
+        if not all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses):
+            raise HTTPException(status_code=400, detail="Callback URL must point to a public host")
+        return sorted(addresses)
+
+    async def get(self, job_id: str, owner: str) -> Optional[dict]:
+        """Return the public view of a job of this owner, or None if there is none."""
+        row = await asyncio.to_thread(
+            self._fetchone,
+            "SELECT id, kind, status, result, error, status_code, created_at, started_at, finished_at FROM jobs WHERE id = ? AND owner = ?",
+            (job_id, owner)
+        )
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def stats(self) -> dict:
+        counts = await asyncio.to_thread(self._fetchall, "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+        by_status = {row["status"]: row["count"] for row in counts}
+        return {
+            "depth": by_status.get("queued", 0),
+            "max_depth": self.max_depth,
+            "running": by_status.get("running", 0),
+            "workers": len(self._workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_wait_seconds": _latency_summary(self._wait_times),
+            "run_seconds": _latency_summary(self._run_times)
+        }
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                await self._work_once()
+            except Exception as e:
+                # e.g. a locked or full database; a job left running is requeued once its lease expires
+                logger.error(f"Job queue worker error: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _work_once(self) -> None:
+        """Run the next queued job, or wait for one to be submitted."""
+        self._wakeup.clear()
+        job = await asyncio.to_thread(self._claim_next)
+        if job is None:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self._purge_expired)
+            return
+        # Let an idle peer check for more queued work while this one runs
+        self._wakeup.set()
+        await self._run(job)
+
+    async def _renew_leases(self) -> None:
+        """Renew the leases of jobs this instance runs and requeue jobs whose lease expired."""
+        while not self._stopping:
+            await asyncio.sleep(self.lease_seconds / 3)
+            running_ids = list(self._running_ids)
+            try:
+                if running_ids:
+                    await asyncio.to_thread(
+                        self._execute,
+                        f"UPDATE jobs SET heartbeat_at = ? WHERE worker_id = ? AND id IN ({', '.join('?' * len(running_ids))})",
+                        (time.time(), self.worker_id, *running_ids)
+                    )
+                if await asyncio.to_thread(self._requeue_expired):
+                    self._wakeup.set()
+            except Exception as e:
+                logger.error(f"Error renewing job leases: {str(e)}")
+
+    async def _run(self, job: sqlite3.Row) -> None:
+        self._running_ids.add(job["id"])
+        try:
+            await self._run_job(job)
+        finally:
+            self._running_ids.discard(job["id"])
+
+    async def _run_job(self, job: sqlite3.Row) -> None:
+        started_at = time.time()
+        self._wait_times.append(started_at - job["created_at"])
+        result, error, status_code = None, None, 200
+        try:
+            handler = self._handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job['kind']}")
+            result = (await handler(json.loads(job["params"]), job["payload"], job["owner"])).model_dump_json()
+        except HTTPException as e:
+            error, status_code = str(e.detail), e.status_code
+        except Exception as e:
+            logger.error(f"Error running {job['kind']} job {job['id']}: {str(e)}")
+            error, status_code = str(e), 500
+
+        finished_at = time.time()
+        self._run_times.append(finished_at - started_at)
+        if error is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+        stored = await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished_at = ?, payload = NULL "
+            "WHERE id = ? AND status = 'running' AND worker_id = ?",
+            ("succeeded" if error is None else "failed", result, error, status_code, finished_at, job["id"], self.worker_id)
+        )
+        if not stored:
+            logger.warning(f"Lease on {job['kind']} job {job['id']} expired while it ran, discarding its result")
+            return
+        if job["callback_url"]:
+            await self._notify(job["callback_url"], job["id"], job["owner"])
+
+    async def _notify(self, callback_url: str, job_id: str, owner: str) -> None:
+        """POST the finished job to its callback URL; failures are only logged."""
+        job = await self.get(job_id, owner)
+        session = None
+        try:
+            # Checked again in case the host now resolves somewhere else, and
+            # the connection pinned to the checked addresses so it cannot be rebound
+            addresses = await self.check_callback_url(callback_url)
+            if addresses is not None:
+                session = create_pinned_session(urlsplit(callback_url).hostname, addresses)
+            async with (session or get_http_session()).post(callback_url, json=job, allow_redirects=False) as response:
+                if response.status >= 400:
+                    logger.warning(f"Callback for job {job_id} returned status {response.status}")
+        except Exception as e:
+            logger.warning(f"Callback for job {job_id} failed: {str(e)}")
+        finally:
+            if session is not None:
+                await session.close()
+
+    def _open(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, migration in _MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(migration)
+            self._conn.executescript(_INDEXES)
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        self._open()
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def _fetchone(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        self._open()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        self._open()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """
+        Atomically mark the oldest queued job as running and return it.
+
+        One statement selects and claims the job, so two processes sharing
+        the database can never both run it.
+        """
+        # fetchall steps the statement to completion, so its write commits right away
+        now = time.time()
+        rows = self._fetchall(
+            "UPDATE jobs SET status = 'running', started_at = ?, worker_id = ?, heartbeat_at = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+            "AND status = 'queued' RETURNING *",
+            (now, self.worker_id, now)
+        )
+        return rows[0] if rows else None
+
+    def _requeue_expired(self) -> int:
+        """Requeue running jobs whose lease has not been renewed in time; returns how many."""
+        # Jobs from before leases existed have no heartbeat and count as expired
+        requeued = self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, worker_id = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - self.lease_seconds,)
+        )
+        if requeued:
+            logger.info(f"Requeued {requeued} jobs whose lease expired")
+        return requeued
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        self._execute("DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,))
+
+def _latency_summary(samples: deque) -> dict:
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4)
+    }
+
+job_queue = JobQueue.from_env()
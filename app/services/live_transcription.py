@@ -0,0 +1,114 @@
+from typing import Awaitable, Callable, List, Optional
+from app.services.audio_chunking import find_pause, stitch_transcripts
+from app.services.pcm_audio import PcmAudio, to_mono
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+PartialCallback = Callable[[int, str], Awaitable[None]]
+
+class LiveTranscription:
+    """
+    Transcribe audio while it is still being recorded.
+
+    Raw 16-bit PCM arrives through feed(). Whenever window_seconds of audio
+    (plus room to search for a pause) is buffered, a window is cut at the
+    quietest point near its end and transcribed in the background, with at
+    most concurrency windows in flight. Each window runs overlap_seconds
+    past its cut so no word is lost at the boundary; stitching drops the
+    repeated words. on_partial(index, text) is awaited as each window
+    finishes, in completion order.
+
+    finish() transcribes whatever is left and returns the whole text, so
+    after the recording stops only the last, short window is still to do.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[PcmAudio], Awaitable[str]],
+        sample_rate: int,
+        channels: int,
+        on_partial: Optional[PartialCallback] = None,
+        window_seconds: float = 15.0,
+        overlap_seconds: float = 1.0,
+        search_seconds: float = 3.0,
+        max_seconds: float = 3600.0,
+        concurrency: int = 4
+    ):
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.on_partial = on_partial
+        self.window_seconds = window_seconds
+        self.overlap_frames = int(overlap_seconds * sample_rate)
+        self.search_seconds = search_seconds
+        self.max_frames = int(max_seconds * sample_rate)
+        self.frame_size = 2 * channels
+        self.received_frames = 0
+        self.sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._windows: List[asyncio.Task] = []
+
+    @property
+    def duration(self) -> float:
+        return self.received_frames / self.sample_rate
+
+    @property
+    def windows(self) -> int:
+        return len(self._windows)
+
+    def feed(self, data: bytes) -> None:
+        """Buffer more audio, starting window transcriptions as enough arrives."""
+        if len(data) % self.frame_size:
+            raise ValueError(f"Audio frames must be whole {self.channels}-channel 16-bit samples")
+        self.received_frames += len(data) // self.frame_size
+        if self.received_frames > self.max_frames:
+            raise ValueError(f"Live recording exceeds maximum of {self.max_frames // self.sample_rate} seconds")
+        self.sha256.update(data)
+        self._buffer += data
+
+        ready_frames = int((self.window_seconds + self.search_seconds) * self.sample_rate) + self.overlap_frames
+        while len(self._buffer) >= ready_frames * self.frame_size:
+            self._cut_window()
+
+    def _cut_window(self) -> None:
+        audio = self._audio(bytes(self._buffer))
+        cut = find_pause(
+            to_mono(audio),
+            self.sample_rate,
+            self.window_seconds - self.search_seconds,
+            self.window_seconds + self.search_seconds
+        )
+        self._start_window(audio.slice(0, cut + self.overlap_frames))
+        del self._buffer[:cut * self.frame_size]
+
+    def _start_window(self, audio: PcmAudio) -> None:
+        self._windows.append(asyncio.create_task(self._transcribe_window(len(self._windows), audio)))
+
+    async def _transcribe_window(self, index: int, audio: PcmAudio) -> str:
+        async with self._semaphore:
+            text = await self.transcribe(audio)
+        if self.on_partial:
+            await self.on_partial(index, text)
+        return text
+
+    def _audio(self, frames: bytes) -> PcmAudio:
+        return PcmAudio(frames, self.channels, 2, self.sample_rate)
+
+    async def finish(self) -> str:
+        """Transcribe the remaining audio and return the stitched transcription."""
+        if self._buffer:
+            self._start_window(self._audio(bytes(self._buffer)))
+            self._buffer.clear()
+        texts = await asyncio.gather(*self._windows)
+        logger.info(f"Live transcription of {self.duration:.1f}s finished in {len(texts)} windows")
+        return stitch_transcripts(texts) if texts else ""
+
+    async def cancel(self) -> None:
+        """Stop window transcriptions still running, e.g. after the client went away."""
+        for window in self._windows:
+            window.cancel()
+        await asyncio.gather(*self._windows, return_exceptions=True)
@@ -0,0 +1,248 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import inspect
+import math
+import time
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from fast in-process stages to slow model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Payload buckets in bytes, 1 KB to 128 MB
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in self._values.items()]
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum, count
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+Collector = Callable[[], Union[Dict[str, float], Awaitable[Dict[str, float]]]]
+
+class MetricsRegistry:
+    """
+    Process-local metrics in Prometheus text exposition format.
+
+    Recording is a dictionary update and is not synchronized; call it from
+    the event loop thread. Collectors are polled at scrape time for values
+    that other components already track (cache and queue statistics).
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, str, Collector]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, documentation: str, collect: Collector) -> None:
+        """Expose each numeric key of collect()'s result as a gauge labelled by key"""
+        self._collectors.append((f"{self.namespace}_{name}", documentation, collect))
+
+    async def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, documentation, collect in self._collectors:
+            values = collect()
+            if inspect.isawaitable(values):
+                values = await values
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in _flatten(values):
+                lines.append(f'{name}{{key="{_escape(key)}"}} {_format_value(value)}')
+        return "\n".join(lines) + "\n"
+
+def _flatten(values: dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Yield numeric leaves of a nested stats dict as (dotted.key, value)"""
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+metrics = MetricsRegistry("voicenote")
+
+STAGE_DURATION = metrics.histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ("stage", "outcome")
+)
+STAGE_IN_FLIGHT = metrics.gauge(
+    "stage_in_flight", "Processing stages currently running", ("stage",)
+)
+PAYLOAD_BYTES = metrics.histogram(
+    "payload_bytes", "Size of payloads moving through the pipeline", ("kind",), BYTES_BUCKETS
+)
+UPSTREAM_RESPONSES = metrics.counter(
+    "upstream_responses_total", "Responses from upstream services by status code", ("upstream", "status")
+)
+UPSTREAM_RETRIES = metrics.counter(
+    "upstream_retries_total", "Upstream calls sent again after a throttled or transient failure", ("upstream", "reason")
+)
+UPSTREAM_HEDGES = metrics.counter(
+    "upstream_hedges_total", "Slow upstream calls hedged with a duplicate, by which copy answered first", ("upstream", "kind", "outcome")
+)
+TRANSCRIPT_CHARS_REMOVED = metrics.counter(
+    "transcript_compaction_removed_chars_total", "Characters compaction removed from transcripts before generation", ("reason",)
+)
+MODEL_SELECTIONS = metrics.counter(
+    "model_selections_total", "Model chosen for upstream calls by input size tier", ("task", "route", "tier", "model")
+)
+MODEL_CALL_DURATION = metrics.histogram(
+    "model_call_duration_seconds", "Upstream model call latency by model", ("stage", "model")
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by endpoint", ("method", "handler", "status")
+)
+HTTP_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+ADMISSION_LIMIT = metrics.gauge(
+    "admission_limit", "Concurrent requests admitted per route", ("route",)
+)
+ADMISSION_IN_FLIGHT = metrics.gauge(
+    "admission_in_flight", "Admitted requests currently running per route", ("route",)
+)
+ADMISSION_QUEUE_DEPTH = metrics.gauge(
+    "admission_queue_depth", "Requests waiting for admission per route", ("route",)
+)
+ADMISSION_QUEUE_WAIT = metrics.histogram(
+    "admission_queue_wait_seconds", "Time requests waited in the admission queue", ("route",)
+)
+ADMISSION_REJECTIONS = metrics.counter(
+    "admission_rejections_total", "Requests shed with 503 because the route was saturated", ("route", "reason")
+)
+API_KEY_IN_FLIGHT = metrics.gauge(
+    "api_key_in_flight", "Requests in flight per API key", ("key",)
+)
+API_KEY_REJECTIONS = metrics.counter(
+    "api_key_rejections_total", "Requests refused with 429 for going over an API key's quota", ("key", "reason")
+)
+
+@contextmanager
+def track_stage(stage: str, upstream: Optional[str] = None, model: Optional[str] = None) -> Iterator[None]:
+    """
+    Time a processing stage and count it as in flight while it runs.
+
+    For upstream calls, the response status (or error type) is counted too;
+    the status code is taken from the exception's status_code when it fails.
+    Successful calls to a model are also timed per model.
+    """
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "error"
+        if upstream:
+            status = getattr(e, "status_code", None) or getattr(e, "status", None) or type(e).__name__
+            UPSTREAM_RESPONSES.inc(upstream=upstream, status=status)
+        raise
+    else:
+        if upstream:
+            UPSTREAM_RESPONSES.inc(upstream=upstream, status=200)
+        if model:
+            MODEL_CALL_DURATION.observe(time.perf_counter() - started, stage=stage, model=model)
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        STAGE_DURATION.observe(time.perf_counter() - started, stage=stage, outcome=outcome)
+
+def record_payload(kind: str, size: int) -> None:
+    PAYLOAD_BYTES.observe(size, kind=kind)
@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.config import env_bool, env_int
+from app.services.metrics import MODEL_SELECTIONS
+from app.services.text_chunking import estimate_tokens
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Gemini counts audio at 32 tokens per second of recording
+AUDIO_TOKENS_PER_SECOND = 32
+# Typical compressed voice note bitrate, for sizing audio whose header gives no duration
+AUDIO_BYTES_PER_SECOND = 16000
+
+@dataclass
+class ModelTier:
+    """A model and the largest input, in estimated tokens, it is used for (0 means any size)."""
+    name: str
+    model: str
+    max_tokens: int = 0
+
+def estimate_audio_tokens(duration: Optional[float], size: int) -> int:
+    """Input tokens for a recording, from its duration or, failing that, its size in bytes."""
+    seconds = duration if duration else size / AUDIO_BYTES_PER_SECOND
+    return int(seconds * AUDIO_TOKENS_PER_SECOND)
+
+class ModelRouter:
+    """
+    Pick the Gemini model for each call from the size of its input.
+
+    Tiers are tried from lightest to largest and the input goes to the
+    first one it fits, so a short text or clip gets a lighter, faster model
+    and only very long inputs pay for the larger context. A route (the kind
+    of note being made) can be pinned to a tier by name or to a model.
+    Every choice is counted by task, route, tier and model.
+
+    By default there are two tiers, light and standard. Setting MODEL_LONG
+    adds a third for inputs over MODEL_STANDARD_MAX_TOKENS; tiers without
+    a model are skipped, and inputs larger than every cap go to the last tier.
+    With routing off (MODEL_ROUTING=0) every call uses the standard tier's
+    model, MODEL_STANDARD.
+    """
+
+    def __init__(self, tiers: List[ModelTier], overrides: Optional[Dict[str, str]] = None, enabled: bool = True):
+        self.tiers = [tier for tier in tiers if tier.model]
+        self.overrides = overrides or {}
+        self.enabled = enabled and bool(self.tiers)
+        # Used for every call when routing is off
+        self.default = next((tier for tier in self.tiers if tier.name == "standard"), ModelTier("default", DEFAULT_MODEL))
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        overrides = {}
+        for entry in (os.getenv("MODEL_ROUTE_OVERRIDES") or "").split(","):
+            route, _, target = entry.partition("=")
+            if route.strip() and target.strip():
+                overrides[route.strip()] = target.strip()
+        return cls(
+            [
+                ModelTier("light", os.getenv("MODEL_LIGHT", "gemini-2.0-flash-lite"), env_int("MODEL_LIGHT_MAX_TOKENS", 2000)),
+                ModelTier("standard", os.getenv("MODEL_STANDARD", DEFAULT_MODEL), env_int("MODEL_STANDARD_MAX_TOKENS", 800000)),
+                # Off unless set: long inputs are map-reduced into chunks that fit the standard tier
+                ModelTier("long", os.getenv("MODEL_LONG", ""))
+            ],
+            overrides,
+            enabled=env_bool("MODEL_ROUTING", True)
+        )
+
+    def tier_for(self, tokens: int, route: Optional[str] = None) -> ModelTier:
+        """Tier an input of about this many tokens goes to, without counting the choice"""
+        override = self.overrides.get(route) if route else None
+        if override:
+            for tier in self.tiers:
+                if tier.name == override:
+                    return tier
+            return ModelTier("override", override)
+        if not self.enabled:
+            return self.default
+        for tier in self.tiers:
+            if not tier.max_tokens or tokens <= tier.max_tokens:
+                return tier
+        return self.tiers[-1]
+
+    def select(self, task: str, tokens: int, route: Optional[str] = None) -> str:
+        """Model for a call of this task with an input of about this many tokens"""
+        tier = self.tier_for(tokens, route)
+        MODEL_SELECTIONS.inc(task=task, route=route or "none", tier=tier.name, model=tier.model)
+        return tier.model
+
+    def for_text(self, task: str, text: str, route: Optional[str] = None) -> str:
+        return self.select(task, estimate_tokens(text), route)
+
+    def for_audio(self, task: str, duration: Optional[float], size: int, route: Optional[str] = None) -> str:
+        return self.select(task, estimate_audio_tokens(duration, size), route)
+
+model_router = ModelRouter.from_env()
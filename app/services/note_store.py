@@ -0,0 +1,291 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Union
+from app.config import env_bool, env_float, env_int
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    emoji TEXT NOT NULL,
+    title TEXT NOT NULL,
+    transcription TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, transcription, summary,
+    content='notes', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, transcription, summary)
+    VALUES (new.rowid, new.title, new.transcription, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, transcription, summary)
+    VALUES ('delete', old.rowid, old.title, old.transcription, old.summary);
+END;
+"""
+
+# Created after the owner column exists, which databases from before it need migrating to
+_INDEXES = """
+DROP INDEX IF EXISTS notes_input_hash;
+CREATE INDEX IF NOT EXISTS notes_owner_input_hash ON notes (owner, input_hash, created_at);
+"""
+
+_COLUMNS = ("id", "owner", "kind", "input_hash", "emoji", "title", "transcription", "summary", "created_at")
+_SEARCH_TERM = re.compile(r"\w+")
+
+def input_hash(source: Union[bytes, str]) -> str:
+    """SHA-256 of the note's input: upload bytes, raw text or video URL."""
+    return hashlib.sha256(source.encode() if isinstance(source, str) else source).hexdigest()
+
+def _match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix. Words are quoted so user input can't inject FTS syntax.
+    """
+    terms = _SEARCH_TERM.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+class NoteStore:
+    """
+    Processed notes in SQLite, with an FTS5 index for search.
+
+    Every note belongs to the API key that made it (owner, the key's ID),
+    and is only found by lookups for that owner. Notes written before
+    owners were recorded have an empty owner and are not returned.
+
+    add() only hashes the input and queues the note; a background writer
+    inserts queued notes in one transaction per batch, every flush_interval
+    seconds or as soon as batch_size are waiting. Queued notes are served
+    by get() straight away and show up in search once written.
+    """
+
+    def __init__(self, db_path: str, enabled: bool = True, batch_size: int = 100, flush_interval: float = 0.05, max_pending: int = 10000):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, dict] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "NoteStore":
+        return cls(
+            db_path=os.getenv("NOTE_STORE_DB", "notes.sqlite3"),
+            enabled=env_bool("NOTE_STORE_ENABLED", True),
+            batch_size=env_int("NOTE_STORE_BATCH_SIZE", 100),
+            flush_interval=env_float("NOTE_STORE_FLUSH_INTERVAL", 0.05),
+            max_pending=env_int("NOTE_STORE_MAX_PENDING", 10000)
+        )
+
+    async def start(self) -> None:
+        """Open the database and start the background writer."""
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self._open)
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        if self._pending:
+            self._wakeup.set()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        """Stop the writer after writing out everything still queued."""
+        if self._writer:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._pending:
+            await self.flush()
+        if self._conn:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    async def add(self, kind: str, source: Union[bytes, str], note: BaseModel, owner: str, digest: Optional[str] = None) -> Optional[str]:
+        """
+        Queue a processed note of this owner for writing; returns its ID, or
+        None if the store is off or full. Pass digest when the input was
+        hashed already.
+        """
+        if not self.enabled:
+            return None
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            logger.warning("Note store write queue is full; not persisting note")
+            return None
+        if digest is None:
+            digest = await asyncio.to_thread(input_hash, source) if len(source) > 65536 else input_hash(source)
+        note_id = uuid.uuid4().hex
+        self._pending[note_id] = {
+            "id": note_id,
+            "owner": owner,
+            "kind": kind,
+            "input_hash": digest,
+            **note.model_dump(include={"emoji", "title", "transcription", "summary"}),
+            "created_at": time.time()
+        }
+        if self._wakeup:
+            self._wakeup.set()
+            if len(self._pending) >= self.batch_size:
+                self._full.set()
+        return note_id
+
+    async def get(self, note_id: str, owner: str) -> Optional[dict]:
+        """Return a stored or queued note of this owner, or None if there is none."""
+        pending = self._pending.get(note_id)
+        if pending is not None:
+            return dict(pending) if pending["owner"] == owner else None
+        if not self.enabled:
+            return None
+        row = await asyncio.to_thread(
+            self._fetchone,
+            f"SELECT {', '.join(_COLUMNS)} FROM notes WHERE id = ? AND owner = ?",
+            (note_id, owner)
+        )
+        return dict(row) if row else None
+
+    async def find_by_input(self, digest: str, owner: str, limit: int = 20) -> List[dict]:
+        """This owner's notes made from the input with this SHA-256, newest first."""
+        if not self.enabled:
+            return []
+        rows = await asyncio.to_thread(
+            self._fetchall,
+            f"SELECT {', '.join(_COLUMNS)} FROM notes WHERE owner = ? AND input_hash = ? ORDER BY created_at DESC LIMIT ?",
+            (owner, digest, limit)
+        )
+        notes = {row["id"]: dict(row) for row in rows}
+        notes.update(
+            (note["id"], dict(note)) for note in self._pending.values()
+            if note["owner"] == owner and note["input_hash"] == digest
+        )
+        return sorted(notes.values(), key=lambda note: note["created_at"], reverse=True)[:limit]
+
+    async def search(self, query: str, owner: str, limit: int = 20) -> List[dict]:
+        """This owner's best matches for the query across title, summary and transcription."""
+        match = _match_query(query)
+        if not self.enabled or match is None:
+            return []
+        rows = await asyncio.to_thread(
+            self._fetchall,
+            """
+            SELECT notes.id, notes.kind, notes.emoji, notes.title, notes.created_at,
+                   snippet(notes_fts, -1, '[', ']', '…', 16) AS snippet
+            FROM notes_fts JOIN notes ON notes.rowid = notes_fts.rowid
+            WHERE notes_fts MATCH ? AND notes.owner = ?
+            ORDER BY bm25(notes_fts, 10.0, 1.0, 4.0)
+            LIMIT ?
+            """,
+            (match, owner, limit)
+        )
+        return [dict(row) for row in rows]
+
+    async def flush(self) -> int:
+        """Write every queued note in one transaction; returns how many were written."""
+        async with self._flush_lock or asyncio.Lock():
+            batch = list(self._pending.values())
+            if not batch:
+                return 0
+            try:
+                await asyncio.to_thread(self._insert, batch)
+            except sqlite3.Error as e:
+                # Notes stay queued and are retried with the next batch
+                self.write_errors += 1
+                logger.error(f"Failed to write {len(batch)} notes: {str(e)}")
+                return 0
+            for note in batch:
+                self._pending.pop(note["id"], None)
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    async def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "write_batches": self.batches,
+            "write_errors": self.write_errors,
+            "dropped": self.dropped
+        }
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Give concurrent requests a moment to join the batch, unless it is already full
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._full.clear()
+            await self.flush()
+
+    def _open(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(notes)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE notes ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            self._conn.executescript(_INDEXES)
+
+    def _insert(self, notes: List[dict]) -> None:
+        self._open()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO notes ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    [tuple(note[column] for column in _COLUMNS) for note in notes]
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _fetchone(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        self._open()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        self._open()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+note_store = NoteStore.from_env()
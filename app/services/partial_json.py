@@ -0,0 +1,38 @@
+from typing import Optional, Tuple
+import json
+import re
+
+def partial_json_string(buffer: str, key: str) -> Tuple[Optional[str], bool]:
+    """
+    Read a string value from a JSON object that is still being streamed.
+
+    Returns (value_so_far, is_complete). The value is None if the key has not
+    appeared yet; an escape sequence cut off mid-stream is held back until the
+    rest of it arrives.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if not match:
+        return None, False
+
+    start = match.end()
+    index = start
+    while index < len(buffer):
+        char = buffer[index]
+        if char == '"':
+            return json.loads(buffer[start - 1:index + 1]), True
+        if char == "\\":
+            escape_length = 6 if buffer[index + 1:index + 2] == "u" else 2
+            if index + escape_length > len(buffer):
+                break
+            index += escape_length
+            continue
+        index += 1
+
+    try:
+        value = json.loads(f'"{buffer[start:index]}"')
+    except json.JSONDecodeError:
+        return None, False
+    # Hold back the first half of a surrogate pair until the second arrives
+    if value and "\ud800" <= value[-1] <= "\udbff":
+        value = value[:-1]
+    return value, False
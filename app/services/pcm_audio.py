@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+import io
+import math
+import numpy as np
+import struct
+import wave
+
+@dataclass
+class PcmAudio:
+    """Uncompressed little-endian interleaved PCM audio."""
+    frames: bytes
+    channels: int
+    sample_width: int
+    sample_rate: int
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.frames) // (self.channels * self.sample_width)
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.sample_rate if self.sample_rate else 0.0
+
+    def slice(self, start: int, end: int) -> "PcmAudio":
+        """Return the frames in [start, end) as a new clip."""
+        frame_size = self.channels * self.sample_width
+        return PcmAudio(self.frames[start * frame_size:end * frame_size], self.channels, self.sample_width, self.sample_rate)
+
+def read_wav(data: bytes) -> PcmAudio:
+    """Decode a PCM WAV file; raises ValueError for anything else."""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            return PcmAudio(
+                frames=wav.readframes(wav.getnframes()),
+                channels=wav.getnchannels(),
+                sample_width=wav.getsampwidth(),
+                sample_rate=wav.getframerate()
+            )
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Unsupported or corrupt WAV file: {str(e)}")
+
+def extended_to_float(data: bytes) -> float:
+    """Decode an 80-bit IEEE 754 extended float, as used for AIFF sample rates."""
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1.0 if exponent & 0x8000 else 1.0
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * math.ldexp(mantissa, exponent - 16383 - 63)
+
+def read_aiff(data: bytes) -> PcmAudio:
+    """Decode an uncompressed AIFF or AIFF-C file; raises ValueError for anything else."""
+    if len(data) < 12 or data[:4] != b"FORM" or data[8:12] not in (b"AIFF", b"AIFC"):
+        raise ValueError("Unsupported or corrupt AIFF file: missing FORM header")
+    is_aifc = data[8:12] == b"AIFC"
+    common = sound = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack(">I", data[offset + 4:offset + 8])[0]
+        body = data[offset + 8:offset + 8 + size]
+        if chunk_id == b"COMM":
+            common = body
+        elif chunk_id == b"SSND":
+            sound = body
+        # Chunks are padded to an even length
+        offset += 8 + size + (size & 1)
+    if common is None or sound is None or len(common) < 18 or len(sound) < 8:
+        raise ValueError("Unsupported or corrupt AIFF file: missing COMM or SSND chunk")
+
+    channels, frame_count, bits = struct.unpack(">hIh", common[:8])
+    sample_rate = extended_to_float(common[8:18])
+    compression = common[18:22] if is_aifc else b"NONE"
+    if compression not in (b"NONE", b"sowt") or channels < 1 or not 8 <= bits <= 32:
+        raise ValueError(f"Unsupported AIFF encoding: {compression.decode('latin-1')}, {bits}-bit")
+
+    sample_width = (bits + 7) // 8
+    data_offset = struct.unpack(">I", sound[:4])[0]
+    frames = sound[8 + data_offset:8 + data_offset + frame_count * channels * sample_width]
+    if compression == b"NONE":
+        # Big-endian samples; reverse the bytes of each one for little-endian PCM
+        raw = np.frombuffer(frames, dtype=np.uint8, count=len(frames) // sample_width * sample_width)
+        raw = raw.reshape(-1, sample_width)[:, ::-1]
+        if sample_width == 1:
+            # AIFF 8-bit samples are signed, WAV's are unsigned
+            raw = raw ^ 0x80
+        frames = raw.tobytes()
+    return PcmAudio(frames, channels, sample_width, int(round(sample_rate)))
+
+def write_wav(audio: PcmAudio) -> bytes:
+    """Encode PCM audio as a WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(audio.channels)
+        wav.setsampwidth(audio.sample_width)
+        wav.setframerate(audio.sample_rate)
+        wav.writeframes(audio.frames)
+    return buffer.getvalue()
+
+def to_float_samples(audio: PcmAudio) -> np.ndarray:
+    """Convert PCM frames to float32 samples in [-1, 1], shaped (frames, channels)."""
+    width = audio.sample_width
+    usable = audio.frame_count * audio.channels * width
+    raw = np.frombuffer(audio.frames, dtype=np.uint8, count=usable)
+    if width == 1:
+        samples = (raw.astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = raw.view("<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        # Sign-extend packed 24-bit samples into int32
+        triplets = raw.reshape(-1, 3).astype(np.int32)
+        ints = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = raw.view("<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {width} bytes")
+    return samples.reshape(-1, audio.channels)
+
+def from_float_samples(mono: np.ndarray, sample_rate: int) -> PcmAudio:
+    """Encode float samples in [-1, 1] as 16-bit mono PCM."""
+    ints = np.clip(np.round(mono * 32767.0), -32768, 32767).astype("<i2")
+    return PcmAudio(ints.tobytes(), 1, 2, sample_rate)
+
+def to_mono(audio: PcmAudio) -> np.ndarray:
+    """Downmix to a single float32 channel."""
+    samples = to_float_samples(audio)
+    return samples[:, 0] if audio.channels == 1 else samples.mean(axis=1)
+
+def frame_energy(mono: np.ndarray, sample_rate: int, frame_ms: float = 20.0) -> tuple[np.ndarray, int]:
+    """Mean-square energy per analysis frame; returns (energies, frame_length)."""
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    frame_total = len(mono) // frame_length
+    frames = mono[:frame_total * frame_length].reshape(frame_total, frame_length)
+    return np.einsum("ij,ij->i", frames, frames) / frame_length, frame_length
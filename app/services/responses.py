@@ -0,0 +1,18 @@
+from fastapi import Response
+from pydantic import BaseModel
+from typing import Optional, Union
+
+# Exclusions for clients that already have the transcription (or the text they sent)
+WITHOUT_TRANSCRIPTION = {"transcription"}
+BATCH_WITHOUT_TRANSCRIPTION = {"items": {"__all__": {"result": WITHOUT_TRANSCRIPTION}}}
+
+def json_response(model: BaseModel, exclude: Optional[Union[set, dict]] = None, status_code: int = 200) -> Response:
+    """
+    Serialize a response model straight to JSON bytes with Pydantic's
+    compiled encoder, optionally leaving fields out.
+
+    Transcripts of long videos run to hundreds of KB, and this skips the
+    intermediate dict and the stdlib JSON encoder.
+    """
+    body = model.model_dump_json(exclude=exclude)
+    return Response(body, status_code=status_code, media_type="application/json")
@@ -1,22 +1,40 @@
+from dataclasses import dataclass
 from fastapi import HTTPException
 import logging
 from typing import Optional
 import os
-import base64
-from openai import OpenAI
+import asyncio
+from app.services.gemini_pool import GeminiPool, get_gemini_pool
+from app.config import env_bool, env_float, env_int
+from app.services.audio_chunking import split_audio, stitch_transcripts
+from app.services.audio_format import AudioInfo, sniff_audio
+from app.services.audio_normalization import normalize_audio
+from app.services.pcm_audio import PcmAudio, read_aiff, read_wav, write_wav
+from app.services.audio_upload import encode_base64, file_too_large
+from app.services.transcription_cache import TranscriptionCache
+from app.services.metrics import record_payload, track_stage
+from app.services.model_router import estimate_audio_tokens, model_router
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TRANSCRIPTION_PROMPT = "Transcribe this audio. Please provide the transcription in a clear format."
+
+@dataclass
+class EncodedAudio:
+    """An upload normalized and base64-encoded, ready to go into a model request."""
+    data: str
+    format: str
+    cache_key: Optional[str] = None
+    duration: Optional[float] = None
+
 class SpeechHandler:
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.api_key = os.getenv("GEMINI_API_KEYS") or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
-            
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
+
+        # Per-call timeout for transcription requests, in seconds
+        self.timeout = env_float("GEMINI_TRANSCRIPTION_TIMEOUT", 120.0)
         
         # Map of MIME types to their corresponding format names for Google API
         self.supported_formats = {
@@ -35,57 +53,313 @@ class SpeechHandler:
             'audio/vorbis': 'ogg',
             'audio/x-flac': 'flac'
         }
-        self.max_file_size = 25 * 1024 * 1024  # 25 MB in bytes
+        self.max_file_size = env_int("VOICE_NOTE_MAX_FILE_SIZE", 25 * 1024 * 1024)  # 25 MB in bytes
+        # Longest recording accepted, from the file header; 0 means no limit
+        self.max_duration_seconds = env_float("VOICE_NOTE_MAX_DURATION_SECONDS", 0.0)
+
+        # Long WAV recordings are split into overlapping segments transcribed in parallel
+        self.chunking_enabled = env_bool("VOICE_NOTE_CHUNKING", True)
+        self.chunk_threshold_seconds = env_float("VOICE_NOTE_CHUNK_THRESHOLD_SECONDS", 120.0)
+        self.chunk_seconds = env_float("VOICE_NOTE_CHUNK_SECONDS", 60.0)
+        self.chunk_overlap_seconds = env_float("VOICE_NOTE_CHUNK_OVERLAP_SECONDS", 2.0)
+        self.chunk_search_seconds = env_float("VOICE_NOTE_CHUNK_SEARCH_SECONDS", 5.0)
+        self.chunk_concurrency = env_int("VOICE_NOTE_CHUNK_CONCURRENCY", 4)
+        self.max_chunked_file_size = env_int("VOICE_NOTE_MAX_CHUNKED_FILE_SIZE", 100 * 1024 * 1024)
+
+        # PCM uploads are downmixed, downsampled and silence-trimmed before upload
+        self.normalize_enabled = env_bool("VOICE_NOTE_NORMALIZE", True)
+        self.normalize_sample_rate = env_int("VOICE_NOTE_NORMALIZE_SAMPLE_RATE", 16000)
+        self.silence_threshold_db = env_float("VOICE_NOTE_SILENCE_THRESHOLD_DB", -45.0)
+        self.silence_padding_seconds = env_float("VOICE_NOTE_SILENCE_PADDING_SECONDS", 0.25)
+
+        # Transcribe and summarize in one model call instead of two
+        self.single_pass_enabled = env_bool("VOICE_NOTE_SINGLE_PASS", False)
+
+        # Transcriptions keyed by audio content, shared across requests
+        self.cache = TranscriptionCache.from_env()
+
+    @property
+    def pool(self) -> GeminiPool:
+        """Shared Gemini client pool"""
+        return get_gemini_pool()
 
-    def _validate_file_type(self, content_type: str) -> tuple[bool, str]:
+    def inspect_audio(self, file_content: bytes, content_type: Optional[str] = None) -> AudioInfo:
         """
-        Validate if the file type is supported
-        Returns: (is_valid, format_name)
+        Detect the real audio format from the file header.
+
+        The declared content type is only used for logging; unknown, corrupt
+        or truncated files and recordings over the duration limit get a 400.
         """
-        return content_type in self.supported_formats, self.supported_formats.get(content_type, '')
+        try:
+            info = sniff_audio(file_content)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Corrupt or truncated audio file: {str(e)}")
+        if info is None:
+            supported_types = ", ".join(sorted(set(self.supported_formats.values())))
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file type. Supported formats: {supported_types}"
+            )
+
+        declared_format = self.supported_formats.get(content_type)
+        if declared_format != info.format:
+            logger.info(f"Upload declared as {content_type} is {info.format} audio")
+        if self.max_duration_seconds and info.duration and info.duration > self.max_duration_seconds:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Audio duration exceeds maximum of {self.max_duration_seconds:g} seconds"
+            )
+        return info
 
-    def _validate_file_size(self, file_size: int) -> bool:
+    def _size_limit(self, format_name: str = '') -> int:
+        """Largest upload allowed for a format"""
+        return self.max_chunked_file_size if self._is_chunkable(format_name) else self.max_file_size
+
+    def _validate_file_size(self, file_size: int, format_name: str = '') -> bool:
         """Validate if the file size is within limits"""
-        return file_size <= self.max_file_size
+        return file_size <= self._size_limit(format_name)
+
+    @property
+    def max_upload_size(self) -> int:
+        """Largest upload any supported format may have"""
+        return max(self.max_file_size, self.max_chunked_file_size if self.chunking_enabled else 0)
+
+    def _is_chunkable(self, format_name: str) -> bool:
+        return self.chunking_enabled and format_name == 'wav'
+
+    def _read_long_audio(self, file_content: bytes) -> Optional[PcmAudio]:
+        """Decode WAV audio worth splitting; None if it is short or not plain PCM."""
+        try:
+            audio = read_wav(file_content)
+        except ValueError as e:
+            logger.info(f"Not chunking audio: {str(e)}")
+            return None
+        return audio if audio.duration > self.chunk_threshold_seconds else None
+
+    def _normalize_pcm(self, audio: PcmAudio) -> PcmAudio:
+        """Normalized copy of the audio, or the audio itself if that is not smaller"""
+        normalized = normalize_audio(
+            audio,
+            self.normalize_sample_rate,
+            self.silence_threshold_db,
+            self.silence_padding_seconds
+        )
+        return normalized if len(normalized.frames) < len(audio.frames) else audio
+
+    def _normalize_file(self, file_content: bytes, format_name: str) -> tuple[bytes, str]:
+        """Normalize a WAV or AIFF upload into a smaller WAV; other input is returned as is"""
+        try:
+            audio = read_wav(file_content) if format_name == 'wav' else read_aiff(file_content)
+            normalized = self._normalize_pcm(audio)
+        except ValueError as e:
+            logger.info(f"Not normalizing audio: {str(e)}")
+            return file_content, format_name
+        if normalized is audio and format_name == 'wav':
+            return file_content, format_name
+        return write_wav(normalized), 'wav'
+
+    async def _normalize(self, file_content: bytes, format_name: str) -> tuple[bytes, str]:
+        """Shrink PCM audio before it is encoded and sent upstream"""
+        if not self.normalize_enabled or format_name not in ('wav', 'aiff'):
+            return file_content, format_name
+        with track_stage("audio_normalize"):
+            normalized, format_name = await asyncio.to_thread(self._normalize_file, file_content, format_name)
+        record_payload("audio_original", len(file_content))
+        record_payload("audio_normalized", len(normalized))
+        return normalized, format_name
+
+    async def _check_upload(self, file_content: bytes, content_type: str) -> tuple[AudioInfo, Optional[PcmAudio]]:
+        """
+        Validate an upload and return what its header says, plus the decoded
+        audio when the recording is long enough to be split into segments.
+        """
+        # Detect the real format from the header, whatever the client claimed
+        info = self.inspect_audio(file_content, content_type)
+        format_name = info.format
+
+        # Validate file size
+        if not self._validate_file_size(len(file_content), format_name):
+            raise file_too_large(self._size_limit(format_name))
+
+        long_audio = None
+        if self._is_chunkable(format_name) and info.duration and info.duration > self.chunk_threshold_seconds:
+            long_audio = await asyncio.to_thread(self._read_long_audio, file_content)
+        if long_audio is None and len(file_content) > self.max_file_size:
+            raise file_too_large(self.max_file_size)
+        return info, long_audio
+
+    def _transcription_tokens(self, info: AudioInfo, size: int, long_audio: Optional[PcmAudio]) -> int:
+        """Input size of each transcription request: the whole upload, or one segment of a long one"""
+        if long_audio is not None:
+            return estimate_audio_tokens(self.chunk_seconds + self.chunk_overlap_seconds, 0)
+        return estimate_audio_tokens(info.duration, size)
+
+    async def _cache_key(self, file_content: bytes, model: str, prompt: str, temperature: float) -> Optional[str]:
+        if not self.cache.enabled:
+            return None
+        return await asyncio.to_thread(self.cache.make_key, file_content, model, prompt, temperature)
 
     async def transcribe_audio(
         self, 
         file_content: bytes,
         content_type: str,
-        model: str = "gemini-2.0-flash",
+        model: Optional[str] = None,
         language: Optional[str] = None,
         prompt: Optional[str] = None,
         response_format: str = "json",
-        temperature: float = 0.0
+        temperature: float = 0.0,
+        timeout: Optional[float] = None,
+        route: Optional[str] = None
     ) -> dict:
         """
         Transcribe audio file using Google's Gemini API
+
+        The format is detected from the file header, so corrupt uploads are
+        rejected before any encoding work or upstream call.
+
+        WAV and AIFF audio is downmixed to mono, downsampled and trimmed of
+        leading and trailing silence before upload. Long WAV recordings are
+        split at quiet points and the segments are transcribed concurrently,
+        then stitched back together.
+
+        Without an explicit model, one is routed by the length of the audio
+        each request carries.
         """
         try:
-            # Validate file type
-            is_valid_type, format_name = self._validate_file_type(content_type)
-            if not is_valid_type:
-                supported_types = ", ".join(sorted(set(self.supported_formats.values())))
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported file type. Supported formats: {supported_types}"
-                )
+            info, long_audio = await self._check_upload(file_content, content_type)
+            format_name = info.format
+            if model is None:
+                tokens = self._transcription_tokens(info, len(file_content), long_audio)
+                model = model_router.select("transcription", tokens, route)
 
-            # Validate file size
-            if not self._validate_file_size(len(file_content)):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File size exceeds maximum limit of 25MB"
-                )
+            # Prepare the transcription request
+            transcription_prompt = prompt if prompt else DEFAULT_TRANSCRIPTION_PROMPT
 
-            # Convert audio to base64
-            base64_audio = base64.b64encode(file_content).decode('utf-8')
+            # Serve repeated uploads from the cache without touching the model
+            cache_key = await self._cache_key(file_content, model, transcription_prompt, temperature)
+            if cache_key:
+                cached_text = await self.cache.get(cache_key)
+                if cached_text is not None:
+                    return {"text": cached_text}
 
-            # Prepare the transcription request
-            transcription_prompt = prompt if prompt else "Transcribe this audio. Please provide the transcription in a clear format."
-            
-            try:
-                response = self.client.chat.completions.create(
+            request_options = {
+                "model": model,
+                "prompt": transcription_prompt,
+                "temperature": temperature,
+                "timeout": timeout or self.timeout
+            }
+            if long_audio is not None:
+                text = await self._transcribe_segments(long_audio, request_options)
+            else:
+                audio_content, audio_format = await self._normalize(file_content, format_name)
+                text = await self._request_transcription(audio_content, audio_format, **request_options)
+
+            if cache_key:
+                await self.cache.set(cache_key, text)
+
+            # Return in the same format as before
+            return {
+                "text": text
+            }
+
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            logger.error(f"Error in transcribe_audio: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def encode_for_single_pass(self, file_content: bytes, content_type: str, route: Optional[str] = None) -> Optional[EncodedAudio]:
+        """
+        Validate, normalize and encode an upload for a combined transcribe
+        and summarize request.
+
+        Returns None when the two-step path is the better choice: the
+        transcription is already cached, or the recording is long enough to
+        be split into segments. The returned cache key stores the combined
+        call's transcription for later uploads of the same audio.
+        """
+        info, long_audio = await self._check_upload(file_content, content_type)
+        if long_audio is not None:
+            return None
+
+        # Keyed like the two-step path's transcription of the same upload
+        model = model_router.tier_for(self._transcription_tokens(info, len(file_content), None), route).model
+        cache_key = await self._cache_key(file_content, model, DEFAULT_TRANSCRIPTION_PROMPT, 0.0)
+        if cache_key and await self.cache.get(cache_key) is not None:
+            return None
+
+        audio_content, audio_format = await self._normalize(file_content, info.format)
+        return EncodedAudio(await self._encode(audio_content), audio_format, cache_key, info.duration)
+
+    async def remember_transcription(self, audio: EncodedAudio, text: str) -> None:
+        """Cache a transcription that came back from a single-pass request"""
+        if audio.cache_key:
+            await self.cache.set(audio.cache_key, text)
+
+    async def transcribe_pcm(self, audio: PcmAudio, timeout: Optional[float] = None, route: Optional[str] = None) -> str:
+        """Transcribe a short PCM clip, such as one window of a live recording"""
+        model = model_router.for_audio("transcription", audio.duration, len(audio.frames), route)
+        if self.normalize_enabled:
+            audio = await asyncio.to_thread(self._normalize_pcm, audio)
+        wav = await asyncio.to_thread(write_wav, audio)
+        return await self._request_transcription(
+            wav,
+            'wav',
+            model=model,
+            prompt=DEFAULT_TRANSCRIPTION_PROMPT,
+            temperature=0.0,
+            timeout=timeout or self.timeout
+        )
+
+    async def _transcribe_segments(self, audio: PcmAudio, request_options: dict) -> str:
+        """Transcribe overlapping segments with bounded concurrency and stitch the text"""
+        if self.normalize_enabled:
+            original_size = len(audio.frames)
+            with track_stage("audio_normalize"):
+                audio = await asyncio.to_thread(self._normalize_pcm, audio)
+            record_payload("audio_original", original_size)
+            record_payload("audio_normalized", len(audio.frames))
+        with track_stage("audio_split"):
+            segments = await asyncio.to_thread(
+                split_audio,
+                audio,
+                self.chunk_seconds,
+                self.chunk_overlap_seconds,
+                self.chunk_search_seconds
+            )
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+
+        async def transcribe_segment(segment: PcmAudio) -> str:
+            async with semaphore:
+                segment_wav = await asyncio.to_thread(write_wav, segment)
+                return await self._request_transcription(segment_wav, 'wav', **request_options)
+
+        texts = await asyncio.gather(*(transcribe_segment(segment) for segment in segments))
+        logger.info(f"Transcribed {audio.duration:.1f}s of audio in {len(segments)} segments")
+        return stitch_transcripts(texts)
+
+    async def _encode(self, file_content: bytes) -> str:
+        """Convert audio to base64 off the event loop"""
+        with track_stage("base64_encode"):
+            base64_audio = await asyncio.to_thread(encode_base64, file_content)
+        record_payload("base64_audio", len(base64_audio))
+        return base64_audio
+
+    async def _request_transcription(
+        self,
+        file_content: bytes,
+        format_name: str,
+        model: str,
+        prompt: str,
+        temperature: float,
+        timeout: float
+    ) -> str:
+        """Send one audio clip to the model and return its transcription"""
+        base64_audio = await self._encode(file_content)
+        
+        try:
+            with track_stage("gemini_transcription", upstream="gemini", model=model):
+                response = await self.pool.call(lambda client: client.chat.completions.create(
                     model=model,
                     messages=[
                         {
@@ -93,7 +367,7 @@ class SpeechHandler:
                             "content": [
                                 {
                                     "type": "text",
-                                    "text": transcription_prompt,
+                                    "text": prompt,
                                 },
                                 {
                                     "type": "input_audio",
@@ -105,29 +379,21 @@ class SpeechHandler:
                             ],
                         }
                     ],
-                    temperature=temperature
-                )
-
-                if not response.choices or not response.choices[0].message.content:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="No transcription received from the model"
-                    )
-
-                # Return in the same format as before
-                return {
-                    "text": response.choices[0].message.content.strip()
-                }
+                    temperature=temperature,
+                    timeout=timeout
+                ), kind="transcription")
 
-            except Exception as e:
-                logger.error(f"Google API error: {str(e)}")
+            if not response.choices or not response.choices[0].message.content:
                 raise HTTPException(
                     status_code=500,
-                    detail=f"Error from Google API: {str(e)}"
+                    detail="No transcription received from the model"
                 )
 
-        except HTTPException as e:
-            raise e
+            return response.choices[0].message.content.strip()
+
         except Exception as e:
-            logger.error(f"Error in transcribe_audio: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e)) 
+            logger.error(f"Google API error: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error from Google API: {str(e)}"
+            )
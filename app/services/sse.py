@@ -0,0 +1,58 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncIterator, Awaitable, Callable, Optional, Type
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_note_events(
+    get_transcription: Callable[[], Awaitable[str]],
+    content_generator,
+    response_model: Type[BaseModel],
+    send_transcription: bool = True,
+    save: Optional[Callable[[str, BaseModel], Awaitable[Optional[str]]]] = None,
+    route: Optional[str] = None,
+    echo_transcription: bool = True
+) -> AsyncIterator[str]:
+    """
+    Run a note pipeline as a sequence of server-sent events.
+
+    Events arrive in order: transcription, metadata (emoji and title),
+    summary deltas, then done with the complete response. Failures become
+    a final error event, since the 200 status has already been sent.
+    save(transcription, note) persists the finished note and returns its ID;
+    route selects per-route model overrides. Without echo_transcription
+    the done event leaves the transcription out.
+    """
+    try:
+        transcription = await get_transcription()
+        if send_transcription:
+            yield format_sse("transcription", {"transcription": transcription})
+
+        async for event, data in content_generator.stream_content(transcription, route=route):
+            if event == "content":
+                note = response_model(**data)
+                if save:
+                    note.id = await save(transcription, note)
+                yield format_sse("done", note.model_dump(exclude=None if echo_transcription else {"transcription"}))
+            else:
+                yield format_sse(event, data)
+
+    except HTTPException as e:
+        yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logger.error(f"Error streaming note: {str(e)}")
+        yield format_sse("error", {"status_code": 500, "detail": str(e)})
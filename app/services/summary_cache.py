@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+from app.config import env_bool, env_float, env_int
+from app.services.cache import LRUCache
+from app.services.transcript_compaction import FILLER_WORDS, strip_timestamps
+import asyncio
+import hashlib
+import numpy as np
+import re
+
+SIMHASH_BITS = 64
+# Words per shingle fed into the SimHash
+SHINGLE_WORDS = 3
+
+_WORD = re.compile(r"\w+(?:'\w+)*")
+_FILLER_WORDS = frozenset(FILLER_WORDS)
+
+def normalize_words(text: str) -> list[str]:
+    """
+    Lowercase words of the text without cue timestamps, punctuation or
+    filler words, dropped the same way transcript compaction drops them.
+    """
+    words = _WORD.findall(strip_timestamps(text).lower())
+    return [word for word in words if word not in _FILLER_WORDS]
+
+def simhash(words: list[str]) -> int:
+    """64-bit SimHash over overlapping word shingles; similar texts differ in few bits."""
+    shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles],
+        dtype=">u8"
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+@dataclass
+class TextFingerprint:
+    """Cache key of the normalized text and its owner, plus its SimHash when the text is long enough."""
+    key: str
+    simhash: Optional[int]
+    owner: str = ""
+
+class SummaryCache:
+    """
+    Cache of generated note content for texts that were seen before.
+
+    Texts are keyed by a hash of their normalized words, so whitespace,
+    casing, punctuation, cue timestamps and filler words do not matter. With
+    near-duplicate matching on, a SimHash index also finds stored texts whose
+    fingerprints differ in few enough bits to clear the similarity threshold.
+    Entries belong to the API key (owner) whose text produced them and are
+    only matched for that key, so one tenant never sees content generated
+    from another tenant's text.
+    The index is split into bit blocks so that any match within the allowed
+    distance shares at least one whole block with the query. Entries are
+    bounded by an LRU on the size of the stored content.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: Optional[float] = None,
+        near_duplicates: bool = True,
+        similarity: float = 0.95,
+        min_words: int = 8
+    ):
+        self.entries = LRUCache(max_bytes, sizeof=_content_size, default_ttl=ttl, on_evict=self._unindex)
+        self.near_duplicates = near_duplicates
+        self.max_distance = max(0, int((1 - similarity) * SIMHASH_BITS))
+        self.min_words = min_words
+        block_count = self.max_distance + 1
+        width = SIMHASH_BITS // block_count
+        # (shift, mask) of each block; the last block takes the leftover bits
+        self._blocks = [
+            (i * width, (1 << (width if i < block_count - 1 else SIMHASH_BITS - i * width)) - 1)
+            for i in range(block_count)
+        ]
+        # Buckets are per owner, so near-duplicate lookups only see that owner's entries
+        self._buckets: list[Dict[tuple[str, int], set[str]]] = [{} for _ in self._blocks]
+        self._fingerprints: Dict[str, tuple[str, int]] = {}
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SummaryCache":
+        ttl = env_float("SUMMARY_CACHE_TTL", 24 * 3600.0)
+        return cls(
+            max_bytes=env_int("SUMMARY_CACHE_MAX_BYTES", 8 * 1024 * 1024),
+            ttl=ttl if ttl > 0 else None,
+            near_duplicates=env_bool("SUMMARY_CACHE_NEAR_DUPLICATES", True),
+            similarity=env_float("SUMMARY_CACHE_SIMILARITY", 0.95),
+            min_words=env_int("SUMMARY_CACHE_MIN_WORDS", 8)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.entries.max_bytes > 0
+
+    def make_fingerprint(self, text: str, owner: str = "") -> Optional[TextFingerprint]:
+        """Normalize and hash the text of this owner; None if nothing is left to key on."""
+        words = normalize_words(text)
+        if not words:
+            return None
+        key = hashlib.sha256(f"{owner}\n{' '.join(words)}".encode("utf-8")).hexdigest()
+        near = simhash(words) if self.near_duplicates and len(words) >= self.min_words else None
+        return TextFingerprint(key, near, owner)
+
+    async def fingerprint(self, text: str, owner: str = "") -> Optional[TextFingerprint]:
+        """make_fingerprint off the event loop; it is linear in the text length."""
+        return await asyncio.to_thread(self.make_fingerprint, text, owner)
+
+    def get(self, fingerprint: TextFingerprint) -> Optional[Dict[str, str]]:
+        """Stored content for the same normalized text, else for the nearest near-duplicate"""
+        content = self.entries.get(fingerprint.key)
+        if content is not None:
+            self.exact_hits += 1
+            return content
+        if fingerprint.simhash is not None:
+            match = self._nearest(fingerprint.simhash, fingerprint.owner)
+            if match is not None:
+                content = self.entries.get(match)
+                if content is not None:
+                    self.near_hits += 1
+                    return content
+        self.misses += 1
+        return None
+
+    def set(self, fingerprint: TextFingerprint, content: Dict[str, str]) -> None:
+        self.entries.set(fingerprint.key, {field: content[field] for field in ("emoji", "title", "summary")})
+        if fingerprint.simhash is not None and fingerprint.key in self.entries:
+            self._index(fingerprint.key, fingerprint.simhash, fingerprint.owner)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self._fingerprints.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        entry_stats = self.entries.stats()
+        return {
+            "hits": self.exact_hits + self.near_hits,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": entry_stats["evictions"],
+            "expirations": entry_stats["expirations"],
+            "entries": entry_stats["entries"],
+            "indexed": len(self._fingerprints),
+            "bytes": entry_stats["bytes"],
+            "max_bytes": entry_stats["max_bytes"]
+        }
+
+    def _nearest(self, fingerprint: int, owner: str) -> Optional[str]:
+        best_key, best_distance = None, self.max_distance + 1
+        candidates = set()
+        for (shift, mask), bucket in zip(self._blocks, self._buckets):
+            candidates.update(bucket.get((owner, (fingerprint >> shift) & mask), ()))
+        for key in candidates:
+            distance = (self._fingerprints[key][1] ^ fingerprint).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def _index(self, key: str, fingerprint: int, owner: str) -> None:
+        self._unindex(key)
+        self._fingerprints[key] = (owner, fingerprint)
+        for (shift, mask), bucket in zip(self._blocks, self._buckets):
+            bucket.setdefault((owner, (fingerprint >> shift) & mask), set()).add(key)
+
+    def _unindex(self, key: str) -> None:
+        indexed = self._fingerprints.pop(key, None)
+        if indexed is None:
+            return
+        owner, fingerprint = indexed
+        for (shift, mask), bucket in zip(self._blocks, self._buckets):
+            block = (owner, (fingerprint >> shift) & mask)
+            keys = bucket.get(block)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[block]
+
+def _content_size(content: Dict[str, str]) -> int:
+    # Stored text plus a rough allowance for the key and index entries
+    return sum(len(value.encode("utf-8")) for value in content.values()) + 256
@@ -0,0 +1,45 @@
+import re
+
+# Rough characters-per-token ratio for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate, good enough for budgeting prompts."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def split_text(text: str, max_tokens: int) -> list[str]:
+    """
+    Split text into chunks of at most max_tokens estimated tokens.
+
+    Chunks break at sentence or line boundaries where possible; a sentence
+    longer than the budget is cut at whitespace, or hard-cut as a last resort.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    chunks: list[str] = []
+    current: list[str] = []
+    current_chars = 0
+
+    def flush() -> None:
+        nonlocal current, current_chars
+        if current:
+            chunks.append(" ".join(current))
+        current, current_chars = [], 0
+
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            flush()
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current_chars + len(sentence) + len(current) > max_chars:
+            flush()
+        current.append(sentence)
+        current_chars += len(sentence)
+    flush()
+    return chunks
@@ -0,0 +1,143 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Set
+from app.services.text_chunking import CHARS_PER_TOKEN, estimate_tokens
+import re
+
+# Hesitations that are never real words; "er", "ah" and "mm" are left alone
+FILLER_WORDS = ("um", "umm", "uh", "uhh", "uhm", "erm", "hmm", "mhm")
+# Only lines this short are treated as captions that may overlap the line before
+_CAPTION_LINE_WORDS = 20
+
+# SRT/VTT structure: header lines and "00:00:01,000 --> 00:00:04,000" timing lines
+_CUE_LINES = re.compile(r"^[ \t]*(?:WEBVTT\b.*|(?:Kind|Language):.*|[\d:.,]+[ \t]*-->.*)[ \t]*$", re.MULTILINE)
+# Cue numbers, only where a timing line follows; other number-only lines are content
+_CUE_NUMBERS = re.compile(r"^[ \t]*\d+[ \t]*\r?\n(?=[ \t]*[\d:.,]+[ \t]*-->)", re.MULTILINE)
+# Inline caption markup such as <c>, </c>, <v Speaker> and <00:00:01.000>
+_MARKUP = re.compile(r"</?[a-zA-Z0-9:.]+(?: [^<>\n]*)?>")
+# Bracketed timestamps anywhere, [01:02] or (0:01:02.500), and bare ones opening a line.
+# Bare times inside a sentence ("meet at 10:30") are content and stay.
+_TIMESTAMP = re.compile(
+    r"[\[(]\d{1,2}(?::\d{2}){1,2}(?:[.,]\d+)?[\])]"
+    r"|^[ \t]*\d{1,2}(?::\d{2}){1,2}(?:[.,]\d+)?(?:[ \t]*[-–][ \t]*\d{1,2}(?::\d{2}){1,2}(?:[.,]\d+)?)?",
+    re.MULTILINE
+)
+# Caption sound annotations such as [Music], (applause) and ♪
+_ANNOTATION = re.compile(r"[\[(](?:music|applause|laughter|laughing|laughs|inaudible|silence|noise|cheering)[\])]|[♪♫]+", re.IGNORECASE)
+_FILLER = re.compile(r"\b(?:" + "|".join(FILLER_WORDS) + r")\b[,.]?", re.IGNORECASE)
+_PUNCTUATION = ".,!?;:\"'()-–…"
+_BUDGET_MARKER = "\n[...]\n"
+
+@dataclass
+class CompactedTranscript:
+    """Compacted text and the characters each step removed from the original."""
+    text: str
+    original_chars: int
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def removed_chars(self) -> int:
+        return self.original_chars - len(self.text)
+
+def strip_timestamps(text: str) -> str:
+    """Remove caption cue timestamps, keeping times that are part of a sentence."""
+    return _TIMESTAMP.sub("", text)
+
+def _overlap(previous: List[str], current: List[str]) -> int:
+    """Length of the longest prefix of current that is also a suffix of previous (KMP prefix function)."""
+    sequence: List[Optional[str]] = [*current, None, *previous[-len(current):]]
+    prefix = [0] * len(sequence)
+    for i in range(1, len(sequence)):
+        k = prefix[i - 1]
+        while k and sequence[i] != sequence[k]:
+            k = prefix[k - 1]
+        if sequence[i] == sequence[k]:
+            k += 1
+        prefix[i] = k
+    return prefix[-1]
+
+def _collapse_repeats(text: str, min_overlap_words: int, window: int) -> tuple[str, int]:
+    """
+    Drop caption lines repeated within the last few lines, and the leading
+    words of a line that repeat the end of the line before it, as rolling
+    captions do. Returns the text and the number of characters dropped.
+    """
+    lines: List[str] = []
+    dropped = 0
+    previous: List[str] = []
+    recent: Deque[str] = deque()
+    recent_set: Set[str] = set()
+    for line in text.split("\n"):
+        words = line.split()
+        if not words:
+            continue
+        keys = [word.strip(_PUNCTUATION).lower() for word in words]
+        joined = " ".join(keys)
+        if joined in recent_set:
+            dropped += len(" ".join(words)) + 1
+            continue
+
+        overlap = 0
+        if previous and len(previous) <= _CAPTION_LINE_WORDS and len(keys) <= _CAPTION_LINE_WORDS:
+            overlap = _overlap(previous, keys)
+        if overlap == len(words) or overlap >= min_overlap_words:
+            dropped += sum(len(word) + 1 for word in words[:overlap])
+            words = words[overlap:]
+
+        previous = keys
+        recent.append(joined)
+        recent_set.add(joined)
+        if len(recent) > window:
+            recent_set.discard(recent.popleft())
+        if words:
+            lines.append(" ".join(words))
+    return "\n".join(lines), dropped
+
+def _fit_budget(text: str, max_tokens: int) -> str:
+    """Keep the start and end of the text within max_tokens, cutting the middle at whitespace."""
+    max_chars = max_tokens * CHARS_PER_TOKEN - len(_BUDGET_MARKER)
+    if max_chars <= 0:
+        return ""
+    head = text[:max_chars // 2]
+    head = head[:head.rfind(" ")] if " " in head else head
+    tail = text[len(text) - (max_chars - len(head)):]
+    tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+    return head.rstrip() + _BUDGET_MARKER + tail.lstrip()
+
+def compact_transcript(
+    text: str,
+    max_tokens: int = 0,
+    remove_fillers: bool = True,
+    min_overlap_words: int = 2,
+    duplicate_window: int = 4
+) -> CompactedTranscript:
+    """
+    Shrink a transcript before it goes into a prompt.
+
+    Strips caption structure and timestamps, sound annotations and filler
+    words, collapses repeated and overlapping caption lines, and normalizes
+    whitespace. If the result is still over max_tokens (0 means no limit),
+    the middle is cut so the start and end fit. Every step is a single
+    pass, so the cost is linear in the length of the transcript.
+    """
+    result = CompactedTranscript(text, len(text))
+
+    def step(reason: str, before: str, after: str) -> str:
+        result.removed[reason] = result.removed.get(reason, 0) + len(before) - len(after)
+        return after
+
+    current = step("timestamps", text, strip_timestamps(_MARKUP.sub("", _CUE_LINES.sub("", _CUE_NUMBERS.sub("", text)))))
+    current = step("annotations", current, _ANNOTATION.sub("", current))
+    if remove_fillers:
+        current = step("fillers", current, _FILLER.sub("", current))
+
+    current, dropped = _collapse_repeats(current, min_overlap_words, duplicate_window)
+    result.removed["duplicates"] = dropped
+    # Whatever else went missing was spacing and blank lines
+    result.removed["whitespace"] = result.original_chars - sum(result.removed.values()) - len(current)
+
+    if max_tokens and estimate_tokens(current) > max_tokens:
+        current = step("budget", current, _fit_budget(current, max_tokens))
+
+    result.text = current
+    return result
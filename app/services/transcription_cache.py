@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import env_int
+from app.services.cache import LRUCache
+import asyncio
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionCache:
+    """
+    Content-addressed cache of audio transcriptions.
+
+    Entries are keyed by a hash of the audio bytes together with the request
+    parameters that influence the output. A bounded in-memory LRU tier sits
+    in front of an optional on-disk tier that survives restarts.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0
+    ):
+        self.memory = LRUCache(max_bytes)
+        self.disk_dir = disk_dir if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_bytes = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.misses = 0
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        if self.disk_dir:
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls) -> "TranscriptionCache":
+        return cls(
+            max_bytes=env_int("TRANSCRIPTION_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+            disk_dir=os.getenv("TRANSCRIPTION_CACHE_DIR"),
+            disk_max_bytes=env_int("TRANSCRIPTION_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.max_bytes > 0 or self.disk_dir is not None
+
+    @staticmethod
+    def make_key(audio: bytes, model: str, prompt: str, temperature: float) -> str:
+        """Hash the audio content and transcription parameters into a cache key."""
+        digest = hashlib.sha256(audio)
+        digest.update(f"\0{model}\0{prompt}\0{temperature!r}".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a transcription in memory, then on disk."""
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+        if self.disk_dir and key in self._disk_index:
+            text = await asyncio.to_thread(self._read_disk, key)
+            if text is not None:
+                self._disk_index.move_to_end(key)
+                self.disk_hits += 1
+                self.memory.set(key, text)
+                return text
+            self.disk_bytes -= self._disk_index.pop(key, 0)
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, text: str) -> None:
+        """Store a transcription in every enabled tier."""
+        if self.memory.max_bytes > 0:
+            self.memory.set(key, text)
+        if not self.disk_dir:
+            return
+        data = text.encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        if not await asyncio.to_thread(self._write_disk, key, data):
+            return
+        self.disk_bytes -= self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(data)
+        self.disk_bytes += len(data)
+        evicted = self._evict_disk()
+        if evicted:
+            await asyncio.to_thread(self._remove_disk, evicted)
+
+    def stats(self) -> Dict[str, int]:
+        memory_stats = self.memory.stats()
+        return {
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": memory_stats["evictions"] + self.disk_evictions,
+            "memory_evictions": memory_stats["evictions"],
+            "disk_evictions": self.disk_evictions,
+            "memory_entries": memory_stats["entries"],
+            "memory_bytes": memory_stats["bytes"],
+            "memory_max_bytes": memory_stats["max_bytes"],
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": self.disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.txt")
+
+    def _load_disk_index(self) -> None:
+        """Index existing cache files, oldest first, so disk eviction is LRU by mtime."""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self.disk_bytes += size
+        self._remove_disk(self._evict_disk())
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+            return text
+        except OSError as e:
+            logger.warning(f"Dropping unreadable transcription cache entry {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, data: bytes) -> bool:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to write transcription cache entry {key}: {str(e)}")
+            return False
+
+    def _evict_disk(self) -> list[str]:
+        """Drop least recently used disk entries from the index; returns their keys."""
+        evicted = []
+        while self.disk_bytes > self.disk_max_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _remove_disk(self, keys: list[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
@@ -1,8 +1,29 @@
 import aiohttp
-import ssl
-import certifi
-from typing import Dict, Optional
+import json
+import os
+from typing import Dict, NamedTuple, Optional
 from urllib.parse import urlparse, parse_qs
+from app.config import env_float, env_int
+from app.services.cache import LRUCache, SingleFlight
+from app.services.http_sessions import get_http_session
+from app.services.metrics import UPSTREAM_RESPONSES, record_payload, track_stage
+
+KOME_API_URL = "https://api.kome.ai/api/tools/youtube-transcripts"
+
+class TranscriptUnavailableError(Exception):
+    """The transcript service answered, but has no transcript for this video."""
+
+class _Unavailable(NamedTuple):
+    """Cached marker for a video without a transcript; only the message is kept, not the exception."""
+    message: str
+
+# Per-video transcript cache; failures that will not change soon get a short TTL
+_transcript_cache = LRUCache(
+    max_bytes=env_int("YOUTUBE_TRANSCRIPT_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    default_ttl=env_float("YOUTUBE_TRANSCRIPT_CACHE_TTL", 3600.0)
+)
+_negative_ttl = env_float("YOUTUBE_TRANSCRIPT_NEGATIVE_TTL", 60.0)
+_transcript_flights = SingleFlight()
 
 async def extract_video_id(url: str) -> Optional[str]:
     """Extract video ID from various forms of YouTube URLs."""
@@ -17,9 +38,16 @@ async def extract_video_id(url: str) -> Optional[str]:
     except Exception:
         return None
 
+def transcript_cache_stats() -> Dict[str, int]:
+    """Cache and request-coalescing counters for the transcript fetcher."""
+    return {**_transcript_cache.stats(), **{f"flight_{k}": v for k, v in _transcript_flights.stats().items()}}
+
 async def fetch_youtube_transcript(video_id: str, format: bool = True) -> Dict:
     """
     Fetch YouTube transcript using the kome.ai API.
+
+    Results are cached per video ID, and concurrent requests for the same
+    video share a single upstream fetch.
     
     Args:
         video_id: YouTube video ID
@@ -28,7 +56,31 @@ async def fetch_youtube_transcript(video_id: str, format: bool = True) -> Dict:
     Returns:
         Dict containing the transcript response
     """
-    api_url = "https://api.kome.ai/api/tools/youtube-transcripts"
+    cache_key = (video_id, format)
+    cached = _transcript_cache.get(cache_key)
+    if isinstance(cached, _Unavailable):
+        raise TranscriptUnavailableError(cached.message)
+    if cached is not None:
+        return cached
+
+    return await _transcript_flights.do(cache_key, lambda: _fetch_and_cache(video_id, format))
+
+async def _fetch_and_cache(video_id: str, format: bool) -> Dict:
+    """Fetch a transcript upstream and record the outcome in the cache."""
+    cache_key = (video_id, format)
+    try:
+        result = await _request_transcript(video_id, format)
+    except TranscriptUnavailableError as e:
+        _transcript_cache.set(cache_key, _Unavailable(str(e)), ttl=_negative_ttl)
+        raise
+
+    ttl = None if result and result.get("transcript") else _negative_ttl
+    _transcript_cache.set(cache_key, result, ttl=ttl)
+    return result
+
+async def _request_transcript(video_id: str, format: bool) -> Dict:
+    """Call the kome.ai transcript API without caching."""
+    api_url = os.getenv("KOME_API_URL", KOME_API_URL)
     headers = {
         "accept": "application/json, text/plain, */*",
         "content-type": "application/json",
@@ -42,20 +94,28 @@ async def fetch_youtube_transcript(video_id: str, format: bool = True) -> Dict:
         "format": format
     }
     
-    # Create SSL context with proper certificate verification
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    
-    connector = aiohttp.TCPConnector(ssl=ssl_context)
+    # Shared keep-alive session with a verified SSL context
+    session = get_http_session()
     
     try:
-        async with aiohttp.ClientSession(connector=connector) as session:
+        with track_stage("kome_fetch"):
             async with session.post(api_url, json=payload, headers=headers) as response:
+                UPSTREAM_RESPONSES.inc(upstream="kome", status=response.status)
                 if response.status == 200:
-                    return await response.json()
+                    body = await response.read()
+                    record_payload("transcript", len(body))
+                    return json.loads(body)
                 else:
                     error_text = await response.text()
-                    raise Exception(f"Failed to fetch transcript. Status: {response.status}, Error: {error_text}")
+                    message = f"Failed to fetch transcript. Status: {response.status}, Error: {error_text}"
+                    # Client errors mean the video has no usable transcript; retrying won't help
+                    if 400 <= response.status < 500 and response.status != 429:
+                        raise TranscriptUnavailableError(message)
+                    raise Exception(message)
+    except TranscriptUnavailableError:
+        raise
     except aiohttp.ClientError as e:
+        UPSTREAM_RESPONSES.inc(upstream="kome", status=type(e).__name__)
         raise Exception(f"Network error occurred: {str(e)}")
     except Exception as e:
-        raise Exception(f"An unexpected error occurred: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"An unexpected error occurred: {str(e)}") 
@@ -0,0 +1,95 @@
+"""
+Upstream payload size with and without audio normalization.
+
+Synthesizes speech-like recordings in the formats voice note apps commonly
+upload (44.1/48 kHz, stereo, 16/24-bit WAV, with silence at both ends),
+normalizes them the way SpeechHandler does before transcription and reports
+original vs. normalized file and base64 sizes plus the time taken, as JSON.
+Files given with --file are measured too; the repository's test.wav is in
+fact an MP3 (ID3 header), so it is passed through unchanged.
+
+    python -m benchmarks.bench_audio_normalization --seconds 60 --file test.wav
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("GEMINI_API_KEY", "bench-gemini-key")
+
+from app.services.audio_upload import encode_base64
+from app.services.pcm_audio import PcmAudio, write_wav
+from app.services.speech_handler import SpeechHandler
+
+FORMATS = [
+    ("44.1kHz stereo 16-bit", 44100, 2, 2),
+    ("48kHz stereo 16-bit", 48000, 2, 2),
+    ("48kHz stereo 24-bit", 48000, 2, 3),
+    ("44.1kHz mono 16-bit", 44100, 1, 2),
+    ("16kHz mono 16-bit", 16000, 1, 2)
+]
+
+def _speech_like(seconds: float, sample_rate: int, lead_silence: float = 1.5) -> np.ndarray:
+    """Voiced harmonics with syllable-rate amplitude modulation, framed by silence."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    signal = 0.2 * voiced * envelope + 0.005 * rng.standard_normal(len(t))
+    silence = np.zeros(int(lead_silence * sample_rate))
+    return np.concatenate([silence, signal, silence])
+
+def _encode(mono: np.ndarray, sample_rate: int, channels: int, sample_width: int) -> bytes:
+    full_scale = 2 ** (8 * sample_width - 1) - 1
+    ints = np.round(np.clip(mono, -1, 1) * full_scale).astype(np.int32)
+    interleaved = np.repeat(ints[:, None], channels, axis=1).reshape(-1)
+    raw = interleaved.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :sample_width]
+    return write_wav(PcmAudio(raw.tobytes(), channels, sample_width, sample_rate))
+
+def _measure(handler: SpeechHandler, name: str, data: bytes, format_name: str) -> dict:
+    started = time.perf_counter()
+    normalized, sent_format = handler._normalize_file(data, format_name) if format_name in ("wav", "aiff") else (data, format_name)
+    elapsed = time.perf_counter() - started
+    original_b64 = len(encode_base64(data))
+    normalized_b64 = len(encode_base64(normalized))
+    return {
+        "input": name,
+        "format": format_name,
+        "sent_format": sent_format,
+        "original_bytes": len(data),
+        "normalized_bytes": len(normalized),
+        "original_base64_bytes": original_b64,
+        "normalized_base64_bytes": normalized_b64,
+        "reduction": round(1 - len(normalized) / len(data), 3),
+        "normalize_ms": round(elapsed * 1000, 2)
+    }
+
+def main(seconds: float, files: list[str]) -> dict:
+    handler = SpeechHandler()
+    results = []
+    for name, sample_rate, channels, sample_width in FORMATS:
+        data = _encode(_speech_like(seconds, sample_rate), sample_rate, channels, sample_width)
+        results.append(_measure(handler, name, data, "wav"))
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        # Report what the upload really is, not what its extension claims
+        format_name = "mp3" if data[:3] == b"ID3" else "wav"
+        results.append(_measure(handler, os.path.basename(path), data, format_name))
+    return {
+        "speech_seconds": seconds,
+        "target_sample_rate": handler.normalize_sample_rate,
+        "silence_threshold_db": handler.silence_threshold_db,
+        "results": results
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=60.0, help="speech duration of each synthetic recording")
+    parser.add_argument("--file", action="append", default=[], help="also measure this audio file")
+    args = parser.parse_args()
+    print(json.dumps(main(args.seconds, args.file), indent=2))
@@ -0,0 +1,240 @@
+"""
+Throughput and latency of the three note routes under concurrent load.
+
+Starts local Gemini and kome.ai stubs with configurable latency and error
+rates, serves the app in-process under uvicorn, and drives the voice note,
+YouTube and raw text routes with a fixed number of concurrent clients per
+level. Reports RPS, p50/p95/p99 latency, status counts and peak RSS per
+route and level as JSON, tagged with the current commit so runs can be
+compared across changes.
+
+Every request carries a distinct input by default so the caches do not
+hide upstream cost; --repeat-inputs sends the same input every time. The
+load generator shares the process, so peak RSS includes its (small) share.
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.stubs import GeminiStub, KomeStub
+
+API_KEY = "bench-api-key"
+ROUTES = ("voice-notes", "youtube-notes", "raw-text")
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's VmHWM (Linux only); False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _voice_note(seconds: float = 1.0, sample_rate: int = 16000) -> bytes:
+    """A short mono 16-bit WAV of random noise, distinct on every call."""
+    from app.services.pcm_audio import PcmAudio, write_wav
+    samples = np.random.randint(-3000, 3000, int(seconds * sample_rate), dtype=np.int16)
+    return write_wav(PcmAudio(samples.tobytes(), 1, 2, sample_rate))
+
+class RequestFactory:
+    """Build the next request for a route, with a distinct input unless repeating."""
+
+    def __init__(self, repeat_inputs: bool, audio_seconds: float, text_words: int):
+        self.repeat_inputs = repeat_inputs
+        self.audio_seconds = audio_seconds
+        self.text_words = text_words
+        self._counter = 0
+        self._audio = _voice_note(audio_seconds)
+
+    def _next_id(self) -> int:
+        if self.repeat_inputs:
+            return 0
+        self._counter += 1
+        return self._counter
+
+    def build(self, route: str) -> dict:
+        request_id = self._next_id()
+        if route == "voice-notes":
+            audio = self._audio if self.repeat_inputs else _voice_note(self.audio_seconds)
+            return {"files": {"file": ("note.wav", audio, "audio/wav")}}
+        if route == "youtube-notes":
+            return {"json": {"video_url": f"https://www.youtube.com/watch?v=bench{request_id:06d}"}}
+        words = " ".join(f"word{(request_id + i) % 997}" for i in range(self.text_words))
+        return {"json": {"text": f"Note {request_id}: {words}"}}
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+async def _run_level(client: httpx.AsyncClient, factory: RequestFactory, route: str, concurrency: int, total: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = factory.build(route)
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/api/v1/{route}", **request)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    reset = _reset_peak_rss()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": statuses.get("200", 0),
+        "status_counts": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(_percentile(ordered, 0.50), 2),
+        "p95_ms": round(_percentile(ordered, 0.95), 2),
+        "p99_ms": round(_percentile(ordered, 0.99), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_is_per_level": reset
+    }
+
+async def main(args: argparse.Namespace) -> dict:
+    gemini = GeminiStub(
+        latency=args.gemini_latency, error_rate=args.gemini_error_rate, error_status=args.error_status,
+        slow_rate=args.gemini_slow_rate, slow_latency=args.gemini_slow_latency, seed=args.seed
+    )
+    kome = KomeStub(latency=args.kome_latency, error_rate=args.kome_error_rate, error_status=args.error_status, seed=args.seed)
+    async with gemini, kome:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Configure before importing the app; services read settings at import
+            os.environ.update({
+                "API_KEY": API_KEY,
+                "GEMINI_API_KEY": "bench-gemini-key",
+                "GEMINI_BASE_URL": gemini.base_url,
+                "KOME_API_URL": kome.api_url,
+                "JOB_QUEUE_DB": os.path.join(tmp, "jobs.sqlite3"),
+                "NOTE_STORE_DB": os.path.join(tmp, "notes.sqlite3")
+            })
+            os.environ.pop("TRANSCRIPTION_CACHE_DIR", None)
+            import uvicorn
+            from app.main import app
+
+            sock = socket.socket()
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+            server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+            serving = asyncio.create_task(server.serve(sockets=[sock]))
+            while not server.started:
+                await asyncio.sleep(0.05)
+
+            factory = RequestFactory(args.repeat_inputs, args.audio_seconds, args.text_words)
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            results = []
+            try:
+                async with httpx.AsyncClient(
+                    base_url=f"http://127.0.0.1:{port}",
+                    headers={"Authorization": f"Bearer {API_KEY}"},
+                    limits=limits,
+                    timeout=args.timeout
+                ) as client:
+                    for route in args.routes:
+                        if args.warmup:
+                            await _run_level(client, factory, route, 1, args.warmup)
+                        for concurrency in args.concurrency:
+                            results.append(await _run_level(client, factory, route, concurrency, args.requests))
+                            print(json.dumps(results[-1]), file=sys.stderr)
+            finally:
+                server.should_exit = True
+                await serving
+                sock.close()
+
+    return {
+        "commit": _git_commit(),
+        "config": {
+            "routes": args.routes,
+            "concurrency": args.concurrency,
+            "requests_per_level": args.requests,
+            "repeat_inputs": args.repeat_inputs,
+            "gemini_latency_s": args.gemini_latency,
+            "gemini_error_rate": args.gemini_error_rate,
+            "gemini_slow_rate": args.gemini_slow_rate,
+            "gemini_slow_latency_s": args.gemini_slow_latency,
+            "kome_latency_s": args.kome_latency,
+            "kome_error_rate": args.kome_error_rate,
+            "error_status": args.error_status
+        },
+        "upstream": {
+            "gemini_requests": gemini.request_count,
+            "gemini_errors": gemini.error_count,
+            "gemini_slow": gemini.slow_count,
+            "kome_requests": kome.request_count,
+            "kome_errors": kome.error_count
+        },
+        "results": results
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="uncounted requests per route before measuring")
+    parser.add_argument("--repeat-inputs", action="store_true", help="send the same input every time (cache hits)")
+    parser.add_argument("--audio-seconds", type=float, default=1.0)
+    parser.add_argument("--text-words", type=int, default=200)
+    parser.add_argument("--gemini-latency", type=float, default=0.2)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-slow-rate", type=float, default=0.0, help="fraction of Gemini calls that take --gemini-slow-latency")
+    parser.add_argument("--gemini-slow-latency", type=float, default=2.0)
+    parser.add_argument("--kome-latency", type=float, default=0.1)
+    parser.add_argument("--kome-error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,59 @@
+"""
+Latency of ContentGenerator on a long transcript in single-prompt mode versus
+map-reduce mode, against a local Gemini stub whose latency grows with the
+number of prompt tokens.
+
+    python -m benchmarks.bench_map_reduce --tokens 200000 --per-token-ms 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.stubs import GeminiStub
+
+SENTENCE = "We talked about the quarterly roadmap and agreed to ship the new sync engine first. "
+
+async def _time_generation(generator, transcription: str, threshold: int) -> float:
+    generator.map_reduce_threshold_tokens = threshold
+    started = time.perf_counter()
+    await generator.generate_content(transcription)
+    return time.perf_counter() - started
+
+async def main(tokens: int, per_token_ms: float, latency_ms: float) -> dict:
+    transcription = SENTENCE * (tokens * 4 // len(SENTENCE) + 1)
+    os.environ.setdefault("GEMINI_API_KEY", "bench-gemini-key")
+
+    async with GeminiStub(latency=latency_ms / 1000, per_token_latency=per_token_ms / 1000) as stub:
+        os.environ["GEMINI_BASE_URL"] = stub.base_url
+
+        # Imported after configuring the environment for the stub
+        from app.services.content_generator import ContentGenerator
+        from app.services.gemini_pool import close_gemini_pool
+
+        generator = ContentGenerator()
+        single = await _time_generation(generator, transcription, threshold=10 ** 12)
+        calls_before = stub.request_count
+        mapped = await _time_generation(generator, transcription, threshold=0)
+        map_reduce_calls = stub.request_count - calls_before
+        await close_gemini_pool()
+
+    return {
+        "transcript_tokens": tokens,
+        "per_token_ms": per_token_ms,
+        "map_chunk_tokens": generator.map_chunk_tokens,
+        "map_concurrency": generator.map_concurrency,
+        "single_prompt_s": round(single, 3),
+        "map_reduce_s": round(mapped, 3),
+        "map_reduce_calls": map_reduce_calls,
+        "speedup": round(single / mapped, 2)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=200000)
+    parser.add_argument("--per-token-ms", type=float, default=0.02)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.tokens, args.per_token_ms, args.latency_ms)), indent=2))
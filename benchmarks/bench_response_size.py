@@ -0,0 +1,81 @@
+"""
+Serialize-and-compress cost and bytes on the wire for large note responses.
+
+Builds YouTube note responses around transcripts of increasing size and
+times the stdlib path (model_dump, then json.dumps, as FastAPI's
+JSONResponse did) against Pydantic's compiled model_dump_json, which the
+note routes now use. Each body is then compressed with every coding this
+process supports, reporting time and size, plus the size with the
+transcription left out. Results are printed as JSON.
+
+    python -m benchmarks.bench_response_size --sizes 10000 100000 500000 2000000
+"""
+import argparse
+import json
+import random
+import time
+
+from app.middleware.compression import available_encoders
+from app.schemas.voice_note import YouTubeVideoResponse
+from app.services.responses import WITHOUT_TRANSCRIPTION
+
+WORDS = (
+    "so the plan for next quarter is to ship the new onboarding flow first and then "
+    "look at pricing again because customers keep asking about annual plans and we "
+    "need better numbers before the board meeting in march"
+).split()
+
+def _transcript(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+def _best_ms(function, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+def _stdlib_json(note: YouTubeVideoResponse) -> bytes:
+    return json.dumps(note.model_dump(), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def main(sizes: list[int], repeats: int) -> dict:
+    encoders = available_encoders()
+    results = []
+    for size in sizes:
+        note = YouTubeVideoResponse(
+            emoji="📈", title="Quarterly planning", transcription=_transcript(size), summary="A summary. " * 40, id="0" * 32
+        )
+        body = note.model_dump_json().encode()
+        assert json.loads(body) == json.loads(_stdlib_json(note))
+        compression = {}
+        for name, encode in encoders.items():
+            compressed = encode(body)
+            compression[name] = {
+                "bytes": len(compressed),
+                "ratio": round(len(compressed) / len(body), 3),
+                "compress_ms": _best_ms(lambda: encode(body), repeats)
+            }
+        results.append({
+            "transcript_chars": size,
+            "json_bytes": len(body),
+            "json_bytes_without_transcription": len(note.model_dump_json(exclude=WITHOUT_TRANSCRIPTION)),
+            "stdlib_serialize_ms": _best_ms(lambda: _stdlib_json(note), repeats),
+            "pydantic_serialize_ms": _best_ms(lambda: note.model_dump_json().encode(), repeats),
+            "compression": compression
+        })
+    return {"encodings": list(encoders), "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000, 2000000], help="transcript sizes in characters")
+    parser.add_argument("--repeats", type=int, default=5, help="timing runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+    print(json.dumps(main(args.sizes, args.repeats), indent=2))
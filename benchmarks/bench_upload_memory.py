@@ -0,0 +1,112 @@
+"""
+Peak server RSS while many large voice notes are uploaded concurrently.
+
+Runs the app under uvicorn in a child process, points it at a local Gemini
+stub, fires concurrent uploads of a valid WAV streamed from a temp file and
+reports the server's peak resident set size (VmHWM) and the response status
+counts in machine-readable form. Uploads larger than the limit show the cost
+of early rejection instead.
+
+    python -m benchmarks.bench_upload_memory --uploads 50 --size-mb 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.stubs import GeminiStub, sample_wav
+
+API_KEY = "bench-api-key"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _rss_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+async def _wait_until_healthy(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become healthy")
+
+async def _upload(client: httpx.AsyncClient, base_url: str, path: str) -> int:
+    with open(path, "rb") as f:
+        files = {"file": ("note.wav", f, "audio/wav")}
+        response = await client.post(
+            f"{base_url}/api/v1/voice-notes",
+            headers={"Authorization": f"Bearer {API_KEY}"},
+            files=files
+        )
+    return response.status_code
+
+async def main(uploads: int, size_mb: float) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, "note.wav")
+        with open(audio_path, "wb") as f:
+            # 16 kHz mono 16-bit PCM after the 44-byte header
+            f.write(sample_wav(seconds=(int(size_mb * 1024 * 1024) - 44) / 2 / 16000))
+
+        async with GeminiStub(latency=0.5) as stub:
+            env = {
+                **os.environ,
+                "API_KEY": API_KEY,
+                "GEMINI_API_KEY": "bench-gemini-key",
+                "GEMINI_BASE_URL": stub.base_url,
+                "TRANSCRIPTION_CACHE_MAX_BYTES": "0"
+            }
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                env=env
+            )
+            try:
+                await _wait_until_healthy(base_url)
+                idle_rss_kb = _rss_kb(server.pid, "VmRSS")
+                started = time.perf_counter()
+                async with httpx.AsyncClient(timeout=300) as client:
+                    statuses = await asyncio.gather(*(_upload(client, base_url, audio_path) for _ in range(uploads)))
+                elapsed = time.perf_counter() - started
+                peak_rss_kb = _rss_kb(server.pid, "VmHWM")
+            finally:
+                server.terminate()
+                server.wait()
+
+    upload_mb = uploads * size_mb
+    return {
+        "uploads": uploads,
+        "upload_size_mb": size_mb,
+        "statuses": {str(status): count for status, count in sorted(Counter(statuses).items())},
+        "elapsed_s": round(elapsed, 3),
+        "idle_rss_mb": round(idle_rss_kb / 1024, 1),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        "peak_over_idle_per_upload_size": round((peak_rss_kb - idle_rss_kb) / 1024 / upload_mb, 3)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=float, default=25)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.uploads, args.size_mb)), indent=2))
@@ -0,0 +1,72 @@
+"""
+Per-request latency of the YouTube transcript fetch with a fresh SSL
+context and session per call (the old behaviour) versus the shared pooled
+session, against a local HTTPS kome.ai stub.
+
+    python -m benchmarks.bench_youtube_session --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import statistics
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.stubs import KomeStub, make_self_signed_cert
+
+async def _fetch_with_fresh_session(api_url: str, ca_file: str, video_id: str) -> dict:
+    ssl_context = ssl.create_default_context(cafile=ca_file)
+    connector = aiohttp.TCPConnector(ssl=ssl_context)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.post(api_url, json={"video_id": video_id, "format": True}) as response:
+            return await response.json()
+
+async def _time_calls(fetch, count: int) -> list[float]:
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        await fetch(f"video-{i}")
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def _summary(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3)
+    }
+
+async def main(count: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_file, key_file = make_self_signed_cert(tmp)
+        os.environ["HTTP_CA_FILE"] = cert_file
+
+        async with KomeStub(cert=(cert_file, key_file)) as stub:
+            os.environ["KOME_API_URL"] = stub.api_url
+
+            # Imported after configuring the environment for the stub
+            from app.services.http_sessions import close_http_sessions
+            from app.services.youtube_transcript import _request_transcript
+
+            fresh = await _time_calls(lambda vid: _fetch_with_fresh_session(stub.api_url, cert_file, vid), count)
+            pooled = await _time_calls(lambda vid: _request_transcript(vid, True), count)
+            await close_http_sessions()
+
+    fresh_summary, pooled_summary = _summary(fresh), _summary(pooled)
+    return {
+        "requests": count,
+        "fresh_session": fresh_summary,
+        "pooled_session": pooled_summary,
+        "saved_per_request_ms": round(fresh_summary["mean_ms"] - pooled_summary["mean_ms"], 3)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.requests)), indent=2))
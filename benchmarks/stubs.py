@@ -0,0 +1,291 @@
+"""
+Local stand-ins for upstream services, used by the benchmarks and tests.
+
+GeminiStub mimics the OpenAI-compatible Gemini chat completions endpoint
+closely enough for SpeechHandler and ContentGenerator, and KomeStub mimics
+the kome.ai transcript API. Both add a configurable artificial latency per
+call and can fail a random fraction of calls with an error status; KomeStub
+can also serve HTTPS with a throwaway self-signed certificate.
+sample_wav and sample_mp3 build small, structurally valid uploads.
+"""
+from aiohttp import web
+from typing import Dict, Optional
+from app.services.pcm_audio import PcmAudio, write_wav
+import asyncio
+import json
+import numpy as np
+import os
+import random
+import ssl
+import subprocess
+import time
+
+STUB_TRANSCRIPTION = "This is a stub transcription of the uploaded voice note."
+
+def sample_wav(seconds: float = 0.5, sample_rate: int = 16000, seed: int = 0) -> bytes:
+    """A small valid mono 16-bit WAV of quiet noise; different seeds give different files."""
+    samples = np.random.default_rng(seed).integers(-3000, 3000, int(seconds * sample_rate), dtype=np.int16)
+    return write_wav(PcmAudio(samples.astype("<i2").tobytes(), 1, 2, sample_rate))
+
+def sample_mp3(frames: int = 8, id3: bool = True) -> bytes:
+    """A structurally valid MP3: optional ID3v2 tag, then silent 128 kbps 44.1 kHz frames."""
+    frame = b"\xff\xfb\x90\x64" + bytes(413)
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x00" if id3 else b""
+    return tag + frame * frames
+
+async def _start_site(app: web.Application, host: str = "127.0.0.1", ssl_context=None) -> tuple[web.AppRunner, int]:
+    """Start an aiohttp app on an ephemeral port and return (runner, port)."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, 0, ssl_context=ssl_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+def _prompt_tokens(body: dict) -> int:
+    """Approximate input tokens of a chat request (4 characters per token)."""
+    chars = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content)
+    return chars // 4
+
+class GeminiStub:
+    """
+    Fake Gemini chat completions server.
+
+    Each call takes latency seconds plus per_token_latency seconds for every
+    (estimated) prompt token, mimicking prefill cost on long inputs. Streaming
+    requests get the same answer as server-sent chunks of stream_chunk_chars
+    characters, stream_chunk_delay seconds apart. A random error_rate
+    fraction of calls fails with error_status and error_headers (such as a
+    Retry-After) after the same delay, and a random slow_rate fraction
+    takes slow_latency seconds instead of latency, giving the long tail
+    that hedging is meant to cut.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        per_token_latency: float = 0.0,
+        stream_chunk_chars: int = 8,
+        stream_chunk_delay: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        error_headers: Optional[Dict[str, str]] = None,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_chunk_delay = stream_chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_headers = error_headers
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.prompt_tokens = 0
+        self.request_count = 0
+        self.error_count = 0
+        self.slow_count = 0
+        self.models: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.base_url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> str:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post("/chat/completions", self._chat_completions)
+        self._runner, port = await _start_site(app)
+        self.base_url = f"http://127.0.0.1:{port}/"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "GeminiStub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _chat_completions(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            body = await request.json()
+            self.models[body.get("model")] = self.models.get(body.get("model"), 0) + 1
+            tokens = _prompt_tokens(body)
+            self.prompt_tokens += tokens
+            delay = self.latency + tokens * self.per_token_latency
+            if self.slow_rate and self._random.random() < self.slow_rate:
+                self.slow_count += 1
+                delay += self.slow_latency - self.latency
+            if delay:
+                await asyncio.sleep(delay)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.error_count += 1
+                return web.json_response(
+                    {"error": {"message": "Stub upstream error", "type": "server_error", "code": self.error_status}},
+                    status=self.error_status,
+                    headers=self.error_headers
+                )
+            if body.get("stream"):
+                return await self._stream(request, self._completion(body, tokens))
+            return web.json_response(self._completion(body, tokens))
+        finally:
+            self.in_flight -= 1
+
+    def _completion(self, body: dict, prompt_tokens: int = 0) -> dict:
+        message = {"role": "assistant", "content": None}
+        if body.get("tools"):
+            arguments = {
+                "emoji": "📝",
+                "title": "Stub note",
+                "summary": "A stub summary of the note."
+            }
+            if "transcription" in body["tools"][0]["function"]["parameters"]["properties"]:
+                arguments["transcription"] = STUB_TRANSCRIPTION
+            message["tool_calls"] = [{
+                "id": "call_stub",
+                "type": "function",
+                "function": {
+                    "name": body["tools"][0]["function"]["name"],
+                    "arguments": json.dumps(arguments)
+                }
+            }]
+        else:
+            message["content"] = STUB_TRANSCRIPTION
+
+        return {
+            "id": f"stub-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "total_tokens": prompt_tokens}
+        }
+
+    async def _stream(self, request: web.Request, completion: dict) -> web.StreamResponse:
+        """Replay a completion as OpenAI-style chat.completion.chunk events."""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        message = completion["choices"][0]["message"]
+        size = self.stream_chunk_chars
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            data = {
+                "id": completion["id"],
+                "object": "chat.completion.chunk",
+                "created": completion["created"],
+                "model": completion["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        if message.get("tool_calls"):
+            call = message["tool_calls"][0]
+            arguments = call["function"]["arguments"]
+            await response.write(chunk({"role": "assistant", "tool_calls": [{
+                "index": 0, "id": call["id"], "type": "function",
+                "function": {"name": call["function"]["name"], "arguments": ""}
+            }]}))
+            pieces = [{"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + size]}}]}
+                      for i in range(0, len(arguments), size)]
+        else:
+            content = message["content"]
+            pieces = [{"role": "assistant", "content": content[i:i + size]} for i in range(0, len(content), size)]
+
+        for delta in pieces:
+            if self.stream_chunk_delay:
+                await asyncio.sleep(self.stream_chunk_delay)
+            await response.write(chunk(delta))
+        await response.write(chunk({}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+def make_self_signed_cert(directory: str) -> tuple[str, str]:
+    """Create a localhost certificate with openssl; returns (cert_file, key_file)."""
+    cert_file = os.path.join(directory, "stub-cert.pem")
+    key_file = os.path.join(directory, "stub-key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key_file, "-out", cert_file, "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"
+        ],
+        check=True,
+        capture_output=True
+    )
+    return cert_file, key_file
+
+class KomeStub:
+    """Fake kome.ai YouTube transcript API; error_rate works as in GeminiStub."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        transcript: str = STUB_TRANSCRIPTION,
+        cert: Optional[tuple[str, str]] = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.transcript = transcript
+        self.cert = cert
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_headers = error_headers
+        self._random = random.Random(seed)
+        self.request_count = 0
+        self.error_count = 0
+        self.api_url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/api/tools/youtube-transcripts", self._transcripts)
+        ssl_context = None
+        if self.cert:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(*self.cert)
+        self._runner, port = await _start_site(app, ssl_context=ssl_context)
+        scheme = "https" if self.cert else "http"
+        self.api_url = f"{scheme}://127.0.0.1:{port}/api/tools/youtube-transcripts"
+        return self.api_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "KomeStub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _transcripts(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        body = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.error_count += 1
+            return web.Response(text="Stub upstream error", status=self.error_status)
+        return web.json_response({"video_id": body.get("video_id"), "transcript": self.transcript})
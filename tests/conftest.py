@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+# Services read their configuration at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-gemini-key")
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("METRICS_API_KEY", "test-metrics-key")
+os.environ.setdefault("JOB_QUEUE_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"))
+os.environ.setdefault("NOTE_STORE_DB", os.path.join(tempfile.mkdtemp(), "notes.sqlite3"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import pytest
+
+from app.services.gemini_pool import close_gemini_pool
+from benchmarks.stubs import GeminiStub
+
+@pytest.fixture
+def gemini_stub(monkeypatch):
+    """
+    Serve Gemini from a stub for the length of an async with block.
+
+    Call it with GeminiStub options, or with a stub instance such as a
+    subclass; the shared Gemini pool is rebuilt to point at the stub and
+    closed again afterwards.
+    """
+    @asynccontextmanager
+    async def serve(stub: Optional[GeminiStub] = None, **options):
+        async with stub or GeminiStub(**options) as running:
+            monkeypatch.setenv("GEMINI_BASE_URL", running.base_url)
+            await close_gemini_pool()
+            try:
+                yield running
+            finally:
+                await close_gemini_pool()
+
+    return serve
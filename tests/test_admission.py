@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, WebSocket
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.middleware.admission import AdmissionMiddleware
+from app.services.admission import RouteLimiter
+from app.services.metrics import ADMISSION_REJECTIONS
+
+def test_saturated_route_sheds_with_retry_after_before_reading_body():
+    slow_app = FastAPI()
+    bodies_read = 0
+
+    @slow_app.post("/work")
+    async def work(request: Request):
+        nonlocal bodies_read
+        await request.body()
+        bodies_read += 1
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    limiter = RouteLimiter("test_work", limit=2, max_queue=2)
+    limited_app = AdmissionMiddleware(slow_app, limits={"/work": limiter})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=limited_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post():
+                started = time.monotonic()
+                response = await client.post("/work", content=b"x" * 1024)
+                return response, time.monotonic() - started
+            return await asyncio.gather(*(post() for _ in range(8)))
+
+    rejected_before = ADMISSION_REJECTIONS.value(route="test_work", reason="queue_full")
+    results = asyncio.run(scenario())
+    served = [elapsed for response, elapsed in results if response.status_code == 200]
+    shed = [(response, elapsed) for response, elapsed in results if response.status_code == 503]
+
+    assert len(served) == 4 and len(shed) == 4
+    assert bodies_read == 4
+    assert max(served) >= 0.4
+    assert all(elapsed < 0.1 and int(response.headers["retry-after"]) >= 1 for response, elapsed in shed)
+    assert ADMISSION_REJECTIONS.value(route="test_work", reason="queue_full") - rejected_before == 4
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+def test_queued_requests_time_out_and_adaptive_limit_follows_latency():
+    async def scenario():
+        limiter = RouteLimiter("test_aimd", limit=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        try:
+            await limiter.acquire()
+        except Exception as e:
+            timed_out = e.status_code
+        limiter.release()
+
+        adaptive = RouteLimiter("test_aimd", limit=4, max_queue=4, adaptive=True, target_latency=1.0, max_limit=8)
+        for _ in range(40):
+            await adaptive.acquire()
+            adaptive.release(0.1)
+        grown = int(adaptive.limit)
+        for _ in range(3):
+            await adaptive.acquire()
+            adaptive.release(5.0)
+        return timed_out, limiter.queued, grown, int(adaptive.limit)
+
+    timed_out, queued, grown, slowed = asyncio.run(scenario())
+    assert timed_out == 503 and queued == 0
+    assert grown == 8
+    # Three slow requests in a row back off once, not three times
+    assert slowed == 5
+
+def test_slot_handed_over_at_timeout_is_kept(monkeypatch):
+    limiter = RouteLimiter("test_handoff", limit=1, max_queue=1, queue_timeout=0.05)
+
+    async def handed_over_then_timed_out(waiter, timeout):
+        # release() hands the slot to the waiter, then the timeout fires before it resumes
+        limiter.release()
+        assert waiter.done()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await limiter.acquire()
+        monkeypatch.setattr(asyncio, "wait_for", handed_over_then_timed_out)
+        await limiter.acquire()
+        monkeypatch.undo()
+        in_flight = limiter.in_flight
+        limiter.release()
+        return in_flight, limiter.in_flight, limiter.queued
+
+    # Admitted rather than shed, and the slot is not leaked
+    assert asyncio.run(scenario()) == (1, 0, 0)
+
+def test_websocket_sessions_hold_a_slot_and_are_closed_when_shed():
+    live_app = FastAPI()
+
+    @live_app.websocket("/live")
+    async def live(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_json({"event": "ready"})
+        await websocket.receive_text()
+        await websocket.close()
+
+    limiter = RouteLimiter("test_live", limit=1, max_queue=0)
+    client = TestClient(AdmissionMiddleware(live_app, limits={"/live": limiter}))
+    with client.websocket_connect("/live") as first:
+        assert first.receive_json() == {"event": "ready"}
+        with pytest.raises(WebSocketDisconnect) as shed:
+            with client.websocket_connect("/live") as second:
+                second.receive_json()
+        first.send_text("bye")
+    assert shed.value.code == 1013
+    assert limiter.in_flight == 0
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import sqlite3
+
+import httpx
+from fastapi import Depends, FastAPI, Request
+
+from app.auth.api_key import get_api_key
+from app.auth.key_registry import ApiKey, KeyRegistry, KeyUsage, hash_key, key_registry
+from app.main import app
+from app.middleware.api_key_quota import ApiKeyQuotaMiddleware
+
+def _write_keys(path, *entries):
+    with open(path, "w") as f:
+        json.dump({"keys": list(entries)}, f)
+
+def test_keys_are_found_by_hash_and_reloaded_when_the_source_changes(tmp_path):
+    path = tmp_path / "keys.json"
+    _write_keys(path, {"id": "acme", "sha256": hash_key("acme-secret")}, {"id": "old", "sha256": hash_key("old-secret"), "enabled": False})
+    registry = KeyRegistry(path=str(path), static_keys=[ApiKey("default", hash_key("env-secret"))])
+
+    assert registry.lookup("acme-secret").id == "acme"
+    assert registry.lookup("env-secret").id == "default"
+    assert registry.lookup("old-secret") is None
+    assert registry.lookup("acme-secret ") is None
+    assert not registry.reload()
+
+    _write_keys(path, {"id": "globex", "sha256": hash_key("globex-secret"), "max_concurrency": 2})
+    assert registry.reload()
+    assert registry.lookup("acme-secret") is None
+    assert registry.lookup("globex-secret").max_concurrency == 2
+
+    # A broken file keeps the keys already loaded
+    path.write_text("{not json")
+    assert not registry.reload()
+    assert registry.lookup("globex-secret") is not None
+
+    db_path = str(tmp_path / "keys.sqlite3")
+    db_registry = KeyRegistry(db_path=db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO api_keys (id, sha256, rate_per_second) VALUES (?, ?, ?)", ("initech", hash_key("initech-secret"), 5))
+    assert db_registry.lookup("initech-secret") is None
+    assert db_registry.reload()
+    assert db_registry.lookup("initech-secret").rate_per_second == 5
+
+def test_quotas_are_enforced_per_key_before_the_body_is_read():
+    slow_app = FastAPI()
+    bodies_read = 0
+
+    @slow_app.post("/api/work")
+    async def work(request: Request):
+        nonlocal bodies_read
+        await request.body()
+        bodies_read += 1
+        await asyncio.sleep(0.1)
+        return {"ok": True}
+
+    registry = KeyRegistry(static_keys=[
+        ApiKey("noisy", hash_key("noisy-secret"), max_concurrency=2),
+        ApiKey("quiet", hash_key("quiet-secret")),
+        ApiKey("metered", hash_key("metered-secret"), rate_per_second=1.0, burst=2)
+    ])
+    limited_app = ApiKeyQuotaMiddleware(slow_app, registry)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=limited_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def post(token: str):
+                return client.post("/api/work", headers={"Authorization": f"Bearer {token}"}, content=b"x" * 1024)
+            burst = await asyncio.gather(*(post("noisy-secret") for _ in range(6)), post("quiet-secret"), post("quiet-secret"))
+            metered = [await post("metered-secret") for _ in range(3)]
+            invalid = await post("unknown-secret")
+            return burst, metered, invalid
+
+    burst, metered, invalid = asyncio.run(scenario())
+    noisy, quiet = burst[:6], burst[6:]
+    assert sorted(response.status_code for response in noisy) == [200, 200, 429, 429, 429, 429]
+    assert [response.status_code for response in quiet] == [200, 200]
+    assert [response.status_code for response in metered] == [200, 200, 429]
+    assert int(metered[2].headers["retry-after"]) >= 1
+    assert invalid.status_code == 401
+    assert bodies_read == 6
+
+def test_endpoint_reuses_the_key_the_middleware_resolved():
+    class CountingRegistry(KeyRegistry):
+        lookups = 0
+
+        def lookup(self, token):
+            CountingRegistry.lookups += 1
+            return super().lookup(token)
+
+    keyed_app = FastAPI()
+
+    @keyed_app.get("/api/whoami")
+    async def whoami(api_key: ApiKey = Depends(get_api_key)):
+        return {"id": api_key.id}
+
+    registry = CountingRegistry(static_keys=[ApiKey("acme", hash_key("acme-secret"))])
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=ApiKeyQuotaMiddleware(keyed_app, registry))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/whoami", headers={"Authorization": "Bearer acme-secret"})
+
+    response = asyncio.run(scenario())
+    # The key is not in the global registry, so a second lookup there would have been a 401
+    assert response.json() == {"id": "acme"}
+    assert CountingRegistry.lookups == 1
+
+def test_refusals_carry_cors_headers(monkeypatch):
+    # A key whose rate bucket is empty, so its first request is over quota
+    throttled = ApiKey("throttled", hash_key("throttled-secret"), rate_per_second=0.001)
+    monkeypatch.setattr(key_registry, "_keys", {**key_registry._keys, throttled.sha256: throttled})
+    monkeypatch.setitem(key_registry._usage, throttled.id, KeyUsage(tokens=0.0))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def post(token: str):
+                headers = {"Authorization": f"Bearer {token}", "Origin": "https://notes.example"}
+                return client.post("/api/v1/raw-text", headers=headers, json={"text": "hi"})
+            return await post("unknown-secret"), await post("throttled-secret")
+
+    invalid, throttled_response = asyncio.run(scenario())
+    assert (invalid.status_code, throttled_response.status_code) == (401, 429)
+    for response in (invalid, throttled_response):
+        assert response.headers["access-control-allow-origin"] == "https://notes.example"
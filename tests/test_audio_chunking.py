@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.services.audio_chunking import split_audio, stitch_transcripts
+from app.services.pcm_audio import PcmAudio, read_wav, to_mono, write_wav
+
+SAMPLE_RATE = 16000
+
+def _tone_with_gaps(tone_seconds: float, gap_seconds: float, repeats: int) -> PcmAudio:
+    tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(int(tone_seconds * SAMPLE_RATE)) / SAMPLE_RATE)
+    gap = np.zeros(int(gap_seconds * SAMPLE_RATE))
+    signal = np.concatenate([np.concatenate([tone, gap]) for _ in range(repeats)])
+    return PcmAudio((signal * 32767).astype("<i2").tobytes(), 1, 2, SAMPLE_RATE)
+
+def test_wav_round_trip():
+    audio = _tone_with_gaps(0.5, 0.5, 2)
+    decoded = read_wav(write_wav(audio))
+    assert decoded == audio
+    assert decoded.duration == 2.0
+
+def test_splits_fall_in_silence_and_overlap():
+    # 9 s tone, 1 s silence, repeated: nominal 10 s cuts should land in the gaps
+    audio = _tone_with_gaps(9.0, 1.0, 4)
+    segments = split_audio(audio, chunk_seconds=10.0, overlap_seconds=0.4, search_seconds=2.0)
+
+    assert len(segments) == 4
+    assert sum(s.frame_count for s in segments) > audio.frame_count
+    for segment in segments[1:]:
+        edge = to_mono(segment.slice(0, int(0.2 * SAMPLE_RATE)))
+        assert np.abs(edge).max() < 1e-3
+
+def test_short_audio_is_not_split():
+    audio = _tone_with_gaps(1.0, 0.0, 1)
+    assert split_audio(audio, chunk_seconds=10.0, overlap_seconds=1.0, search_seconds=2.0) == [audio]
+
+def test_stitch_drops_overlapping_words():
+    texts = [
+        "We should ship the release on Friday after",
+        "on Friday, after the final review. Then we",
+        "then we celebrate."
+    ]
+    assert stitch_transcripts(texts) == "We should ship the release on Friday after the final review. Then we celebrate."
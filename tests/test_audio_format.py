@@ -0,0 +1,83 @@
+import asyncio
+import os
+import struct
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services.audio_format import sniff_audio
+from benchmarks.stubs import sample_mp3, sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+def _flac(sample_rate: int, channels: int, total_samples: int) -> bytes:
+    info = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + bytes(6) + info.to_bytes(8, "big") + bytes(16)
+    return b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo + bytes(64)
+
+def _ogg_page(payload: bytes, granule: int, header_type: int = 0) -> bytes:
+    return b"OggS" + bytes([0, header_type]) + struct.pack("<qIII", granule, 1, 0, 0) + bytes([1, len(payload)]) + payload
+
+def _ogg_vorbis(sample_rate: int, channels: int, samples: int) -> bytes:
+    ident = b"\x01vorbis" + struct.pack("<IBI", 0, channels, sample_rate) + bytes(14)
+    return _ogg_page(ident, 0, 0x02) + _ogg_page(bytes(50), samples, 0x04)
+
+def _adts(frames: int, frame_length: int = 200) -> bytes:
+    # AAC LC, 44.1 kHz (index 4), stereo, one raw data block per frame
+    header = bytes([
+        0xFF, 0xF1, (1 << 6) | (4 << 2), (2 << 6) | (frame_length >> 11),
+        (frame_length >> 3) & 0xFF, ((frame_length & 0x7) << 5) | 0x1F, 0xFC
+    ])
+    return (header + bytes(frame_length - 7)) * frames
+
+def test_detects_formats_and_reads_duration():
+    wav = sniff_audio(sample_wav(seconds=2.0, sample_rate=16000))
+    assert (wav.format, wav.sample_rate, wav.channels, wav.duration) == ("wav", 16000, 1, 2.0)
+
+    mp3 = sniff_audio(sample_mp3(frames=100))
+    assert (mp3.format, mp3.sample_rate) == ("mp3", 44100)
+    assert mp3.duration == pytest.approx(100 * 1152 / 44100, rel=0.01)
+    assert sniff_audio(sample_mp3(id3=False)).format == "mp3"
+
+    flac = sniff_audio(_flac(48000, 2, 96000))
+    assert (flac.format, flac.sample_rate, flac.channels, flac.duration) == ("flac", 48000, 2, 2.0)
+
+    ogg = sniff_audio(_ogg_vorbis(44100, 1, 441000))
+    assert (ogg.format, ogg.sample_rate, ogg.channels, ogg.duration) == ("ogg", 44100, 1, 10.0)
+
+    aac = sniff_audio(_adts(50))
+    assert (aac.format, aac.sample_rate, aac.channels) == ("aac", 44100, 2)
+    assert aac.duration == pytest.approx(50 * 1024 / 44100)
+
+def test_rejects_corrupt_and_truncated_files():
+    assert sniff_audio(b"just some text") is None
+    assert sniff_audio(b"RIFF\x00\x00\x00\x00AVI LIST") is None
+
+    wav = sample_wav(seconds=1.0)
+    for broken in (wav[:-100], wav[:30], b"RIFF0000WAVEfmt stub audio", sample_mp3()[:300],
+                   sample_mp3()[:10] + b"\xff\xfb\x90\x64" + b"junk" * 200, _ogg_vorbis(44100, 1, 100)[:-10]):
+        with pytest.raises(ValueError):
+            sniff_audio(broken)
+
+def test_upload_format_comes_from_content_not_declared_type(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                corrupt = await client.post(
+                    "/api/v1/voice-notes", headers=HEADERS,
+                    files={"file": ("note.wav", sample_wav(seed=7)[:-500], "audio/wav")}
+                )
+                upstream_calls = stub.request_count
+                untyped = await client.post(
+                    "/api/v1/voice-notes", headers=HEADERS,
+                    files={"file": ("note", sample_wav(seed=7), "application/octet-stream")}
+                )
+                return corrupt, upstream_calls, untyped
+
+    corrupt, upstream_calls, untyped = asyncio.run(scenario())
+    assert corrupt.status_code == 400
+    assert "truncated" in corrupt.json()["detail"]
+    assert upstream_calls == 0
+    assert untyped.status_code == 200
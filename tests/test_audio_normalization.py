@@ -0,0 +1,84 @@
+import asyncio
+import struct
+
+import numpy as np
+
+from app.services.audio_normalization import normalize_audio, resample, trim_silence
+from app.services.pcm_audio import PcmAudio, read_aiff, read_wav, to_mono, write_wav
+from app.services.speech_handler import SpeechHandler
+from benchmarks.stubs import sample_mp3
+
+def _tone(freq: float, seconds: float, sample_rate: int, amplitude: float = 0.5) -> np.ndarray:
+    return amplitude * np.sin(2 * np.pi * freq * np.arange(int(seconds * sample_rate)) / sample_rate)
+
+def _stereo_pcm(signal: np.ndarray, sample_rate: int) -> PcmAudio:
+    stereo = np.repeat((signal * 32767).astype("<i2")[:, None], 2, axis=1)
+    return PcmAudio(stereo.tobytes(), 2, 2, sample_rate)
+
+def _aiff(audio: PcmAudio) -> bytes:
+    """Big-endian AIFF file for 16-bit PCM audio."""
+    exponent = 16383 + 63
+    mantissa = audio.sample_rate
+    while not mantissa & (1 << 63):
+        mantissa <<= 1
+        exponent -= 1
+    common = struct.pack(">hIh", audio.channels, audio.frame_count, 16) + struct.pack(">HQ", exponent, mantissa)
+    samples = np.frombuffer(audio.frames, dtype="<i2").astype(">i2").tobytes()
+    sound = struct.pack(">II", 0, 0) + samples
+    chunks = b"COMM" + struct.pack(">I", len(common)) + common + b"SSND" + struct.pack(">I", len(sound)) + sound
+    return b"FORM" + struct.pack(">I", 4 + len(chunks)) + b"AIFF" + chunks
+
+def _peak_frequency(mono: np.ndarray, sample_rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(mono))
+    return np.fft.rfftfreq(len(mono), 1 / sample_rate)[np.argmax(spectrum)]
+
+def test_resample_keeps_speech_band_and_removes_aliases():
+    speech = resample(_tone(440, 1.0, 48000).astype(np.float32), 48000, 16000)
+    assert len(speech) == 16000
+    assert abs(_peak_frequency(speech, 16000) - 440) < 2
+    assert 0.45 < np.abs(speech).max() < 0.55
+
+    # 10 kHz is above the new Nyquist frequency and must not fold back to 6 kHz
+    treble = resample(_tone(10000, 1.0, 48000).astype(np.float32), 48000, 16000)
+    assert np.abs(treble[100:-100]).max() < 0.01
+
+def test_trim_silence_keeps_padding():
+    signal = np.concatenate([np.zeros(16000), _tone(440, 1.0, 16000), np.zeros(32000)]).astype(np.float32)
+    trimmed = trim_silence(signal, 16000, threshold_db=-45.0, padding_seconds=0.25)
+    assert abs(len(trimmed) - 1.5 * 16000) <= 2 * 320
+    assert np.abs(trim_silence(np.zeros(8000, dtype=np.float32), 16000, -45.0, 0.25)).max() == 0
+
+def test_aiff_decodes_like_wav():
+    audio = _stereo_pcm(_tone(440, 0.5, 44100), 44100)
+    assert read_aiff(_aiff(audio)) == audio
+
+def test_normalize_shrinks_stereo_48k_audio():
+    signal = np.concatenate([np.zeros(48000), _tone(440, 2.0, 48000), np.zeros(48000)])
+    audio = _stereo_pcm(signal, 48000)
+    normalized = normalize_audio(audio)
+    assert (normalized.channels, normalized.sample_width, normalized.sample_rate) == (1, 2, 16000)
+    # 4 s of 48 kHz stereo becomes about 2.5 s of 16 kHz mono
+    assert len(normalized.frames) < len(audio.frames) / 8
+    assert abs(_peak_frequency(to_mono(normalized), 16000) - 440) < 2
+
+def test_speech_handler_uploads_normalized_audio(monkeypatch):
+    handler = SpeechHandler()
+    sent = []
+
+    async def fake_request(file_content, format_name, **options):
+        sent.append((file_content, format_name))
+        return "hello"
+
+    monkeypatch.setattr(handler, "_request_transcription", fake_request)
+    audio = _stereo_pcm(np.concatenate([np.zeros(48000), _tone(440, 1.0, 48000)]), 48000)
+
+    wav = write_wav(audio)
+    asyncio.run(handler.transcribe_audio(wav, "audio/wav"))
+    asyncio.run(handler.transcribe_audio(_aiff(audio), "audio/aiff"))
+    asyncio.run(handler.transcribe_audio(sample_mp3(), "audio/mpeg"))
+
+    (wav_sent, wav_format), (aiff_sent, aiff_format), (mp3_sent, mp3_format) = sent
+    assert wav_format == aiff_format == "wav"
+    assert len(wav_sent) < len(wav) / 6
+    assert read_wav(wav_sent) == read_wav(aiff_sent)
+    assert (mp3_sent, mp3_format) == (sample_mp3(), "mp3")
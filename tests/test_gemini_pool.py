@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from app.services.gemini_client import build_gemini_client
+from app.services.gemini_pool import GeminiPool, PoolMember, _retry_after_seconds, close_gemini_pool, get_gemini_pool
+from app.services.metrics import UPSTREAM_RETRIES
+from benchmarks.stubs import GeminiStub
+
+def _ask(client):
+    return client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}], timeout=5.0)
+
+def _pool(*stubs: GeminiStub, **options) -> GeminiPool:
+    members = [PoolMember(f"m{i}", build_gemini_client("key", stub.base_url)) for i, stub in enumerate(stubs)]
+    return GeminiPool(members, **options)
+
+def test_calls_spread_over_least_loaded_members():
+    async def scenario():
+        async with GeminiStub(latency=0.1) as first, GeminiStub(latency=0.1) as second:
+            pool = _pool(first, second)
+            try:
+                await asyncio.gather(*(pool.call(_ask) for _ in range(10)))
+                return first.max_in_flight, second.max_in_flight, pool.stats()
+            finally:
+                await pool.close()
+
+    first_peak, second_peak, stats = asyncio.run(scenario())
+    assert first_peak == second_peak == 5
+    assert stats["m0"]["requests"] == stats["m1"]["requests"] == 5
+    assert 0 < stats["m0"]["utilization"] <= 1
+    assert stats["m0"]["mean_concurrency"] > stats["m0"]["utilization"]
+
+def test_throttled_member_leaves_rotation():
+    async def scenario():
+        async with GeminiStub(error_rate=1.0, error_status=429) as throttled, GeminiStub() as healthy:
+            pool = _pool(throttled, healthy, throttle_cooldown=60.0)
+            try:
+                for _ in range(6):
+                    await pool.call(_ask)
+                return throttled.request_count, healthy.request_count, pool.stats()
+            finally:
+                await pool.close()
+
+    throttled_calls, healthy_calls, stats = asyncio.run(scenario())
+    assert throttled_calls == 1
+    assert healthy_calls == 6
+    assert (stats["m0"]["throttled"], stats["m0"]["cooling_down"]) == (1, 1)
+
+def test_all_members_throttled_raises():
+    async def scenario():
+        async with GeminiStub(error_rate=1.0, error_status=429) as first, GeminiStub(error_rate=1.0, error_status=429) as second:
+            pool = _pool(first, second)
+            try:
+                with pytest.raises(openai.RateLimitError):
+                    await pool.call(_ask)
+                return first.request_count + second.request_count
+            finally:
+                await pool.close()
+
+    assert asyncio.run(scenario()) == 2
+
+def test_pool_members_come_from_key_and_url_lists(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEYS", "k1, k2")
+    monkeypatch.setenv("GEMINI_BASE_URLS", "http://a.test/v1/,http://b.test/v1/")
+
+    async def scenario():
+        await close_gemini_pool()
+        try:
+            return [member.name for member in get_gemini_pool().members]
+        finally:
+            await close_gemini_pool()
+
+    assert asyncio.run(scenario()) == ["key1@a.test", "key1@b.test", "key2@a.test", "key2@b.test"]
+
+async def _latencies(pool: GeminiPool, calls: int, workers: int = 10) -> list:
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            started = time.monotonic()
+            await pool.call(_ask, kind="test")
+            latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*(worker(calls // workers) for _ in range(workers)))
+    return sorted(latencies)
+
+def test_hedging_cuts_tail_latency():
+    async def p99(hedge_budget: float):
+        async with GeminiStub(latency=0.02, slow_rate=0.04, slow_latency=0.3, seed=3) as first, \
+                GeminiStub(latency=0.02, slow_rate=0.04, slow_latency=0.3, seed=4) as second:
+            pool = _pool(first, second, hedge_budget=hedge_budget, hedge_min_delay=0.03)
+            try:
+                await _latencies(pool, 30)
+                latencies = await _latencies(pool, 200)
+                return latencies[int(0.99 * len(latencies))], first.slow_count + second.slow_count
+            finally:
+                await pool.close()
+
+    baseline, baseline_slow = asyncio.run(p99(hedge_budget=0.0))
+    hedged, hedged_slow = asyncio.run(p99(hedge_budget=0.2))
+    assert baseline_slow and hedged_slow
+    assert baseline >= 0.3
+    assert hedged < 0.15
+
+def test_transient_errors_are_retried_with_backoff():
+    async def scenario(status: int):
+        async with GeminiStub(error_rate=0.5, error_status=status, seed=1) as stub:
+            pool = _pool(stub, max_retries=8, backoff_base=0.001)
+            try:
+                results = await asyncio.gather(*(pool.call(_ask) for _ in range(10)), return_exceptions=True)
+                return results, stub.error_count
+            finally:
+                await pool.close()
+
+    retries_before = UPSTREAM_RETRIES.value(upstream="gemini", reason=503)
+    results, errors = asyncio.run(scenario(503))
+    assert not any(isinstance(result, Exception) for result in results)
+    assert errors > 0
+    assert UPSTREAM_RETRIES.value(upstream="gemini", reason=503) - retries_before == errors
+
+    results, errors = asyncio.run(scenario(400))
+    assert all(isinstance(result, openai.BadRequestError) for result in results if isinstance(result, Exception))
+    assert sum(isinstance(result, Exception) for result in results) == errors
+
+def test_zero_retry_after_does_not_spin():
+    async def scenario():
+        stubs = [GeminiStub(error_rate=1.0, error_status=429, error_headers={"retry-after": "0"}) for _ in range(5)]
+        for stub in stubs:
+            await stub.start()
+        pool = _pool(*stubs, max_retries=2)
+        try:
+            with pytest.raises(openai.RateLimitError):
+                await asyncio.wait_for(pool.call(_ask), timeout=5.0)
+            return [stub.request_count for stub in stubs], pool.stats()
+        finally:
+            await pool.close()
+            for stub in stubs:
+                await stub.stop()
+
+    counts, stats = asyncio.run(scenario())
+    # One call plus max_retries re-dispatches, each to a member not yet throttled
+    assert sorted(counts) == [0, 0, 1, 1, 1]
+    assert sum(member["cooling_down"] for member in stats.values()) == 3
+
+def test_retry_after_header_formats():
+    assert _retry_after_seconds("7", 30.0) == 7.0
+    assert _retry_after_seconds("soon", 30.0) == 30.0
+    assert _retry_after_seconds("inf", 30.0) == 30.0
+    assert _retry_after_seconds(None, 30.0) == 30.0
+    assert _retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT", 30.0) < 0
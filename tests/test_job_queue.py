@@ -0,0 +1,229 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+import httpx
+from aiohttp import web
+from fastapi import HTTPException
+
+from app.main import app
+from app.schemas.voice_note import RawTextRequest
+from app.services.http_sessions import create_pinned_session
+from app.services.job_queue import JobQueue, job_queue
+from benchmarks.stubs import _start_site
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+async def _wait_for_finish(queue: JobQueue, job_id: str, attempts: int = 200) -> dict:
+    for _ in range(attempts):
+        job = await queue.get(job_id, "acme")
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+async def _echo(params, payload, owner):
+    if params["text"] == "fail":
+        raise HTTPException(status_code=400, detail="bad input")
+    return RawTextRequest(text=params["text"] + (payload or b"").decode())
+
+def test_jobs_run_and_record_results(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=2, retention_seconds=60)
+        queue.register_handler("echo", _echo)
+        await queue.start()
+        try:
+            ok = await queue.submit("echo", {"text": "hello "}, "acme", payload=b"world")
+            bad = await queue.submit("echo", {"text": "fail"}, "acme")
+            return await _wait_for_finish(queue, ok), await _wait_for_finish(queue, bad), await queue.stats()
+        finally:
+            await queue.stop()
+
+    ok, bad, stats = asyncio.run(scenario())
+    assert ok["status"] == "succeeded"
+    assert ok["result"] == {"text": "hello world"}
+    assert (bad["status"], bad["status_code"], bad["error"]) == ("failed", 400, "bad input")
+    assert stats["depth"] == 0
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+    assert stats["queue_wait_seconds"]["count"] == 2
+
+def test_queued_jobs_survive_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        # Submitted while no workers run, as if the process died right after
+        first = JobQueue(db_path, workers=1, retention_seconds=60)
+        first.register_handler("echo", _echo)
+        job_id = await first.submit("echo", {"text": "persisted"}, "acme")
+        assert (await first.stats())["depth"] == 1
+        await first.stop()
+
+        second = JobQueue(db_path, workers=1, retention_seconds=60)
+        second.register_handler("echo", _echo)
+        await second.start()
+        try:
+            return await _wait_for_finish(second, job_id)
+        finally:
+            await second.stop()
+
+    job = asyncio.run(scenario())
+    assert job["result"] == {"text": "persisted"}
+
+def test_raw_text_job_mode_returns_job_id():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post("/api/v1/raw-text", params={"job": "true"}, json={"text": "hi"}, headers=HEADERS)
+            status = await client.get(accepted.json()["status_url"], headers=HEADERS)
+            missing = await client.get("/api/v1/jobs/unknown", headers=HEADERS)
+        await job_queue.stop()
+        return accepted, status, missing
+
+    accepted, status, missing = asyncio.run(scenario())
+    assert accepted.status_code == 202
+    assert status.status_code == 200
+    assert status.json()["status"] == "queued"
+    assert status.json()["kind"] == "raw_text"
+    assert missing.status_code == 404
+
+def test_callback_urls_must_be_public_https(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, retention_seconds=60, callback_hosts=["hooks.internal"])
+        queue.register_handler("echo", _echo)
+        refused = []
+        for url in ("http://example.com/hook", "https://127.0.0.1/hook", "https://169.254.169.254/latest", "https://[::1]/hook", "https://10.0.0.5/hook"):
+            try:
+                await queue.submit("echo", {"text": "x"}, "acme", callback_url=url)
+            except HTTPException as e:
+                refused.append(e.status_code)
+        allowed = await queue.submit("echo", {"text": "x"}, "acme", callback_url="http://hooks.internal:8080/done")
+        await queue.stop()
+        return refused, allowed
+
+    refused, allowed = asyncio.run(scenario())
+    assert refused == [400] * 5
+    assert allowed
+
+def test_full_queue_refuses_with_retry_after(tmp_path):
+    async def scenario():
+        # No workers, so submitted jobs stay queued
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, retention_seconds=60, max_depth=2)
+        queue.register_handler("echo", _echo)
+        await queue.submit("echo", {"text": "a"}, "acme")
+        await queue.submit("echo", {"text": "b"}, "acme")
+        try:
+            await queue.submit("echo", {"text": "c"}, "acme")
+        except HTTPException as e:
+            refused = e
+        stats = await queue.stats()
+        await queue.stop()
+        return refused, stats
+
+    refused, stats = asyncio.run(scenario())
+    assert refused.status_code == 503
+    assert int(refused.headers["Retry-After"]) >= 1
+    assert stats["depth"] == 2
+
+def test_queued_jobs_count_against_the_key_quota(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, retention_seconds=60)
+        queue.register_handler("echo", _echo)
+        for text in ("a", "b"):
+            await queue.submit("echo", {"text": text}, "acme", max_active=2)
+        try:
+            await queue.submit("echo", {"text": "c"}, "acme", max_active=2)
+        except HTTPException as e:
+            refused = e
+        other = await queue.submit("echo", {"text": "d"}, "globex", max_active=2)
+        assert other
+
+        # Finished jobs free the quota again
+        await queue.start()
+        try:
+            while await queue.active("acme"):
+                await asyncio.sleep(0.01)
+            again = await queue.submit("echo", {"text": "e"}, "acme", max_active=2)
+        finally:
+            await queue.stop()
+        return refused, again
+
+    refused, again = asyncio.run(scenario())
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+    assert again
+
+def test_only_jobs_with_expired_leases_are_requeued(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        # Claimed by another instance that is still alive, and by one that died a while ago
+        other = JobQueue(db_path, workers=1, retention_seconds=60, lease_seconds=30)
+        other.register_handler("echo", _echo)
+        live = await other.submit("echo", {"text": "live"}, "acme")
+        dead = await other.submit("echo", {"text": "dead"}, "acme")
+        await asyncio.to_thread(other._claim_next)
+        await asyncio.to_thread(other._claim_next)
+        await asyncio.to_thread(other._execute, "UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 60, dead))
+
+        queue = JobQueue(db_path, workers=1, retention_seconds=60, lease_seconds=30)
+        queue.register_handler("echo", _echo)
+        await queue.start()
+        try:
+            return await _wait_for_finish(queue, dead), await queue.get(live, "acme")
+        finally:
+            await queue.stop()
+            await other.stop()
+
+    dead, live = asyncio.run(scenario())
+    assert dead["result"] == {"text": "dead"}
+    assert live["status"] == "running"
+
+def test_callbacks_connect_to_the_checked_address(tmp_path):
+    async def scenario():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, retention_seconds=60)
+        checked = await queue.check_callback_url("https://93.184.216.34/hook")
+
+        async def hook(request):
+            return web.json_response({"host": request.headers["Host"]})
+
+        hooks = web.Application()
+        hooks.router.add_post("/hook", hook)
+        runner, port = await _start_site(hooks)
+        # The name does not resolve at all, so only the pinned address can be reached
+        session = create_pinned_session("callback.invalid", ["127.0.0.1"])
+        try:
+            async with session.post(f"http://callback.invalid:{port}/hook") as response:
+                return checked, await response.json()
+        finally:
+            await session.close()
+            await runner.cleanup()
+
+    checked, seen = asyncio.run(scenario())
+    assert checked == ["93.184.216.34"]
+    assert seen["host"].startswith("callback.invalid:")
+
+def test_workers_survive_unexpected_errors(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, retention_seconds=60)
+    queue.register_handler("echo", _echo)
+    claim_next = queue._claim_next
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_claim_next():
+        if failures:
+            raise failures.pop()
+        return claim_next()
+
+    monkeypatch.setattr(queue, "_claim_next", flaky_claim_next)
+
+    async def scenario():
+        job_id = await queue.submit("echo", {"text": "later"}, "acme")
+        await queue.start()
+        try:
+            return await _wait_for_finish(queue, job_id, attempts=300)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(scenario())
+    assert not failures
+    assert job["result"] == {"text": "later"}
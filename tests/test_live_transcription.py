@@ -0,0 +1,116 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.main import app
+from app.routers import live_notes
+from app.services.live_transcription import LiveTranscription
+from app.services.pcm_audio import PcmAudio
+
+SAMPLE_RATE = 16000
+
+def _speech(seconds: float, gap_every: float = 5.0) -> bytes:
+    # Tone with a quarter second of silence every gap_every seconds
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 0.5 * np.sin(2 * np.pi * 440 * t) * ((t % gap_every) < gap_every - 0.25)
+    return (signal * 32767).astype("<i2").tobytes()
+
+def test_windows_are_transcribed_while_audio_arrives():
+    async def scenario():
+        partials = []
+        lengths = []
+
+        async def transcribe(audio: PcmAudio) -> str:
+            lengths.append(audio.duration)
+            return f"window {len(lengths)}"
+
+        async def on_partial(index: int, text: str):
+            partials.append((index, text))
+
+        session = LiveTranscription(transcribe, SAMPLE_RATE, 1, on_partial, window_seconds=10.0, search_seconds=2.0)
+        audio = _speech(35.0)
+        for offset in range(0, len(audio), 6400):
+            session.feed(audio[offset:offset + 6400])
+            await asyncio.sleep(0)
+        streamed = len(partials)
+        text = await session.finish()
+        return streamed, partials, lengths, text, session
+
+    streamed, partials, lengths, text, session = asyncio.run(scenario())
+    assert streamed == 3
+    assert sorted(partials) == [(i, f"window {i + 1}") for i in range(4)]
+    # Cuts land in the pauses ending at 10, 20 and 30 s, each window running an overlap second past its cut
+    assert all(10.75 <= length <= 11.0 for length in lengths[:3])
+    assert text == "window 1 window 2 window 3 window 4"
+    assert session.duration == 35.0
+
+    with pytest.raises(ValueError):
+        LiveTranscription(None, SAMPLE_RATE, 2).feed(b"\x00\x00")
+    with pytest.raises(ValueError):
+        LiveTranscription(None, SAMPLE_RATE, 1, max_seconds=1.0).feed(bytes(4 * SAMPLE_RATE))
+
+def test_live_voice_note_over_websocket(monkeypatch):
+    async def transcribe_pcm(audio: PcmAudio, timeout=None, route=None) -> str:
+        return "hello from a live note"
+
+    async def stream_content(transcription: str, timeout=None, route=None):
+        yield "metadata", {"emoji": "🎙️", "title": "Live"}
+        yield "summary", {"delta": "A live note."}
+        yield "content", {"emoji": "🎙️", "title": "Live", "transcription": transcription, "summary": "A live note."}
+
+    monkeypatch.setattr(live_notes.speech_handler, "transcribe_pcm", transcribe_pcm)
+    monkeypatch.setattr(live_notes.content_generator, "stream_content", stream_content)
+
+    client = TestClient(app)
+    with client.websocket_connect(f"/api/v1/voice-notes/live?api_key={os.environ['API_KEY']}") as websocket:
+        websocket.send_bytes(_speech(1.0))
+        websocket.send_json({"event": "stop"})
+        events = []
+        while not events or events[-1]["event"] not in ("done", "error"):
+            events.append(websocket.receive_json())
+
+    assert [event["event"] for event in events] == ["partial", "transcription", "metadata", "summary", "done"]
+    assert events[-1]["transcription"] == "hello from a live note"
+    assert events[-1]["id"]
+
+    with pytest.raises(WebSocketDisconnect) as rejected:
+        with client.websocket_connect("/api/v1/voice-notes/live?api_key=wrong") as websocket:
+            websocket.receive_json()
+    assert rejected.value.code == 1008
+
+def test_live_voice_note_errors(monkeypatch):
+    async def transcribe_pcm(audio: PcmAudio, timeout=None, route=None) -> str:
+        return "hello"
+
+    async def stream_content(transcription: str, timeout=None, route=None):
+        raise ValueError("upstream said something internal")
+        yield
+
+    monkeypatch.setattr(live_notes.speech_handler, "transcribe_pcm", transcribe_pcm)
+    monkeypatch.setattr(live_notes.content_generator, "stream_content", stream_content)
+
+    def run(*messages):
+        client = TestClient(app)
+        with client.websocket_connect(f"/api/v1/voice-notes/live?api_key={os.environ['API_KEY']}") as websocket:
+            for message in messages:
+                if isinstance(message, bytes):
+                    websocket.send_bytes(message)
+                else:
+                    websocket.send_text(message)
+            event = websocket.receive_json()
+            while event["event"] != "error":
+                event = websocket.receive_json()
+            return event, websocket.receive()["code"]
+
+    # Client mistakes are a 400 and a policy-violation close
+    assert run('["stop"]') == ({"event": "error", "status_code": 400, "detail": 'Text messages must be JSON objects such as {"event": "stop"}'}, 1008)
+    error, code = run(b"\x00")
+    assert (error["status_code"], code) == (400, 1008)
+    # A failed generation is a server error, without the upstream message
+    error, code = run(_speech(1.0), '{"event": "stop"}')
+    assert (error["status_code"], code) == (500, 1011)
+    assert "upstream" not in error["detail"]
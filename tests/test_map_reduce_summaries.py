@@ -0,0 +1,31 @@
+import asyncio
+
+from app.services.content_generator import ContentGenerator
+from app.services.text_chunking import estimate_tokens, split_text
+
+def test_split_text_respects_budget_and_keeps_text():
+    text = " ".join(f"Sentence number {i} is here." for i in range(500))
+    chunks = split_text(text, max_tokens=50)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+def test_split_text_cuts_oversized_sentences():
+    chunks = split_text("word " * 1000, max_tokens=10)
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert sum(len(chunk.split()) for chunk in chunks) == 1000
+
+def test_long_transcriptions_are_summarized_in_sections(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            generator = ContentGenerator()
+            generator.map_reduce_threshold_tokens = 100
+            generator.map_chunk_tokens = 100
+            transcription = "A fairly ordinary sentence about the project. " * 100
+            content = await generator.generate_content(transcription)
+        return content, stub.request_count, len(split_text(transcription, 100))
+
+    content, calls, sections = asyncio.run(scenario())
+    assert content["title"] == "Stub note"
+    assert content["transcription"].startswith("A fairly ordinary sentence")
+    assert calls == sections + 1
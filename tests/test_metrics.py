@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import httpx
+
+from app.main import app
+from app.services.metrics import MetricsRegistry, STAGE_DURATION, track_stage
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+METRICS_HEADERS = {"Authorization": f"Bearer {os.environ['METRICS_API_KEY']}"}
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry("test")
+    histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="a")
+    registry.register_collector("cache", "Cache stats", lambda: {"hits": 3, "nested": {"bytes": 10}, "mean": None})
+
+    text = asyncio.run(registry.render())
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="a",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{stage="a"} 4' in text
+    assert 'test_cache{key="hits"} 3' in text
+    assert 'test_cache{key="nested.bytes"} 10' in text
+    assert "mean" not in text
+
+def test_track_stage_records_failures():
+    before = STAGE_DURATION.count(stage="test_failure", outcome="error")
+    try:
+        with track_stage("test_failure"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert STAGE_DURATION.count(stage="test_failure", outcome="error") == before + 1
+
+def test_metrics_endpoint_exposes_stage_latencies(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": "Metrics note"})
+                assert response.status_code == 200
+                anonymous = await client.get("/metrics")
+                tenant = await client.get("/metrics", headers=HEADERS)
+                return anonymous, tenant, await client.get("/metrics", headers=METRICS_HEADERS)
+
+    anonymous, tenant, response = asyncio.run(scenario())
+    # Per-key usage is only for the metrics key, not for callers or other tenants
+    assert anonymous.status_code == tenant.status_code == 401
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'voicenote_stage_duration_seconds_count{stage="content_generation",outcome="ok"}' in text
+    assert 'voicenote_stage_duration_seconds_count{stage="gemini_generation",outcome="ok"}' in text
+    assert 'voicenote_upstream_responses_total{upstream="gemini",status="200"}' in text
+    assert 'voicenote_http_request_duration_seconds_count{method="POST",handler="process_raw_text",status="200"}' in text
+    assert 'voicenote_transcription_cache{key="hits"}' in text
+    assert 'voicenote_job_queue{key="depth"}' in text
@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import httpx
+
+from app.main import app
+from app.services.metrics import MODEL_CALL_DURATION
+from app.services.model_router import ModelRouter, ModelTier, estimate_audio_tokens, model_router
+from benchmarks.stubs import sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+def test_inputs_go_to_the_first_tier_they_fit():
+    router = ModelRouter(
+        [ModelTier("light", "lite", 100), ModelTier("standard", "flash", 1000), ModelTier("long", "pro")],
+        overrides={"raw_text": "long", "live_note": "custom-model"}
+    )
+    assert [router.tier_for(tokens).model for tokens in (10, 100, 101, 1000, 5000)] == ["lite", "lite", "flash", "flash", "pro"]
+    assert router.tier_for(10, "raw_text").model == "pro"
+    assert router.tier_for(10, "live_note").model == "custom-model"
+    assert router.tier_for(10, "voice_note").model == "lite"
+
+    # Audio is sized by duration when known, otherwise by bytes
+    assert estimate_audio_tokens(2.0, 10 ** 9) == 64
+    assert estimate_audio_tokens(None, 32000) == 64
+
+    # Routing off uses the configured standard model for everything
+    disabled = ModelRouter([ModelTier("light", "lite", 100), ModelTier("standard", "flash-custom", 1000)], enabled=False)
+    assert [disabled.tier_for(tokens).model for tokens in (10, 5000)] == ["flash-custom", "flash-custom"]
+    assert ModelRouter([ModelTier("light", "lite", 100)], enabled=False).tier_for(10).model == "gemini-2.0-flash"
+
+def test_routes_pick_models_by_input_size(monkeypatch, gemini_stub):
+    monkeypatch.setattr(model_router, "tiers", [ModelTier("light", "lite", 500), ModelTier("standard", "flash")])
+
+    async def scenario():
+        async with gemini_stub() as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                short_text = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": "Buy milk and eggs."})
+                short_models = dict(stub.models)
+                long_text = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": "Plan the launch. " * 200})
+                long_models = dict(stub.models)
+                voice = await client.post(
+                    "/api/v1/voice-notes", headers=HEADERS,
+                    files={"file": ("note.wav", sample_wav(seconds=30.0, seed=11), "audio/wav")}
+                )
+                return short_text, short_models, long_text, long_models, voice, dict(stub.models)
+
+    calls_before = MODEL_CALL_DURATION.count(stage="gemini_generation", model="lite")
+    short_text, short_models, long_text, long_models, voice, voice_models = asyncio.run(scenario())
+    assert short_text.status_code == long_text.status_code == voice.status_code == 200
+    assert short_models == {"lite": 1}
+    assert long_models == {"lite": 1, "flash": 1}
+    # 30 s of audio is 960 tokens: the transcription goes to the larger tier, the short transcript back to the light one
+    assert voice_models == {"lite": 2, "flash": 2}
+    assert MODEL_CALL_DURATION.count(stage="gemini_generation", model="lite") - calls_before == 2
+
+def test_long_tier_only_when_configured(monkeypatch):
+    monkeypatch.delenv("MODEL_LONG", raising=False)
+    assert [tier.name for tier in ModelRouter.from_env().tiers] == ["light", "standard"]
+    assert ModelRouter.from_env().tier_for(10_000_000).name == "standard"
+
+    monkeypatch.setenv("MODEL_LONG", "long-context-model")
+    monkeypatch.setenv("MODEL_STANDARD_MAX_TOKENS", "1000")
+    assert ModelRouter.from_env().tier_for(5000).model == "long-context-model"
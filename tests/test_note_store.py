@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sqlite3
+
+import httpx
+
+from app.main import app
+from app.schemas.voice_note import YouTubeVideoResponse
+from app.services.job_queue import job_queue
+from app.services.note_store import NoteStore, input_hash, note_store
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+def _note(title: str, summary: str = "Release moves to Friday.") -> YouTubeVideoResponse:
+    return YouTubeVideoResponse(emoji="📝", title=title, transcription=f"Transcript of {title}", summary=summary)
+
+def test_writes_are_batched_and_searchable(tmp_path):
+    async def scenario():
+        store = NoteStore(str(tmp_path / "notes.sqlite3"), batch_size=50, flush_interval=0.01)
+        await store.start()
+        try:
+            ids = await asyncio.gather(*(store.add("raw_text", f"input {i}", _note(f"Standup {i}"), "acme") for i in range(120)))
+            queued = await store.get(ids[0], "acme")
+            await store.add("raw_text", "other", _note("Groceries", "Oat milk and coffee beans."), "acme")
+            for _ in range(100):
+                if not store._pending:
+                    break
+                await asyncio.sleep(0.01)
+            return (
+                ids, queued, await store.stats(),
+                await store.search("standup 11", "acme"), await store.search("coff", "acme"), await store.search('"AND (OR', "acme"),
+                await store.find_by_input(input_hash("input 7"), "acme")
+            )
+        finally:
+            await store.stop()
+
+    ids, queued, stats, standup, coffee, malformed, by_input = asyncio.run(scenario())
+    assert queued["title"] == "Standup 0"
+    assert (stats["written"], stats["pending"]) == (121, 0)
+    assert stats["write_batches"] < 10
+    assert standup[0]["title"] == "Standup 11"
+    assert [hit["title"] for hit in coffee] == ["Groceries"]
+    assert "[coffee]" in coffee[0]["snippet"]
+    assert malformed == []
+    assert [note["id"] for note in by_input] == [ids[7]]
+
+def test_queued_notes_are_written_on_stop(tmp_path):
+    db_path = str(tmp_path / "notes.sqlite3")
+
+    async def scenario():
+        first = NoteStore(db_path, flush_interval=60.0)
+        await first.start()
+        note_id = await first.add("raw_text", "hello", _note("Persisted"), "acme")
+        await first.stop()
+
+        second = NoteStore(db_path)
+        try:
+            return await second.get(note_id, "acme")
+        finally:
+            await second.stop()
+
+    assert asyncio.run(scenario())["title"] == "Persisted"
+
+def test_processed_note_can_be_refetched_and_searched(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                text = "Notes from the quarterly planning offsite about hiring."
+                created = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": text})
+                upstream_calls = stub.request_count
+                fetched = await client.get(f"/api/v1/notes/{created.json()['id']}", headers=HEADERS)
+                await note_store.flush()
+                found = await client.get("/api/v1/notes/search", headers=HEADERS, params={"q": "offsite hiring"})
+                by_input = await client.get("/api/v1/notes", headers=HEADERS, params={"input_hash": input_hash(text)})
+                missing = await client.get("/api/v1/notes/unknown", headers=HEADERS)
+                return created, fetched, found, by_input, missing, upstream_calls, stub.request_count
+
+    created, fetched, found, by_input, missing, calls_before, calls_after = asyncio.run(scenario())
+    note_id = created.json()["id"]
+    assert fetched.status_code == 200
+    assert fetched.json()["summary"] == created.json()["summary"]
+    assert fetched.json()["kind"] == "raw_text"
+    assert calls_after == calls_before
+    assert [hit["id"] for hit in found.json()["items"]] == [note_id]
+    assert [note["id"] for note in by_input.json()["items"]] == [note_id]
+    assert missing.status_code == 404
+
+def test_notes_and_jobs_are_private_to_their_key(tmp_path):
+    legacy_db = str(tmp_path / "legacy.sqlite3")
+    conn = sqlite3.connect(legacy_db)
+    conn.execute("CREATE TABLE notes (id TEXT PRIMARY KEY, kind TEXT NOT NULL, input_hash TEXT NOT NULL, emoji TEXT NOT NULL, title TEXT NOT NULL, transcription TEXT NOT NULL, summary TEXT NOT NULL, created_at REAL NOT NULL)")
+    conn.close()
+
+    async def scenario():
+        # Key B's note and job, read through the API with key A (the default key)
+        other_note = await note_store.add("raw_text", "tenant b input", _note("Tenant B plans"), "tenant-b")
+        await note_store.flush()
+        other_job = await job_queue.submit("raw_text", {"text": "tenant b"}, "tenant-b")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            note = await client.get(f"/api/v1/notes/{other_note}", headers=HEADERS)
+            found = await client.get("/api/v1/notes/search", headers=HEADERS, params={"q": "tenant plans"})
+            by_input = await client.get("/api/v1/notes", headers=HEADERS, params={"input_hash": input_hash("tenant b input")})
+            job = await client.get(f"/api/v1/jobs/{other_job}", headers=HEADERS)
+        await job_queue.stop()
+        owned = await note_store.get(other_note, "tenant-b")
+
+        # A database from before notes had owners gains the column
+        legacy = NoteStore(legacy_db)
+        legacy_id = await legacy.add("raw_text", "x", _note("Legacy"), "tenant-a")
+        await legacy.stop()
+        reopened = NoteStore(legacy_db)
+        try:
+            legacy_note = await reopened.get(legacy_id, "tenant-a")
+        finally:
+            await reopened.stop()
+        return note, found, by_input, job, owned, legacy_note
+
+    note, found, by_input, job, owned, legacy_note = asyncio.run(scenario())
+    assert note.status_code == 404
+    assert found.json()["items"] == []
+    assert by_input.json()["items"] == []
+    assert job.status_code == 404
+    assert owned["title"] == "Tenant B plans"
+    assert legacy_note["title"] == "Legacy"
@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import os
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.main import app
+from app.middleware.compression import CompressionMiddleware, negotiate_encoding
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+def test_negotiates_the_best_accepted_encoding():
+    available = {"gzip": None, "br": None, "zstd": None}
+    assert negotiate_encoding("gzip, deflate, br, zstd", available) == "zstd"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert negotiate_encoding("br;q=0, *", available) == "zstd"
+    assert negotiate_encoding("zstd;q=0, br;q=0, *;q=0.1", available) == "gzip"
+    assert negotiate_encoding("gzip;q=0", available) is None
+    assert negotiate_encoding("br", {"gzip": None}) is None
+    assert negotiate_encoding("", available) is None
+
+def test_large_bodies_are_compressed_and_streams_are_not():
+    inner = FastAPI()
+
+    @inner.get("/large")
+    async def large():
+        return {"transcription": "word " * 10000}
+
+    @inner.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @inner.get("/events")
+    async def events():
+        return StreamingResponse(iter(["data: x\n\n"] * 500), media_type="text/event-stream")
+
+    compressed_app = CompressionMiddleware(inner, minimum_size=1024, encoders={"gzip": gzip.compress})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=compressed_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            gzip_headers = {"Accept-Encoding": "gzip"}
+            return [
+                await client.get("/large", headers=gzip_headers),
+                await client.get("/large", headers={"Accept-Encoding": "identity"}),
+                await client.get("/small", headers=gzip_headers),
+                await client.get("/events", headers=gzip_headers)
+            ]
+
+    large, identity, small, events = asyncio.run(scenario())
+    assert large.headers["content-encoding"] == "gzip"
+    assert int(large.headers["content-length"]) < len(large.content) // 10
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert large.json() == identity.json()
+    assert "content-encoding" not in identity.headers
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in events.headers
+    assert events.text.count("data: x") == 500
+
+def test_event_stream_headers_are_not_held_back():
+    first_event = asyncio.Event()
+    sent = []
+
+    async def events(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await first_event.wait()
+        await send({"type": "http.response.body", "body": b"data: x\n\n", "more_body": False})
+
+    async def record(message):
+        sent.append(message["type"])
+
+    async def scenario():
+        scope = {"type": "http", "method": "GET", "path": "/events", "headers": [(b"accept-encoding", b"gzip")]}
+        response = asyncio.create_task(CompressionMiddleware(events, encoders={"gzip": gzip.compress})(scope, None, record))
+        await asyncio.sleep(0.01)
+        before_first_event = list(sent)
+        first_event.set()
+        await response
+        return before_first_event
+
+    assert asyncio.run(scenario()) == ["http.response.start"]
+    assert sent == ["http.response.start", "http.response.body"]
+
+def test_transcription_can_be_left_out_of_note_responses(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                text = {"text": "Remember to call the plumber about the leak. " * 100}
+                full = await client.post("/api/v1/raw-text", headers=HEADERS, json=text)
+                trimmed = await client.post("/api/v1/raw-text?include_transcription=false", headers=HEADERS, json=text)
+                return full, trimmed
+
+    full, trimmed = asyncio.run(scenario())
+    assert full.status_code == trimmed.status_code == 200
+    assert full.json()["transcription"].startswith("Remember to call")
+    assert "transcription" not in trimmed.json()
+    assert trimmed.json()["title"] == full.json()["title"]
+    assert full.headers["content-encoding"] == "gzip"
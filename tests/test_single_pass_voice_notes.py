@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from app.main import app
+from app.routers import voice_notes
+from benchmarks.stubs import STUB_TRANSCRIPTION, GeminiStub, sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+class IncompleteStub(GeminiStub):
+    """Answers the single-pass tool without the transcription field."""
+
+    def _completion(self, body: dict, prompt_tokens: int = 0) -> dict:
+        completion = super()._completion(body, prompt_tokens)
+        for call in completion["choices"][0]["message"].get("tool_calls") or []:
+            arguments = json.loads(call["function"]["arguments"])
+            arguments.pop("transcription", None)
+            call["function"]["arguments"] = json.dumps(arguments)
+        return completion
+
+async def _post_notes(gemini_stub, stub: GeminiStub, uploads: list) -> list:
+    async with gemini_stub(stub):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.post("/api/v1/voice-notes", headers=HEADERS, files={"file": ("note.wav", upload, "audio/wav")})
+                for upload in uploads
+            ]
+
+def test_single_pass_uses_one_upstream_call(monkeypatch, gemini_stub):
+    monkeypatch.setattr(voice_notes.speech_handler, "single_pass_enabled", True)
+    stub = GeminiStub()
+    audio = sample_wav(seed=21)
+
+    first, repeat = asyncio.run(_post_notes(gemini_stub, stub, [audio, audio]))
+
+    assert first.status_code == repeat.status_code == 200
+    note = {field: first.json()[field] for field in ("emoji", "title", "transcription", "summary")}
+    assert note == {
+        "emoji": "📝",
+        "title": "Stub note",
+        "transcription": STUB_TRANSCRIPTION,
+        "summary": "A stub summary of the note."
+    }
+    # The repeat reuses the cached transcription and only generates the note
+    assert {field: repeat.json()[field] for field in note} == note
+    assert stub.request_count == 2
+
+def test_incomplete_single_pass_falls_back_to_two_steps(monkeypatch, gemini_stub):
+    monkeypatch.setattr(voice_notes.speech_handler, "single_pass_enabled", True)
+    stub = IncompleteStub()
+
+    (response,) = asyncio.run(_post_notes(gemini_stub, stub, [sample_wav(seed=22)]))
+
+    assert response.status_code == 200
+    assert response.json()["transcription"] == STUB_TRANSCRIPTION
+    assert stub.request_count == 3
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from app.main import app
+from app.services.partial_json import partial_json_string
+from benchmarks.stubs import sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+
+def _parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_partial_json_string_reads_incomplete_values():
+    streamed = '{"emoji": "\\ud83d\\ude00", "title": "Say \\"hi\\"", "summary": "Line\\none \\u00e9'
+    assert partial_json_string(streamed, "emoji") == ("😀", True)
+    assert partial_json_string(streamed, "title") == ('Say "hi"', True)
+    assert partial_json_string(streamed, "summary") == ("Line\none é", False)
+    assert partial_json_string(streamed[:-3], "summary") == ("Line\none ", False)
+    assert partial_json_string('{"emoji": "x"', "title") == (None, False)
+
+def test_voice_note_stream_sends_events_in_order(gemini_stub):
+    async def scenario():
+        async with gemini_stub(stream_chunk_chars=5) as stub:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                files = {"file": ("note.wav", sample_wav(), "audio/wav")}
+                return await client.post("/api/v1/voice-notes/stream", headers=HEADERS, files=files)
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[:2] == ["transcription", "metadata"]
+    assert names[-1] == "done"
+    assert set(names[2:-1]) == {"summary"}
+    assert len(names) > 4
+
+    done = events[-1][1]
+    assert events[1][1] == {"emoji": done["emoji"], "title": done["title"]}
+    assert "".join(data["delta"] for name, data in events if name == "summary") == done["summary"]
+    assert done["transcription"] == events[0][1]["transcription"]
+
+def test_raw_text_stream_rejects_empty_text_before_streaming():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/v1/raw-text/stream", headers=HEADERS, json={"text": "  "})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import httpx
+
+from app.main import app
+from app.routers.youtube_notes import summary_cache
+from app.services.summary_cache import SummaryCache, normalize_words
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+CONTENT = {"emoji": "📝", "title": "Standup", "summary": "Release moves to Friday.", "transcription": "ignored"}
+TEXT = (
+    "[00:00:01] So, um, the team agreed that the release will move to Friday because QA "
+    "found two blocking bugs in the payment flow, and Dana will write the customer email "
+    "while Sam fixes the retry logic and updates the dashboard before the review."
+)
+
+def test_normalization_ignores_trivial_differences():
+    assert normalize_words("Hello,   WORLD! (0:42) uh hello") == ["hello", "world", "hello"]
+
+    cache = SummaryCache(max_bytes=1024 * 1024)
+    cache.set(cache.make_fingerprint(TEXT), CONTENT)
+    variant = TEXT.upper().replace(" So, um,", "  so").replace("[00:00:01]", "00:01")
+    assert cache.get(cache.make_fingerprint(variant))["title"] == "Standup"
+    assert "transcription" not in cache.get(cache.make_fingerprint(TEXT))
+    assert cache.stats()["exact_hits"] == 2
+
+def test_times_in_sentences_and_owners_keep_entries_apart():
+    assert normalize_words("00:01 Meet at 10:30, er, ah") == ["meet", "at", "10", "30", "er", "ah"]
+
+    cache = SummaryCache(max_bytes=1024 * 1024)
+    cache.set(cache.make_fingerprint("Standup moved, meet at 10:30 in the large room", "acme"), CONTENT)
+    assert cache.get(cache.make_fingerprint("Standup moved, meet at 11:45 in the large room", "acme")) is None
+    assert cache.get(cache.make_fingerprint("Standup moved, meet at 10:30 in the large room", "globex")) is None
+    # Not even as a near duplicate of another owner's text
+    cache.set(cache.make_fingerprint(TEXT, "acme"), CONTENT)
+    near = TEXT.replace("two blocking", "two serious blocking")
+    assert cache.get(cache.make_fingerprint(near, "globex")) is None
+    assert cache.get(cache.make_fingerprint(near, "acme"))["title"] == "Standup"
+    assert cache.get(cache.make_fingerprint("[00:03] standup moved meet at 10:30 in the large room", "acme"))["title"] == "Standup"
+
+def test_near_duplicates_match_above_threshold_only():
+    cache = SummaryCache(max_bytes=1024 * 1024, similarity=0.9)
+    cache.set(cache.make_fingerprint(TEXT), CONTENT)
+
+    near = TEXT.replace("two blocking bugs", "two serious blocking bugs")
+    unrelated = "Groceries for the week: apples, oat milk, coffee beans, rice, lentils, spinach and bread."
+    assert cache.get(cache.make_fingerprint(near))["title"] == "Standup"
+    assert cache.get(cache.make_fingerprint(unrelated)) is None
+
+    exact_only = SummaryCache(max_bytes=1024 * 1024, near_duplicates=False)
+    exact_only.set(exact_only.make_fingerprint(TEXT), CONTENT)
+    assert exact_only.get(exact_only.make_fingerprint(near)) is None
+
+    stats = cache.stats()
+    assert (stats["near_hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_eviction_keeps_index_bounded():
+    cache = SummaryCache(max_bytes=2000)
+    for i in range(50):
+        cache.set(cache.make_fingerprint(f"{TEXT} Item number {i} {'x' * i}"), CONTENT)
+    stats = cache.stats()
+    assert stats["bytes"] <= 2000
+    assert stats["evictions"] > 0
+    assert stats["indexed"] == stats["entries"] < 50
+
+def test_repeated_raw_text_skips_generation(gemini_stub):
+    async def scenario():
+        async with gemini_stub() as stub:
+            summary_cache.clear()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": TEXT})
+                second = await client.post("/api/v1/raw-text", headers=HEADERS, json={"text": "  " + TEXT.lower()})
+                return first, second, stub.request_count
+
+    first, second, upstream_calls = asyncio.run(scenario())
+    assert first.status_code == second.status_code == 200
+    assert upstream_calls == 1
+    assert second.json()["summary"] == first.json()["summary"]
+    assert second.json()["transcription"] == "  " + TEXT.lower()
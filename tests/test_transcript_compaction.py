@@ -0,0 +1,64 @@
+import time
+
+from app.services.text_chunking import estimate_tokens
+from app.services.transcript_compaction import compact_transcript
+
+ROLLING_CAPTIONS = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+so<00:00:00.500><c> today</c><00:00:01.000><c> we're</c> going
+
+00:00:02.000 --> 00:00:04.000 align:start position:0%
+so today we're going
+to talk about the release
+
+00:00:04.000 --> 00:00:06.000 align:start position:0%
+to talk about the release
+[Music]
+the release plan for um Friday at 10:30
+"""
+
+def test_strips_caption_markup_and_rolling_repeats():
+    result = compact_transcript(ROLLING_CAPTIONS)
+
+    assert result.text == "so today we're going\nto talk about the release\nplan for Friday at 10:30"
+    assert result.removed["duplicates"] > 0
+    assert result.removed["timestamps"] > 0
+    assert (result.removed["annotations"], result.removed["fillers"]) == (len("[Music]"), len("um"))
+    assert sum(result.removed.values()) == result.removed_chars
+
+def test_keeps_prose_and_inline_times():
+    text = "[00:01]   We met at 10:30   and agreed.\n(0:05) Dana owns the email, uh, and the dashboard."
+    result = compact_transcript(text)
+    assert result.text == "We met at 10:30 and agreed.\nDana owns the email, and the dashboard."
+
+def test_token_budget_keeps_start_and_end():
+    text = " ".join(f"word{i}" for i in range(5000))
+    result = compact_transcript(text, max_tokens=500)
+
+    assert estimate_tokens(result.text) <= 500
+    assert result.text.startswith("word0 word1 ")
+    assert result.text.endswith(" word4998 word4999")
+    assert "[...]" in result.text
+    assert result.removed["budget"] == len(text) - len(result.text)
+
+def test_runs_in_linear_time():
+    block = ROLLING_CAPTIONS.split("\n", 3)[3]
+
+    def seconds(copies: int) -> float:
+        text = block * copies
+        started = time.perf_counter()
+        compact_transcript(text)
+        return time.perf_counter() - started
+
+    seconds(100)
+    small, large = min(seconds(2000) for _ in range(3)), min(seconds(8000) for _ in range(3))
+    assert large < 8 * small
+
+def test_strips_srt_cue_numbers_but_keeps_number_lines():
+    srt = "1\n00:00:01,000 --> 00:00:03,000\nThe winning number was\n\n2\n00:00:03,000 --> 00:00:05,000\n42\n"
+    result = compact_transcript(srt)
+    assert result.text == "The winning number was\n42"
+    assert compact_transcript("Chapter\n7\nbegins here").text == "Chapter\n7\nbegins here"
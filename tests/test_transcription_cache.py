@@ -0,0 +1,41 @@
+import asyncio
+
+from app.services.transcription_cache import TranscriptionCache
+
+def test_key_depends_on_audio_and_parameters():
+    key = TranscriptionCache.make_key(b"audio", "gemini-2.0-flash", "prompt", 0.0)
+    assert key == TranscriptionCache.make_key(b"audio", "gemini-2.0-flash", "prompt", 0.0)
+    assert key != TranscriptionCache.make_key(b"audio!", "gemini-2.0-flash", "prompt", 0.0)
+    assert key != TranscriptionCache.make_key(b"audio", "gemini-2.0-pro", "prompt", 0.0)
+    assert key != TranscriptionCache.make_key(b"audio", "gemini-2.0-flash", "other", 0.0)
+    assert key != TranscriptionCache.make_key(b"audio", "gemini-2.0-flash", "prompt", 0.5)
+
+def test_memory_tier_evicts_least_recently_used():
+    async def scenario():
+        cache = TranscriptionCache(max_bytes=10)
+        await cache.set("a", "aaaa")
+        await cache.set("b", "bbbb")
+        assert await cache.get("a") == "aaaa"
+        await cache.set("c", "cccc")
+        assert await cache.get("b") is None
+        assert await cache.get("c") == "cccc"
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["memory_bytes"] <= 10
+
+def test_disk_tier_survives_restart(tmp_path):
+    async def scenario():
+        cache = TranscriptionCache(max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=1024)
+        await cache.set("k1", "hello")
+
+        restarted = TranscriptionCache(max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=1024)
+        return await restarted.get("k1"), restarted.stats()
+
+    text, stats = asyncio.run(scenario())
+    assert text == "hello"
+    assert stats["disk_hits"] == 1
+    assert stats["disk_entries"] == 1
@@ -0,0 +1,67 @@
+import asyncio
+import base64
+import io
+import os
+
+import httpx
+from fastapi import FastAPI, HTTPException, UploadFile
+
+from app.main import app
+from app.middleware.upload_limit import UploadSizeLimitMiddleware
+from app.routers.voice_notes import speech_handler
+from app.services.audio_upload import encode_base64, read_upload
+from app.services.speech_handler import SpeechHandler
+from benchmarks.stubs import sample_wav
+
+def test_encode_base64_matches_stdlib():
+    for size in (0, 1, 2, 3, 100, 3 * 1024 + 1):
+        data = os.urandom(size)
+        assert encode_base64(data, chunk_size=3 * 16) == base64.b64encode(data).decode("ascii")
+
+def test_read_upload_stops_at_limit():
+    async def scenario(size):
+        upload = UploadFile(io.BytesIO(b"x" * size))
+        return await read_upload(upload, max_size=1000, chunk_size=64)
+
+    assert bytes(asyncio.run(scenario(1000))) == b"x" * 1000
+    try:
+        asyncio.run(scenario(1001))
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("oversized upload was accepted")
+
+def test_oversized_bodies_are_rejected_before_reading():
+    upload_app = FastAPI()
+
+    @upload_app.post("/upload")
+    async def upload(file: UploadFile):
+        return {"size": len(await file.read())}
+
+    limited_app = UploadSizeLimitMiddleware(upload_app, limits={"/upload": 1024 * 1024})
+
+    async def post(size):
+        transport = httpx.ASGITransport(app=limited_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            files = {"file": ("note.wav", b"\0" * size, "audio/wav")}
+            return await client.post("/upload", files=files)
+
+    assert asyncio.run(post(1024 * 1024)).status_code == 200
+    response = asyncio.run(post(2 * 1024 * 1024))
+    assert response.status_code == 413
+    assert "maximum limit" in response.json()["detail"]
+
+def test_voice_note_routes_share_the_upload_limit():
+    limits = next(m.kwargs["limits"] for m in app.user_middleware if m.cls is UploadSizeLimitMiddleware)
+    assert limits["/api/v1/voice-notes/stream"] == limits["/api/v1/voice-notes"] == speech_handler.max_upload_size
+
+def test_oversized_wav_reports_the_chunked_limit():
+    handler = SpeechHandler()
+    handler.max_file_size = 1024 * 1024
+    handler.max_chunked_file_size = 2 * 1024 * 1024
+    try:
+        asyncio.run(handler._check_upload(sample_wav(seconds=70.0), "audio/wav"))
+    except HTTPException as e:
+        assert e.detail == "File size exceeds maximum limit of 2MB"
+    else:
+        raise AssertionError("oversized upload was accepted")
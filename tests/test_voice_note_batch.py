@@ -0,0 +1,44 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from app.main import app
+from benchmarks.stubs import sample_mp3, sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+FILES = [
+    ("files", ("a.wav", sample_wav(), "audio/wav")),
+    ("files", ("b.txt", b"not audio", "text/plain")),
+    ("files", ("c.mp3", sample_mp3(), "audio/mpeg")),
+]
+
+async def _post_batch(gemini_stub, params: dict) -> httpx.Response:
+    async with gemini_stub(latency=0.05):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/v1/voice-notes/batch", headers=HEADERS, files=FILES, params=params)
+
+def test_batch_reports_per_item_results_and_errors(gemini_stub):
+    response = asyncio.run(_post_batch(gemini_stub, {}))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    items = body["items"]
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["result"]["title"] == "Stub note"
+    assert items[1]["status_code"] == 400
+    assert items[1]["result"] is None
+    assert "Unsupported file type" in items[1]["error"]
+
+def test_batch_can_stream_items_as_ndjson(gemini_stub):
+    response = asyncio.run(_post_batch(gemini_stub, {"stream": "true"}))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["index"] for item in items) == [0, 1, 2]
+    # The failing item needs no upstream call, so it completes first
+    assert items[0]["index"] == 1
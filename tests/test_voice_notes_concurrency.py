@@ -0,0 +1,48 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from app.main import app
+from benchmarks.stubs import GeminiStub, sample_wav
+
+HEADERS = {"Authorization": f"Bearer {os.environ['API_KEY']}"}
+UPSTREAM_LATENCY = 0.5
+PARALLEL_REQUESTS = 10
+
+async def _post_voice_note(client: httpx.AsyncClient) -> httpx.Response:
+    files = {"file": ("note.wav", sample_wav(seed=1), "audio/wav")}
+    return await client.post("/api/v1/voice-notes", headers=HEADERS, files=files)
+
+async def _run_parallel_voice_notes(gemini_stub) -> tuple[float, float, list[httpx.Response], GeminiStub]:
+    async with gemini_stub(latency=UPSTREAM_LATENCY) as stub:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            requests = [asyncio.create_task(_post_voice_note(client)) for _ in range(PARALLEL_REQUESTS)]
+
+            # The event loop must stay responsive while upstream calls are pending
+            await asyncio.sleep(UPSTREAM_LATENCY / 2)
+            health_started = time.perf_counter()
+            health = await client.get("/health")
+            health_elapsed = time.perf_counter() - health_started
+            assert health.status_code == 200
+
+            responses = await asyncio.gather(*requests)
+            elapsed = time.perf_counter() - started
+    return elapsed, health_elapsed, responses, stub
+
+def test_parallel_voice_notes_overlap_upstream_calls(gemini_stub):
+    elapsed, health_elapsed, responses, stub = asyncio.run(_run_parallel_voice_notes(gemini_stub))
+
+    assert [r.status_code for r in responses] == [200] * PARALLEL_REQUESTS
+    assert responses[0].json()["title"] == "Stub note"
+    assert stub.request_count == 2 * PARALLEL_REQUESTS
+    assert stub.max_in_flight == PARALLEL_REQUESTS
+
+    # Each note makes two sequential upstream calls; running the notes one at
+    # a time would take PARALLEL_REQUESTS times as long.
+    single_note_latency = 2 * UPSTREAM_LATENCY
+    assert elapsed < 2 * single_note_latency
+    assert health_elapsed < UPSTREAM_LATENCY / 2
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.services import youtube_transcript
+from app.services.youtube_transcript import TranscriptUnavailableError, fetch_youtube_transcript
+
+@pytest.fixture(autouse=True)
+def clear_transcript_cache():
+    youtube_transcript._transcript_cache.clear()
+    yield
+    youtube_transcript._transcript_cache.clear()
+
+def test_concurrent_requests_share_one_fetch(monkeypatch):
+    calls = []
+
+    async def fake_request(video_id, format):
+        calls.append(video_id)
+        await asyncio.sleep(0.05)
+        return {"transcript": f"transcript of {video_id}"}
+
+    monkeypatch.setattr(youtube_transcript, "_request_transcript", fake_request)
+
+    async def scenario():
+        results = await asyncio.gather(*(fetch_youtube_transcript("abc") for _ in range(20)))
+        results.append(await fetch_youtube_transcript("abc"))
+        return results
+
+    results = asyncio.run(scenario())
+    assert calls == ["abc"]
+    assert all(r["transcript"] == "transcript of abc" for r in results)
+
+def test_unavailable_transcripts_are_cached_briefly(monkeypatch):
+    calls = []
+
+    async def fake_request(video_id, format):
+        calls.append(video_id)
+        raise TranscriptUnavailableError("no transcript available")
+
+    monkeypatch.setattr(youtube_transcript, "_request_transcript", fake_request)
+    monkeypatch.setattr(youtube_transcript, "_negative_ttl", 0.05)
+
+    async def scenario():
+        raised = []
+        for _ in range(3):
+            with pytest.raises(TranscriptUnavailableError) as e:
+                await fetch_youtube_transcript("missing")
+            raised.append(e.value)
+        await asyncio.sleep(0.06)
+        with pytest.raises(TranscriptUnavailableError):
+            await fetch_youtube_transcript("missing")
+        return raised
+
+    raised = asyncio.run(scenario())
+    assert calls == ["missing", "missing"]
+    # Cache hits raise a new exception each time instead of re-raising a cached one
+    assert len({id(e) for e in raised}) == 3
+    assert {str(e) for e in raised} == {"no transcript available"}